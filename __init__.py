@@ -6,27 +6,110 @@ bl_info = {
     "description": "Plugin for Blender 4.2, various tools to help working with Ghost Master.",
 }
 
+import time
+import_start = time.perf_counter()
+
 import bpy
+import importlib
+from . import profiling
+from . import jobs
+from . import journal
+from . import schema
+from . import query
+from . import stats
+from . import streaming
+from . import lod
+from . import nullboxes
+from . import mirror
 from . import panels
 from . import armature
 from . import flags
 from . import map_editing
-from . import animation
 from . import entity
+from . import spatial
+from . import colliders
+from . import dedup
+from . import textures
+
+import_time = time.perf_counter() - import_start
+
+# Rig and animation machinery, only imported and registered on first use
+deferred_modules = ["skeleton", "animation"]
+loaded_modules = {}
+
+def ensure_module(name):
+    """Imports and registers a deferred module the first time it is needed, returns the module."""
+    module = loaded_modules.get(name)
+    if module is None:
+        run = profiling.begin_run(f"load {name}", 'STARTUP')
+        try:
+            module = importlib.import_module(f"{__name__}.{name}")
+            profiling.instrument_module(module)
+            module.register()
+            loaded_modules[name] = module
+        finally:
+            profiling.end_run(run)
+    return module
+
+def ensure_rig_tools():
+    for name in deferred_modules:
+        ensure_module(name)
 
 def register():
+    run = profiling.begin_run("register", 'STARTUP')
+    profiling.add_phase(run, "import", import_time)
+
+    # Time every GM Tools operator, has to happen before the classes are registered
+    for module in (jobs, journal, schema, query, armature, flags, map_editing, entity, colliders, dedup, textures, stats, streaming, lod, nullboxes, mirror):
+        profiling.instrument_module(module)
+
+    profiling.mark_phase("register")
+    profiling.register()
+    jobs.register()
+    journal.register()
+    schema.register()
+    query.register()
+    stats.register()
+    streaming.register()
+    lod.register()
+    nullboxes.register()
+    mirror.register()
     panels.register()
     armature.register()
     flags.register()
     map_editing.register()
-    animation.register()
     entity.register()
+    spatial.register()
+    colliders.register()
+    dedup.register()
+    textures.register()
+
+    # The timing shows up in the profiling panel, the rig tools load from their buttons when first used
+    profiling.end_run(run)
     
     
 def unregister():
+    for name in reversed(deferred_modules):
+        module = loaded_modules.pop(name, None)
+        if module:
+            module.unregister()
+
     panels.unregister()
     armature.unregister()
     flags.unregister()
     map_editing.unregister()
-    animation.unregister()
-    entity.unregister()
\ No newline at end of file
+    entity.unregister()
+    spatial.unregister()
+    colliders.unregister()
+    dedup.unregister()
+    textures.unregister()
+    mirror.unregister()
+    nullboxes.unregister()
+    lod.unregister()
+    streaming.unregister()
+    stats.unregister()
+    query.unregister()
+    schema.unregister()
+    journal.unregister()
+    jobs.unregister()
+    profiling.unregister()
\ No newline at end of file
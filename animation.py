@@ -1,8 +1,15 @@
 import bpy
 import math
+from bpy.app.handlers import persistent
 from mathutils import Vector
 from mathutils import Matrix
 import os
+import re
+import json
+import hashlib
+from .skeleton import get_skeleton, invalidate_skeleton, find_unscaled_pose_bones
+from .profiling import mark_phase, count
+from .core import find_effector, sanity_issues, MeshInfo, RootBoneInfo, ArmatureInfo, ActionInfo
 
 # GHOST MASTER AUTORIG KINDA
 
@@ -47,56 +54,319 @@ boneArrays = [
     right_foot_bones
 ]
 
+# Untouched copy of every role's alternatives, the rig setup narrows boneArrays down to the found bone
+bone_role_alternatives = [tuple(array) for array in boneArrays]
+
+# (left, right) alternatives of every sided role, for mirroring
+mirrored_roles = [
+    (tuple(left_upper_arm_bones), tuple(right_upper_arm_bones)),
+    (tuple(left_forearm_bones), tuple(right_forearm_bones)),
+    (tuple(left_thigh_bones), tuple(right_thigh_bones)),
+    (tuple(left_shin_bones), tuple(right_shin_bones)),
+    (tuple(left_hand_bones), tuple(right_hand_bones)),
+    (tuple(left_wrist_bones), tuple(right_wrist_bones)),
+    (tuple(left_foot_bones), tuple(right_foot_bones)),
+]
+
 
 # Automatically find the effector bone.
 def find_effector_bone(armature, child_bone_name, fallback_distal_bone_name):
-    bone = armature.data.bones.get(child_bone_name)
+    return find_effector(get_skeleton(armature), child_bone_name, fallback_distal_bone_name)
+
+
+#####################################################
+# RIG STATE
+#####################################################
+
+# Custom property on the armature object recording what the rig setup already built
+RIG_STATE_KEY = "gm_rig_state"
+
+# Every bone collection created by the rig setup
+RIG_COLLECTION_NAMES = {
+    "GM Rig", "Main",
+    "FK", "FK_Leg_L", "FK_Leg_R", "FK_Arm_L", "FK_Arm_R",
+    "IK", "IK_Leg_L", "IK_Leg_R", "IK_Arm_L", "IK_Arm_R",
+    "Extra", "Unused",
+    "Proxy", "Proxy_Leg_L", "Proxy_Leg_R", "Proxy_Arm_L", "Proxy_Arm_R",
+    "EffBones", "EffBones_Leg_L", "EffBones_Leg_R", "EffBones_Arm_L", "EffBones_Arm_R",
+}
+
+def get_rig_state(armature):
+    """Returns the recorded rig state of the armature as a plain dict."""
+    state = armature.get(RIG_STATE_KEY)
+    return state.to_dict() if state else {}
+
+def save_rig_state(armature, state):
+    armature[RIG_STATE_KEY] = state
+
+def limb_rig_bone_names(limb, proximal_name, distal_name, side_prefix):
+    """Returns the IK, pole, proximal proxy and distal proxy bone names created for a limb."""
+    if limb == 'Leg':
+        ik_bone_name = f'{side_prefix}-Foot-Ik'
+        pole_bone_name = f'{side_prefix}-Knee-Pole'
+    else:
+        ik_bone_name = f'{side_prefix}-Hand-Ik'
+        pole_bone_name = f'{side_prefix}-Elbow-Pole'
+    return ik_bone_name, pole_bone_name, f'{proximal_name}_proxy', f'{distal_name}_proxy'
+
+def limb_is_complete(armature, limb, proximal_name, distal_name, effector_name, side_prefix):
+    """Checks that every bone and constraint of a limb's rig setup is present."""
+    ik_bone_name, pole_bone_name, proxy_proximal_name, proxy_distal_name = limb_rig_bone_names(
+        limb, proximal_name, distal_name, side_prefix)
+    pose_bones = armature.pose.bones
+
+    if not all(name in pose_bones for name in (ik_bone_name, pole_bone_name, proxy_proximal_name, proxy_distal_name)):
+        return False
+
+    if not any(c.type == 'IK' for c in pose_bones[proxy_distal_name].constraints):
+        return False
+
+    for original_name, subtarget in [(proximal_name, proxy_proximal_name), (distal_name, proxy_distal_name), (effector_name, ik_bone_name)]:
+        # The effector is optional, a limb without one has nothing to check there
+        if original_name is None and subtarget == ik_bone_name:
+            continue
+        original = pose_bones.get(original_name) if original_name else None
+        if not original or not any(c.type == 'COPY_ROTATION' and c.subtarget == subtarget for c in original.constraints):
+            return False
+
+    return True
+
+def clear_limb_constraints(armature, limb, proximal_name, distal_name, effector_name, side_prefix):
+    """Removes the constraints the rig setup added on a limb's original bones."""
+    ik_bone_name, _pole, proxy_proximal_name, proxy_distal_name = limb_rig_bone_names(
+        limb, proximal_name, distal_name, side_prefix)
+
+    for bone_name, subtarget in [(proximal_name, proxy_proximal_name), (distal_name, proxy_distal_name), (effector_name, ik_bone_name)]:
+        pbone = armature.pose.bones.get(bone_name) if bone_name else None
+        if pbone:
+            for constraint in list(pbone.constraints):
+                if constraint.type == 'COPY_ROTATION' and constraint.subtarget == subtarget:
+                    pbone.constraints.remove(constraint)
+
+
+#####################################################
+# RIG TEMPLATES
+#####################################################
+
+# Text datablock holding the captured rig templates as JSON, keyed by skeleton fingerprint
+RIG_TEMPLATES_TEXT = "GM Rig Templates"
+
+# IK and pole bones created by the rig setup, proxies are recognised by their suffix
+RIG_BONE_NAMES = {
+    "L-Foot-Ik", "R-Foot-Ik", "L-Knee-Pole", "R-Knee-Pole",
+    "L-Hand-Ik", "R-Hand-Ik", "L-Elbow-Pole", "R-Elbow-Pole",
+}
+
+# Constraint settings copied by the templates, when the constraint type has them
+CONSTRAINT_SETTINGS = [
+    "name", "mute", "subtarget", "pole_subtarget", "chain_count",
+    "pole_angle", "target_space", "owner_space",
+]
 
-    # Primary method: walk UP 2
-    if bone:
-        for _ in range(2):
-            if not bone.parent:
-                print(
-                    f"WARNING: Effector finder could not walk up 2 bones "
-                    f"from '{child_bone_name}'. Falling back to walking down "
-                    f"1 bone from '{fallback_distal_bone_name}'."
-                )
-                bone = None
-                break
+# Templates already parsed this session
+rig_template_cache = {}
+
+def is_rig_bone(bone_name):
+    return bone_name in RIG_BONE_NAMES or bone_name.endswith("_proxy")
+
+def skeleton_fingerprint(armature):
+    """Hashes the names, hierarchy and rest positions of the armature's own bones, ignoring rig bones."""
+    entries = []
+    for bone in armature.data.bones:
+        if is_rig_bone(bone.name):
+            continue
+        parent = bone.parent.name if bone.parent else ""
+        head = ",".join(f"{v:.4f}" for v in bone.head_local)
+        tail = ",".join(f"{v:.4f}" for v in bone.tail_local)
+        entries.append(f"{bone.name}|{parent}|{head}|{tail}")
+    entries.sort()
+    return hashlib.sha1("\n".join(entries).encode("utf-8")).hexdigest()
+
+def load_rig_templates():
+    """Returns every template stored in the file."""
+    text = bpy.data.texts.get(RIG_TEMPLATES_TEXT)
+    if not text:
+        return {}
+    try:
+        return json.loads(text.as_string())
+    except ValueError:
+        print(f"WARNING: {RIG_TEMPLATES_TEXT} is not valid JSON, ignoring it.")
+        return {}
+
+def get_rig_template(fingerprint):
+    template = rig_template_cache.get(fingerprint)
+    if template is None:
+        template = load_rig_templates().get(fingerprint)
+        if template is not None:
+            rig_template_cache[fingerprint] = template
+    return template
+
+def capture_rig_template(armature):
+    """Records the bones, constraints, collections and shapes added by the rig setup on armature."""
+    template = {
+        "source": armature.name,
+        "rig_state": get_rig_state(armature),
+        "bones": [],
+        "constraints": [],
+        "collections": [],
+        "bone_collections": {},
+        "shapes": {},
+    }
+
+    for bone in armature.data.bones:
+        if is_rig_bone(bone.name):
+            template["bones"].append({
+                "name": bone.name,
+                "head": list(bone.head_local),
+                "tail": list(bone.tail_local),
+                # Rest matrices are armature space, the roll is recovered from the Z axis
+                "z_axis": list(bone.matrix_local.col[2][:3]),
+                "parent": bone.parent.name if bone.parent else "",
+                "use_connect": bone.use_connect,
+                "use_deform": bone.use_deform,
+            })
+
+        names = [c.name for c in bone.collections if c.name in RIG_COLLECTION_NAMES]
+        if names:
+            template["bone_collections"][bone.name] = names
+
+    for pose_bone in armature.pose.bones:
+        for constraint in pose_bone.constraints:
+            # Only the constraints pointing at rig bones belong to the rig setup
+            if not is_rig_bone(getattr(constraint, "subtarget", "")):
+                continue
+            data = {"bone": pose_bone.name, "type": constraint.type}
+            for setting in CONSTRAINT_SETTINGS:
+                if hasattr(constraint, setting):
+                    data[setting] = getattr(constraint, setting)
+            template["constraints"].append(data)
+
+        if pose_bone.custom_shape:
+            template["shapes"][pose_bone.name] = pose_bone.custom_shape.name
+
+    # Parents are listed before their children so they can be recreated in order
+    def collection_depth(bcoll):
+        depth = 0
+        while bcoll.parent:
+            bcoll = bcoll.parent
+            depth += 1
+        return depth
+
+    for bcoll in sorted(armature.data.collections_all, key=collection_depth):
+        if bcoll.name in RIG_COLLECTION_NAMES:
+            template["collections"].append({
+                "name": bcoll.name,
+                "parent": bcoll.parent.name if bcoll.parent else "",
+                "is_visible": bcoll.is_visible,
+            })
+
+    return template
+
+def store_rig_template(fingerprint, template):
+    templates = load_rig_templates()
+    templates[fingerprint] = template
+
+    text = bpy.data.texts.get(RIG_TEMPLATES_TEXT) or bpy.data.texts.new(RIG_TEMPLATES_TEXT)
+    text.from_string(json.dumps(templates))
+    rig_template_cache[fingerprint] = template
+
+def apply_rig_template(armature, template):
+    """Creates the template's rig bones, constraints, collections and shapes on armature in one go."""
+    bpy.ops.object.mode_set(mode='EDIT')
+    edit_bones = armature.data.edit_bones
+
+    created = []
+    for data in template["bones"]:
+        if data["name"] in edit_bones:
+            continue
+        bone = edit_bones.new(data["name"])
+        bone.head = data["head"]
+        bone.tail = data["tail"]
+        bone.align_roll(Vector(data["z_axis"]))
+        bone.use_deform = data["use_deform"]
+        created.append((bone, data))
+
+    # Parent once every bone exists
+    for bone, data in created:
+        parent_bone = edit_bones.get(data["parent"])
+        if parent_bone:
+            bone.parent = parent_bone
+            bone.use_connect = data["use_connect"]
+
+    bpy.ops.object.mode_set(mode='OBJECT')
+    invalidate_skeleton(armature)
+
+    pose_bones = armature.pose.bones
+    for data in template["constraints"]:
+        pose_bone = pose_bones.get(data["bone"])
+        if not pose_bone or data.get("name") in pose_bone.constraints:
+            continue
+        constraint = pose_bone.constraints.new(data["type"])
+        constraint.target = armature
+        if data.get("pole_subtarget"):
+            constraint.pole_target = armature
+        for setting in CONSTRAINT_SETTINGS:
+            if setting in data:
+                setattr(constraint, setting, data[setting])
+
+    collections_all = armature.data.collections_all
+    for data in template["collections"]:
+        bcoll = collections_all.get(data["name"])
+        if bcoll is None:
+            parent = collections_all.get(data["parent"]) if data["parent"] else None
+            if parent is None:
+                bcoll = armature.data.collections.new(data["name"])
+            else:
+                bcoll = armature.data.collections.new(data["name"], parent=parent)
+            bcoll.is_visible = data["is_visible"]
+
+    for bone_name, names in template["bone_collections"].items():
+        pose_bone = pose_bones.get(bone_name)
+        if pose_bone:
+            for name in names:
+                collections_all[name].assign(pose_bone)
+
+    for bone_name, shape_name in template["shapes"].items():
+        pose_bone = pose_bones.get(bone_name)
+        shape = bpy.data.objects.get(shape_name)
+        if pose_bone and shape:
+            pose_bone.custom_shape = shape
+
+    save_rig_state(armature, template["rig_state"])
+
+def import_gm_bones():
+    """Appends the GmBones shape objects if they are not in the file yet. Returns an error message on failure."""
+    # Check if the GmBones collection is already imported
+    gm_bones_collection = bpy.data.collections.get("GmBones")
+    if gm_bones_collection is not None and len(gm_bones_collection.objects) > 0:
+        return None
 
-            bone = bone.parent
+    # Get the path to the assets folder in the plugin directory
+    addon_dir = os.path.dirname(__file__)
+    asset_path = os.path.join(addon_dir, "assets", "GmBones.blend")
 
-        if bone:
-            return bone.name
+    # Check if the file exists
+    if not os.path.exists(asset_path):
+        return f"GmBones file not found: {asset_path}"
 
-    else:
-        print(
-            f"WARNING: Effector finder could not find starting bone "
-            f"'{child_bone_name}'. Falling back to walking down 1 bone "
-            f"from '{fallback_distal_bone_name}'."
-        )
-
-    # Fallback method: walk DOWN 1 (mostly for thorne lmao)
-    bone = armature.data.bones.get(fallback_distal_bone_name)
-
-    if not bone:
-        print(
-            f"Effector finder: fallback distal bone "
-            f"'{fallback_distal_bone_name}' not found."
-        )
-        return None
+    # Create or get the GmBones collection
+    if gm_bones_collection is None:
+        gm_bones_collection = bpy.data.collections.new("GmBones")
+        bpy.context.scene.collection.children.link(gm_bones_collection)
 
-    for _ in range(1):
-        if not bone.children:
-            print(
-                f"Effector finder: fallback could not walk down 1 bone "
-                f"from '{fallback_distal_bone_name}'."
-            )
-            return None
+    # Append all objects from the GmBones file
+    with bpy.data.libraries.load(asset_path, link=False) as (data_from, data_to):
+        data_to.objects = data_from.objects
 
-        bone = bone.children[0]
+    # Link imported objects to the GmBones collection
+    for obj in data_to.objects:
+        if obj is not None:
+            gm_bones_collection.objects.link(obj)
 
-    return bone.name
+    # Hide the GmBones collection in the viewport
+    gm_bones_collection.hide_viewport = True
+    gm_bones_collection.hide_render = True
+    return None
 
 
 class OBJECT_OT_GhostMasterIK(bpy.types.Operator):
@@ -105,6 +375,12 @@ class OBJECT_OT_GhostMasterIK(bpy.types.Operator):
     bl_label = "Create Ghost Master rig setup"
     bl_options = {'REGISTER', 'UNDO'}
 
+    use_template: bpy.props.BoolProperty(
+        name="Use Rig Template",
+        description="Copy the rig from a captured template when the skeleton matches one",
+        default=True,
+    )
+
     def execute(self, context):
         obj = bpy.context.object
 
@@ -113,12 +389,15 @@ class OBJECT_OT_GhostMasterIK(bpy.types.Operator):
 
             # Store the armature reference
             armature = obj
+            rig_state = get_rig_state(armature)
+            mark_phase("Resolve bones")
 
 
-            # Check which version of each bone type is present in the armature and remove other bones from the arrays
-            for array in boneArrays:
+            # Check which version of each bone type is present in the armature and remove other bones from the arrays.
+            # The search starts from every alternative again, an earlier armature narrowed the arrays to its own bones
+            for array, alternatives in zip(boneArrays, bone_role_alternatives):
                 found_bone = None
-                for bone_name in array:
+                for bone_name in alternatives:
                     if bone_name in armature.data.bones:
                         found_bone = bone_name
                         break
@@ -126,12 +405,32 @@ class OBJECT_OT_GhostMasterIK(bpy.types.Operator):
                     # Remove all other bones from the array
                     array[:] = [found_bone]
                 else:
+                    array[:] = alternatives
                     self.report({'WARNING'}, f"No valid bone found for {array[0]} in the armature.")
 
 
+            #####################################################
+            # RIG TEMPLATE
+            #####################################################
+
+            # Fresh armatures matching a captured template get the whole rig copied at once
+            mark_phase("Rig template")
+            if self.use_template and not rig_state and "GM Rig" not in armature.data.collections_all:
+                template = get_rig_template(skeleton_fingerprint(armature))
+                if template:
+                    error = import_gm_bones()
+                    if error:
+                        self.report({'ERROR'}, error)
+                        return {'CANCELLED'}
+                    apply_rig_template(armature, template)
+                    self.report({'INFO'}, f"Rig setup copied from template {template['source']}.")
+                    return {'FINISHED'}
+
+
             #####################################################
             # AUTOMATIC EFFECTOR FINDING
             #####################################################
+            mark_phase("Effector finding")
 
             left_leg_effector = find_effector_bone(
                 armature,
@@ -157,14 +456,53 @@ class OBJECT_OT_GhostMasterIK(bpy.types.Operator):
                 right_forearm_bones[0]
             )
 
+            # Limbs handled by the rig setup: limb, proximal, distal, effector, side
+            limbs = [
+                ('Leg', left_thigh_bones[0], left_shin_bones[0], left_leg_effector, 'L'),
+                ('Leg', right_thigh_bones[0], right_shin_bones[0], right_leg_effector, 'R'),
+                ('Arm', left_upper_arm_bones[0], left_forearm_bones[0], left_arm_effector, 'L'),
+                ('Arm', right_upper_arm_bones[0], right_forearm_bones[0], right_arm_effector, 'R'),
+            ]
+
+
+            #####################################################
+            # RIG STATE DIFF
+            #####################################################
+
+            # Only rebuild limbs that are missing, partially built or whose bones changed since the last run
+            mark_phase("Rig state diff")
+            limbs_state = rig_state.setdefault("limbs", {})
+            limbs_to_build = []
+            stale_bone_names = set()
+
+            for limb in limbs:
+                limb_key = f"{limb[0]}_{limb[4]}"
+                record = {"proximal": limb[1], "distal": limb[2], "effector": limb[3] or ""}
+                previous = limbs_state.get(limb_key)
+
+                # Rigs built before the state record existed are adopted as they are
+                if previous in (None, record) and limb_is_complete(armature, *limb):
+                    limbs_state[limb_key] = record
+                    continue
+
+                # Clear whatever is left of the previous setup of this limb before building it again
+                clear_limb_constraints(armature, *limb)
+                stale_bone_names.update(limb_rig_bone_names(limb[0], limb[1], limb[2], limb[4]))
+                if previous:
+                    previous_limb = (limb[0], previous["proximal"], previous["distal"], previous["effector"], limb[4])
+                    clear_limb_constraints(armature, *previous_limb)
+                    stale_bone_names.update(limb_rig_bone_names(limb[0], previous["proximal"], previous["distal"], limb[4]))
+
+                limbs_state.pop(limb_key, None)
+                limbs_to_build.append(limb)
+
+            save_rig_state(armature, rig_state)
+
 
             ###########
             # IK SETUP
             ##########
 
-            # Switch to Edit Mode to modify bones
-            bpy.ops.object.mode_set(mode='EDIT')
-
             # Function to set up IK for a given limb (left or right)
             def setup_ik(limb, proximal_name, distal_name, effector_name, side_prefix):
                 # Check if IK bones already exist
@@ -267,63 +605,23 @@ class OBJECT_OT_GhostMasterIK(bpy.types.Operator):
                         pole_bone = obj.data.edit_bones.new(f'{side_prefix}-Knee-Pole')
                         pole_bone.head = pole_position
                         pole_bone.tail = pole_position + Vector((0.0, 0.2, 0.0))
-                    
+
                     elif limb == 'Arm':
                         pole_bone = obj.data.edit_bones.new(f'{side_prefix}-Elbow-Pole')
                         pole_bone.head = pole_position + Vector((0.0, 0.8, 0.0))
                         pole_bone.tail = pole_position + Vector((0.0, 1.0, 0.0))
-                    
+
                     pole_bone.use_deform = False
                     if parent_bone:
                         pole_bone.parent = parent_bone
 
 
-            # # Setup IK for the left leg
-            setup_ik(
-                'Leg',
-                left_thigh_bones[0],
-                left_shin_bones[0],
-                left_leg_effector,
-                'L'
-            )
-
-            # # Setup IK for the right leg
-            setup_ik(
-                'Leg',
-                right_thigh_bones[0],
-                right_shin_bones[0],
-                right_leg_effector,
-                'R'
-            )
-
-            # # Setup IK for the left arm
-            setup_ik(
-                'Arm',
-                left_upper_arm_bones[0],
-                left_forearm_bones[0],
-                left_arm_effector,
-                'L'
-            )
-
-            # # Setup IK for the right arm
-            setup_ik(
-                'Arm',
-                right_upper_arm_bones[0],
-                right_forearm_bones[0],
-                right_arm_effector,
-                'R'
-            )
-
-
-            # Switch back to Object Mode
-            bpy.ops.object.mode_set(mode='OBJECT')
-
             # Add IK constraints
             def add_constraints(limb, proximal_name, distal_name, terminal_eff_name, side_prefix):
                 if proximal_name not in obj.pose.bones or distal_name not in obj.pose.bones:
                     self.report({'WARNING'}, f"{limb} bones {proximal_name} or {distal_name} not found.")
                     return
-                
+
                 # Constraint proxy bones to the original bones
                 proxy_proximal = obj.pose.bones.get(f'{proximal_name}_proxy')
                 proxy_distal = obj.pose.bones.get(f'{distal_name}_proxy')
@@ -350,7 +648,7 @@ class OBJECT_OT_GhostMasterIK(bpy.types.Operator):
                         ik_constraint.target = obj
                         ik_constraint.pole_target = obj
                         ik_constraint.chain_count = 2
-                        
+
                         if limb == 'Leg':
                             ik_constraint.subtarget = f'{side_prefix}-Foot-Ik'
                             ik_constraint.pole_subtarget = f'{side_prefix}-Knee-Pole'
@@ -359,7 +657,7 @@ class OBJECT_OT_GhostMasterIK(bpy.types.Operator):
                             ik_constraint.subtarget = f'{side_prefix}-Hand-Ik'
                             ik_constraint.pole_subtarget = f'{side_prefix}-Elbow-Pole'
                             ik_constraint.pole_angle = 180  # Adjust this if needed
-                        
+
                         # Mute the IK constraint by default
                         ik_constraint.mute = True
                     else:
@@ -370,15 +668,12 @@ class OBJECT_OT_GhostMasterIK(bpy.types.Operator):
                 # Add Child Of constraint to the terminal effector bone (Foot or Hand)
                 pbon_terminal = obj.pose.bones.get(terminal_eff_name)
                 if pbon_terminal:
+                    ik_bone_name = f'{side_prefix}-Foot-Ik' if limb == 'Leg' else f'{side_prefix}-Hand-Ik'
                     # Check if Child Of constraint already exists
-                    if not any(constraint.type == 'COPY_ROTATION' for constraint in pbon_terminal.constraints):
+                    if not any(constraint.type == 'COPY_ROTATION' and constraint.subtarget == ik_bone_name for constraint in pbon_terminal.constraints):
                         copyrot_constraint = pbon_terminal.constraints.new('COPY_ROTATION')
                         copyrot_constraint.target = obj
-
-                        if limb == 'Leg':
-                            copyrot_constraint.subtarget = f'{side_prefix}-Foot-Ik'
-                        elif limb == 'Arm':
-                            copyrot_constraint.subtarget = f'{side_prefix}-Hand-Ik'      
+                        copyrot_constraint.subtarget = ik_bone_name
                         # Mute the  constraint by default
                         copyrot_constraint.mute = True
                     else:
@@ -386,85 +681,50 @@ class OBJECT_OT_GhostMasterIK(bpy.types.Operator):
                 else:
                     self.report({'WARNING'}, f"Foot effector bone {terminal_eff_name} not found.")
 
-            # Add constraints for the left leg
-            add_constraints(
-                'Leg',
-                left_thigh_bones[0],
-                left_shin_bones[0],
-                left_leg_effector,
-                'L'
-            )
+            if limbs_to_build:
+                mark_phase("IK setup")
+                # Switch to Edit Mode to modify bones
+                bpy.ops.object.mode_set(mode='EDIT')
 
-            # Add constraints for the right leg
-            add_constraints(
-                'Leg',
-                right_thigh_bones[0],
-                right_shin_bones[0],
-                right_leg_effector,
-                'R'
-            )
+                # Remove the leftovers of partially built limbs
+                for bone_name in stale_bone_names:
+                    bone = obj.data.edit_bones.get(bone_name)
+                    if bone:
+                        obj.data.edit_bones.remove(bone)
 
-            # Add constraints for the left arm
-            add_constraints(
-                'Arm',
-                left_upper_arm_bones[0],
-                left_forearm_bones[0],
-                left_arm_effector,
-                'L'
-            )
+                for limb in limbs_to_build:
+                    setup_ik(*limb)
 
-            # # Add constraints for the right arm
-            add_constraints(
-                'Arm',
-                right_upper_arm_bones[0],
-                right_forearm_bones[0],
-                right_arm_effector,
-                'R'
-            )
+                # Switch back to Object Mode
+                bpy.ops.object.mode_set(mode='OBJECT')
+                invalidate_skeleton(armature)
+
+                mark_phase("Constraints")
+                for limb in limbs_to_build:
+                    add_constraints(*limb)
+
+                    # Only record limbs that were fully built, so a failed limb is retried next time
+                    if limb_is_complete(armature, *limb):
+                        limbs_state[f"{limb[0]}_{limb[4]}"] = {"proximal": limb[1], "distal": limb[2], "effector": limb[3] or ""}
+
+                save_rig_state(armature, rig_state)
 
             #####################################################
             # BONE SHAPE IMPORT
             #####################################################
 
-            # Get the path to the assets folder in the plugin directory
-            addon_dir = os.path.dirname(__file__)
-            asset_path = os.path.join(addon_dir, "assets", "GmBones.blend")
-        
-            # Check if the file exists
-            if not os.path.exists(asset_path):
-                self.report({'ERROR'}, f"GmBones file not found: {asset_path}")
+            mark_phase("GmBones import")
+            error = import_gm_bones()
+            if error:
+                self.report({'ERROR'}, error)
                 return {'CANCELLED'}
 
-            # Check if the GmBones collection is already imported
-            gm_bones_collection = bpy.data.collections.get("GmBones")
-            if gm_bones_collection is None or len(gm_bones_collection.objects) == 0:   
-                # Create or get the GmBones collection
-                gm_bones_collection = bpy.data.collections.get("GmBones")
-                if gm_bones_collection is None:
-                    gm_bones_collection = bpy.data.collections.new("GmBones")
-                    bpy.context.scene.collection.children.link(gm_bones_collection)
-
-                # Append all objects from the GmBones file
-                with bpy.data.libraries.load(asset_path, link=False) as (data_from, data_to):
-                    data_to.objects = data_from.objects
-
-                # Link imported objects to the GmBones collection
-                for obj in data_to.objects:
-                    if obj is not None:
-                        gm_bones_collection.objects.link(obj)
-        
-                # Hide the GmBones collection in the viewport
-                gm_bones_collection.hide_viewport = True
-                gm_bones_collection.hide_render = True
-            else:
-                self.report({'WARNING'}, "GmBones collection already imported.")
-
             #####################################################
             # BONE SHAPE AND BONE COLLECTIONS SETUP
             #####################################################
 
             # Define the bones assigned to collections as lists
-            # FK 
+            # FK
             FK_Leg_L = [
                 left_foot_bones[0],
                 left_shin_bones[0],
@@ -490,7 +750,7 @@ class OBJECT_OT_GhostMasterIK(bpy.types.Operator):
                 right_forearm_bones[0],
                 right_upper_arm_bones[0]
             ]
-            
+
             # IK
             IK_Leg_L = [
                 "L-Foot-Ik",
@@ -511,7 +771,7 @@ class OBJECT_OT_GhostMasterIK(bpy.types.Operator):
                 "R-Hand-Ik",
                 "R-Elbow-Pole"
             ]
-            
+
             # Proxy
             PROXY_Leg_L = [
                 left_shin_bones[0] + '_proxy',
@@ -533,7 +793,7 @@ class OBJECT_OT_GhostMasterIK(bpy.types.Operator):
                 right_forearm_bones[0] + '_proxy'
             ]
 
-            # effBones collections 
+            # effBones collections
 
             # Initialize variables
             effBone_Leg_L = []
@@ -544,40 +804,36 @@ class OBJECT_OT_GhostMasterIK(bpy.types.Operator):
             # Use the automatically discovered effectors
             if left_leg_effector:
                 effBone_Leg_L.append(left_leg_effector)
-                print(f"Added {left_leg_effector} to collection")
 
             if right_leg_effector:
                 effBone_Leg_R.append(right_leg_effector)
-                print(f"Added {right_leg_effector} to collection")
 
             if left_arm_effector:
                 effBone_Arm_L.append(left_arm_effector)
-                print(f"Added {left_arm_effector} to collection")
 
             if right_arm_effector:
                 effBone_Arm_R.append(right_arm_effector)
-                print(f"Added {right_arm_effector} to collection")
 
 
             # Check if bone collections are already created, if not, create them
+            mark_phase("Bone collections")
+            created_collections = []
 
             #add collection function
             def add_collection (name, parent = None):
-                obj = bpy.context.object
-                result = obj.data.collections_all.get(name)
+                result = armature.data.collections_all.get(name)
                 if result is None:
                     if parent is None:
-                        result = obj.data.collections.new(name)
+                        result = armature.data.collections.new(name)
                     else:
-                        result = obj.data.collections.new(name, parent=parent)
-                else:
-                    print(f"Warning: {name} collection already exists.")
+                        result = armature.data.collections.new(name, parent=parent)
+                    created_collections.append(name)
                 return result
-                
+
             # Add the collections
             bcoll_Gm_Rig   = add_collection("GM Rig")
             bcoll_Main     = add_collection("Main", parent=bcoll_Gm_Rig)
-            
+
             bcoll_FK       = add_collection("FK", parent=bcoll_Gm_Rig)
             bcoll_FK_Leg_L = add_collection("FK_Leg_L", parent=bcoll_FK)
             bcoll_FK_Leg_R = add_collection("FK_Leg_R", parent=bcoll_FK)
@@ -589,7 +845,7 @@ class OBJECT_OT_GhostMasterIK(bpy.types.Operator):
             bcoll_IK_Leg_R = add_collection("IK_Leg_R", parent=bcoll_IK)
             bcoll_IK_Arm_L = add_collection("IK_Arm_L", parent=bcoll_IK)
             bcoll_IK_Arm_R = add_collection("IK_Arm_R", parent=bcoll_IK)
-            
+
             bcoll_Extra    = add_collection("Extra", parent=bcoll_Gm_Rig)
             bcoll_Unused   = add_collection("Unused", parent=bcoll_Extra)
 
@@ -606,36 +862,36 @@ class OBJECT_OT_GhostMasterIK(bpy.types.Operator):
             bcoll_EffBones_Arm_R = add_collection("EffBones_Arm_R", parent=bcoll_EffBones)
 
 
-            # Start by assigning every bone in armature to the Extra collection
+            # Only bones that are not in any rig collection yet get sorted, bones from previous runs keep their collections
+            new_bone_names = set()
             for bone in armature.data.bones:
-                bcoll_Unused.assign(armature.pose.bones.get(bone.name))
-
-            # Assign custom shapes to bones based on object names
-            for obj in bpy.data.objects:
-                # Check if the object name starts with "GmBons-"
-                if obj.name.startswith("GmBons-"):
-                    # Extract the bone name from the object name
-                    bone_name = obj.name[7:]  # Remove "GmBons-" from the name
-                    
-                    # Check if the armature has a bone with the extracted name
-                    if bone_name in armature.data.bones:
-                        bone = armature.pose.bones.get(bone_name)
-                        
-                        # Assign the object as the custom shape for the bone
-                        bone.custom_shape = obj                       
-                        # Assign bone as Main collection
-                        bcoll_Main.assign(bone)
+                if not any(c.name in RIG_COLLECTION_NAMES for c in bone.collections):
+                    new_bone_names.add(bone.name)
+
+            # Start by assigning every new bone to the Unused collection
+            for bone_name in new_bone_names:
+                bcoll_Unused.assign(armature.pose.bones.get(bone_name))
+
+            # Assign custom shapes to bones based on object names ("GmBons-" + bone name)
+            count(objects=len(armature.pose.bones))
+            for pose_bone in armature.pose.bones:
+                shape = bpy.data.objects.get("GmBons-" + pose_bone.name)
+                if shape:
+                    if pose_bone.custom_shape != shape:
+                        pose_bone.custom_shape = shape
+                    # Assign bone as Main collection
+                    if pose_bone.name in new_bone_names:
+                        bcoll_Main.assign(pose_bone)
 
             # Assign bone collection from list function
             def assign_bone_collection_from_list(bone_list, collection_name):
-                armature = bpy.context.object
-                bcoll_Main = armature.data.collections_all["Main"]
-                bcoll_Unused = armature.data.collections_all["Unused"]
                 target_collection = armature.data.collections_all[collection_name]
 
                 for bone_name in bone_list:
                     if bone_name in armature.data.bones:
                         bone = armature.pose.bones[bone_name]
+                        if any(c.name == collection_name for c in bone.bone.collections):
+                            continue
                         if any(c.name == "Main" for c in bone.bone.collections):
                             bcoll_Main.unassign(bone)
                         else:
@@ -643,7 +899,7 @@ class OBJECT_OT_GhostMasterIK(bpy.types.Operator):
                         target_collection.assign(bone)
                     else:
                         print(f"Bone '{bone_name}' not found in the armature.")
-           
+
             # Assign bones to their respective collections
             # FK
             assign_bone_collection_from_list(FK_Leg_L, "FK_Leg_L")
@@ -670,28 +926,25 @@ class OBJECT_OT_GhostMasterIK(bpy.types.Operator):
             assign_bone_collection_from_list(effBone_Arm_R, "EffBones_Arm_R")
 
 
-            # Hide collections 
-
-            # IK
-            bcoll_IK_Leg_L.is_visible = False
-            bcoll_IK_Leg_R.is_visible = False
-            bcoll_IK_Arm_L.is_visible = False
-            bcoll_IK_Arm_R.is_visible = False
-
-            # Proxy
-            bcoll_Proxy_Leg_L.is_visible = False
-            bcoll_Proxy_Leg_R.is_visible = False
-            bcoll_Proxy_Arm_L.is_visible = False
-            bcoll_Proxy_Arm_R.is_visible = False
-
-            # EffBones
-            bcoll_EffBones_Leg_L.is_visible = False
-            bcoll_EffBones_Leg_R.is_visible = False
-            bcoll_EffBones_Arm_L.is_visible = False
-            bcoll_EffBones_Arm_R.is_visible = False
-
-            # Unused
-            bcoll_Unused.is_visible = False
+            # Hide collections, only when they are created so reruns keep the current FK/IK display
+            hidden_collections = {
+                # IK
+                "IK_Leg_L", "IK_Leg_R", "IK_Arm_L", "IK_Arm_R",
+                # Proxy
+                "Proxy_Leg_L", "Proxy_Leg_R", "Proxy_Arm_L", "Proxy_Arm_R",
+                # EffBones
+                "EffBones_Leg_L", "EffBones_Leg_R", "EffBones_Arm_L", "EffBones_Arm_R",
+                # Unused
+                "Unused",
+            }
+            for name in created_collections:
+                if name in hidden_collections:
+                    armature.data.collections_all[name].is_visible = False
+
+            if limbs_to_build:
+                self.report({'INFO'}, f"Rig setup built {len(limbs_to_build)} limbs.")
+            else:
+                self.report({'INFO'}, "Rig setup already up to date.")
 
         else:
             self.report({'ERROR'}, "Select an armature object")
@@ -872,6 +1125,11 @@ class OBJECT_OT_DeleteRigSetup(bpy.types.Operator):
 
             # Switch back to Object Mode
             bpy.ops.object.mode_set(mode='OBJECT')
+            invalidate_skeleton(armature)
+
+            # Forget the recorded rig state so the next setup starts from scratch
+            if RIG_STATE_KEY in armature:
+                del armature[RIG_STATE_KEY]
 
             # Remove the everything in the GmBones collection and then the collection itself
             gm_bones_collection = bpy.data.collections.get("GmBones")
@@ -883,62 +1141,171 @@ class OBJECT_OT_DeleteRigSetup(bpy.types.Operator):
         return {'FINISHED'}
 
 
-           
-def sanity_check():
-    issues = []
+class OBJECT_OT_CaptureRigTemplate(bpy.types.Operator):
+    """Store the rig setup of the selected armature as a template for armatures with the same skeleton"""
+    bl_idname = "object.capture_rig_template"
+    bl_label = "Capture Rig Template"
+    bl_options = {'REGISTER', 'UNDO'}
 
-    # Check for meshes with more than one material
-    for obj in bpy.data.objects:
-        if obj.type == 'MESH' and len(obj.data.materials) > 1:
-            issues.append(f"The mesh '{obj.name}' has more than one material.")
+    def execute(self, context):
+        obj = context.object
+        if not obj or obj.type != 'ARMATURE':
+            self.report({'ERROR'}, "Select an armature object")
+            return {'CANCELLED'}
 
-    # Check for one root bone at default values and no animation
-    root_bone = None
-    for obj in bpy.data.objects:
-        if obj.type == 'ARMATURE':
-            for bone in obj.data.bones:
-                if bone.parent is None:  # Root bone
-                    if root_bone:
-                        issues.append(f"More than one root bone found in '{obj.name}'.")
-                    else:
-                        root_bone = bone
-                        bone_pose = obj.pose.bones[bone.name]
-                        if not (round(bone_pose.location.x, 3) == 0 and
-                                round(bone_pose.location.y, 3) == 0 and
-                                round(bone_pose.location.z, 3) == 0):
-                            issues.append(f"The root bone '{bone.name}' does not have the default location (0, 0, 0).")
-                        if not (round(bone_pose.rotation_euler.x, 3) == 0 and
-                                round(bone_pose.rotation_euler.y, 3) == 0 and
-                                round(bone_pose.rotation_euler.z, 3) == 0):
-                            issues.append(f"The root bone '{bone.name}' does not have the default rotation (0, 0, 0).")
-
-                        if bone.name in [action.name for action in bpy.data.actions]:
-                            issues.append(f"The root bone '{bone.name}' has animation data.")
-
-    if not root_bone:
-        issues.append("No root bone found.")
-
-    # Check that all bones are under the root bone's hierarchy
-    if root_bone:
-        for obj in bpy.data.objects:
-            if obj.type == 'ARMATURE':
-                for bone in obj.data.bones:
-                    if bone.parent is None and bone != root_bone:
-                        issues.append(f"The bone '{bone.name}' is not under the root bone '{root_bone.name}'.")
-
-    # Check that the scale of all bones is 1,1,1
-    for obj in bpy.data.objects:
-        if obj.type == 'ARMATURE':
-            for bone in obj.pose.bones:
-                if not all(round(s, 3) == 1.0 for s in bone.scale):
-                    issues.append(f"The bone '{bone.name}' does not have a scale of 1,1,1.")
+        if not get_rig_state(obj).get("limbs"):
+            self.report({'WARNING'}, f"{obj.name} has no rig setup to capture")
+            return {'CANCELLED'}
 
-    # Check for actions with only one keyframe
-    for action in bpy.data.actions:
-        if len(action.fcurves) == 1 and all(len(fc.keyframe_points) == 1 for fc in action.fcurves):
-            issues.append(f"The action '{action.name}' has only one keyframe.")
+        fingerprint = skeleton_fingerprint(obj)
+        store_rig_template(fingerprint, capture_rig_template(obj))
+        self.report({'INFO'}, f"Captured rig template from {obj.name}")
+        return {'FINISHED'}
 
-    return issues
+
+#####################################################
+# ACTION RETARGETING
+#####################################################
+
+# Matches the bone name in fcurve data paths like pose.bones["MDL-lfoot"].rotation_quaternion
+POSE_BONE_PATH = re.compile(r'^pose\.bones\["((?:[^"\\]|\\.)*)"\]')
+
+# Translation maps already built, keyed by the bone picked for each role on the target
+bone_translation_cache = {}
+
+def build_bone_translation_map(target_bones):
+    """Maps every alternative bone name to the one used by the target armature for the same role.
+    Alternatives that are bones of the target too, e.g. MDL-J-L-PalmBone1 next to MDL-jnt-L-HandBone, keep their curves."""
+    resolved = tuple(
+        next((name for name in alternatives if name in target_bones), None)
+        for alternatives in bone_role_alternatives
+    )
+    present = frozenset(name for alternatives in bone_role_alternatives for name in alternatives if name in target_bones)
+
+    key = (resolved, present)
+    translation = bone_translation_cache.get(key)
+    if translation is None:
+        translation = {}
+        for alternatives, target_name in zip(bone_role_alternatives, resolved):
+            if target_name is None:
+                continue
+            for name in alternatives:
+                if name not in present:
+                    translation[name] = target_name
+        bone_translation_cache[key] = translation
+
+    return translation
+
+def retarget_action(action, translation):
+    """Rewrites the fcurve data paths and groups of action to the target bone names.
+    Returns the number of remapped fcurves and the number skipped because the target already had them."""
+    existing = {(fc.data_path, fc.array_index) for fc in action.fcurves}
+    remapped = 0
+    skipped = 0
+
+    for fc in action.fcurves:
+        match = POSE_BONE_PATH.match(fc.data_path)
+        if not match:
+            continue
+        new_bone = translation.get(match.group(1))
+        if not new_bone:
+            continue
+
+        new_path = f'pose.bones["{new_bone}"]' + fc.data_path[match.end():]
+        if (new_path, fc.array_index) in existing:
+            skipped += 1
+            continue
+
+        existing.discard((fc.data_path, fc.array_index))
+        existing.add((new_path, fc.array_index))
+        fc.data_path = new_path
+        remapped += 1
+
+    # Keep the channel groups named after the bones they animate
+    for group in action.groups:
+        new_name = translation.get(group.name)
+        if new_name and new_name not in action.groups:
+            group.name = new_name
+
+    return remapped, skipped
+
+
+class OBJECT_OT_RetargetActions(bpy.types.Operator):
+    """Remap actions to the bone names of the selected Ghost Master armature"""
+    bl_idname = "object.retarget_actions"
+    bl_label = "Retarget Actions"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    scope: bpy.props.EnumProperty(
+        name="Actions",
+        items=[
+            ('ACTIVE', "Active Action", "Only retarget the armature's active action"),
+            ('ALL', "All Actions", "Retarget every action in the file that is not the active action of another object"),
+        ],
+        default='ACTIVE',
+    )
+
+    def execute(self, context):
+        obj = context.object
+        if not obj or obj.type != 'ARMATURE':
+            self.report({'ERROR'}, "Select an armature object")
+            return {'CANCELLED'}
+
+        if self.scope == 'ACTIVE':
+            action = obj.animation_data.action if obj.animation_data else None
+            if not action:
+                self.report({'WARNING'}, f"{obj.name} has no active action")
+                return {'CANCELLED'}
+            actions = [action]
+        else:
+            # Actions playing on other objects belong to them
+            other_actions = {
+                other.animation_data.action
+                for other in bpy.data.objects
+                if other != obj and other.animation_data and other.animation_data.action
+            }
+            actions = [action for action in bpy.data.actions if action not in other_actions]
+
+        translation = build_bone_translation_map(obj.data.bones)
+
+        total_remapped = 0
+        total_skipped = 0
+        touched_actions = 0
+        for action in actions:
+            if action.library:
+                continue
+            remapped, skipped = retarget_action(action, translation)
+            total_remapped += remapped
+            total_skipped += skipped
+            if remapped:
+                touched_actions += 1
+
+        if total_skipped:
+            self.report({'WARNING'}, f"{total_skipped} curves skipped, {obj.name} bones were already animated in those actions")
+        self.report({'INFO'}, f"Retargeted {total_remapped} curves in {touched_actions} actions")
+        return {'FINISHED'}
+
+
+def sanity_check():
+    # Read what the rules need from the file, the rules themselves live in core.py
+    meshes = []
+    armatures = []
+    for obj in bpy.data.objects:
+        if obj.type == 'MESH':
+            meshes.append(MeshInfo(obj.name, len(obj.data.materials)))
+        elif obj.type == 'ARMATURE':
+            root_bones = []
+            for bone_name in get_skeleton(obj).root_names():
+                bone_pose = obj.pose.bones[bone_name]
+                root_bones.append(RootBoneInfo(bone_name, tuple(bone_pose.location), tuple(bone_pose.rotation_euler)))
+            armatures.append(ArmatureInfo(obj.name, root_bones, find_unscaled_pose_bones(obj)))
+
+    actions = [
+        ActionInfo(action.name, [len(fc.keyframe_points) for fc in action.fcurves])
+        for action in bpy.data.actions
+    ]
+
+    return sanity_issues(meshes, armatures, actions)
 
 # Button for the Sanity Check in the UI
 class OBJECT_OT_SanityCheck(bpy.types.Operator):
@@ -957,10 +1324,19 @@ class OBJECT_OT_SanityCheck(bpy.types.Operator):
         return {'FINISHED'}
 
 
+@persistent
+def animation_load_post(*args):
+    # Templates live in the file's text block, the next file has its own
+    rig_template_cache.clear()
+
+
 def register():
+    bpy.app.handlers.load_post.append(animation_load_post)
     bpy.utils.register_class(OBJECT_OT_GhostMasterIK)
     bpy.utils.register_class(OBJECT_OT_DeleteRigSetup)
     bpy.utils.register_class(OBJECT_OT_SanityCheck)
+    bpy.utils.register_class(OBJECT_OT_RetargetActions)
+    bpy.utils.register_class(OBJECT_OT_CaptureRigTemplate)
 
     bpy.utils.register_class(OBJECT_OT_SwitchLeg_L_FKIK)
     bpy.utils.register_class(OBJECT_OT_SwitchLeg_R_FKIK)
@@ -968,9 +1344,13 @@ def register():
     bpy.utils.register_class(OBJECT_OT_SwitchArm_R_FKIK)
 
 def unregister():
+    bpy.app.handlers.load_post.remove(animation_load_post)
+    rig_template_cache.clear()
     bpy.utils.unregister_class(OBJECT_OT_GhostMasterIK)
     bpy.utils.unregister_class(OBJECT_OT_DeleteRigSetup)
     bpy.utils.unregister_class(OBJECT_OT_SanityCheck)
+    bpy.utils.unregister_class(OBJECT_OT_RetargetActions)
+    bpy.utils.unregister_class(OBJECT_OT_CaptureRigTemplate)
 
     bpy.utils.unregister_class(OBJECT_OT_SwitchLeg_L_FKIK)
     bpy.utils.unregister_class(OBJECT_OT_SwitchLeg_R_FKIK)
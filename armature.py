@@ -1,4 +1,29 @@
 import bpy
+from .journal import journaled, recording, MISSING
+from .schema import sync_pose_bone
+
+
+def set_null_boxes(context, obj, bone_name, value, label):
+    """Sets the NullBoxes tag of a bone on its pose bone and on the bone itself.
+
+    The bone is written directly, or through its edit bone in Edit mode, no mode switch is
+    needed: a nested mode_set would push its own global undo step past the journal."""
+    with recording(context, label) as journal:
+        # Apply to Pose mode bone
+        if bone_name in obj.pose.bones:
+            journal.set_item(obj, f'pose.bones["{bone_name}"]', "NullBoxes", value)
+            sync_pose_bone(obj.pose.bones[bone_name])
+
+        if obj.mode == 'EDIT':
+            # Leaving Edit mode writes the edit bones over the bones, that is where the journal restores it
+            if bone_name in obj.data.edit_bones:
+                edit_bone = obj.data.edit_bones[bone_name]
+                old_value = edit_bone.get("NullBoxes", MISSING)
+                edit_bone["NullBoxes"] = value
+                # Recorded on the bone, the journal writes the edit bone while in Edit mode
+                journal.record_item(obj.data, f'bones["{bone_name}"]', "NullBoxes", old_value, value)
+        elif bone_name in obj.data.bones:
+            journal.set_item(obj.data, f'bones["{bone_name}"]', "NullBoxes", value)
 
 class ARMATURE_OT_SetHeadbone(bpy.types.Operator):
     """Set selected bone as MDL-jnt-HEADBONE"""
@@ -15,58 +40,32 @@ class ARMATURE_OT_SetHeadbone(bpy.types.Operator):
             self.report({'WARNING'}, "No active bone selected in Pose or Edit mode")
         return {'FINISHED'}
 
+@journaled
 class ARMATURE_OT_SetChainpoint(bpy.types.Operator):
     """Set selected bone's NullBoxes property to CHAINPOINT"""
     bl_idname = "armature.set_chainpoint"
     bl_label = "Set Chainpoint"
-    bl_options = {'REGISTER', 'UNDO'}
+    bl_options = {'REGISTER'}
 
     def execute(self, context):
         obj = context.object
         if obj and obj.type == 'ARMATURE' and context.active_bone:
-            bone_name = context.active_bone.name
-
-            # Apply to Pose mode bone
-            if bone_name in obj.pose.bones:
-                pose_bone = obj.pose.bones[bone_name]
-                pose_bone["NullBoxes"] = "CHAINPOINT"
-
-            # Temporarily switch to Edit mode to modify the Edit mode bone
-            bpy.ops.object.mode_set(mode='EDIT')
-            if bone_name in obj.data.edit_bones:
-                edit_bone = obj.data.edit_bones[bone_name]
-                edit_bone["NullBoxes"] = "CHAINPOINT"
-            # Switch back to Pose mode
-            bpy.ops.object.mode_set(mode='POSE')
-
+            set_null_boxes(context, obj, context.active_bone.name, "CHAINPOINT", "Set Chainpoint")
         else:
             self.report({'WARNING'}, "No active bone selected in Pose or Edit mode")
         return {'FINISHED'}
 
+@journaled
 class ARMATURE_OT_SetSpellPoint(bpy.types.Operator):
     """Set selected bone's NullBoxes property to SPELLPOINT"""
     bl_idname = "armature.set_spellpoint"
     bl_label = "Set SpellPoint"
-    bl_options = {'REGISTER', 'UNDO'}
+    bl_options = {'REGISTER'}
 
     def execute(self, context):
         obj = context.object
         if obj and obj.type == 'ARMATURE' and context.active_bone:
-            bone_name = context.active_bone.name
-
-            # Apply to Pose mode bone
-            if bone_name in obj.pose.bones:
-                pose_bone = obj.pose.bones[bone_name]
-                pose_bone["NullBoxes"] = "SPELLPOINT"
-
-            # Temporarily switch to Edit mode to modify the Edit mode bone
-            bpy.ops.object.mode_set(mode='EDIT')
-            if bone_name in obj.data.edit_bones:
-                edit_bone = obj.data.edit_bones[bone_name]
-                edit_bone["NullBoxes"] = "SPELLPOINT"
-            # Switch back to Pose mode
-            bpy.ops.object.mode_set(mode='POSE')
-
+            set_null_boxes(context, obj, context.active_bone.name, "SPELLPOINT", "Set SpellPoint")
         else:
             self.report({'WARNING'}, "No active bone selected in Pose or Edit mode")
         return {'FINISHED'}
@@ -0,0 +1,145 @@
+# Headless sanity check runner for folders of .blend files
+
+# Runs sanity_check() from animation.py on every .blend file of a folder,
+# each file in its own Blender background process, and writes a JSON or CSV report.
+#
+# Usage (from a normal Python or from Blender itself):
+#   python batch_sanity.py <folder> --blender <path to blender> --report report.json
+#   python batch_sanity.py <folder> --report report.csv --jobs 8 --recursive
+#
+# Exits with 0 when every file passed, 1 when issues were found or a file failed to load.
+
+import argparse
+import csv
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+ADDON_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKER_FLAG = "--gm-sanity-worker"
+
+
+def run_worker(output_path):
+    """Runs inside Blender: checks the currently open file and dumps the issues to output_path."""
+    import bpy
+
+    # Import the add-on as a package so its relative imports resolve
+    sys.path.insert(0, os.path.dirname(ADDON_DIR))
+    animation = importlib.import_module(os.path.basename(ADDON_DIR) + ".animation")
+    sanity_check = animation.sanity_check
+
+    result = {
+        "file": bpy.data.filepath,
+        "issues": sanity_check(),
+    }
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+
+def find_blend_files(folder, recursive):
+    """Lists the .blend files of folder, sorted for stable reports."""
+    blend_files = []
+    if recursive:
+        for root, _dirs, files in os.walk(folder):
+            for name in files:
+                if name.lower().endswith(".blend"):
+                    blend_files.append(os.path.join(root, name))
+    else:
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            if name.lower().endswith(".blend") and os.path.isfile(path):
+                blend_files.append(path)
+    return sorted(blend_files)
+
+
+def check_file(blender, blend_path, timeout):
+    """Checks one .blend file in a background Blender and returns its report entry."""
+    fd, output_path = tempfile.mkstemp(suffix=".json", prefix="gm_sanity_")
+    os.close(fd)
+
+    command = [
+        blender, "-b", "--factory-startup", blend_path,
+        "--python", os.path.abspath(__file__),
+        "--", WORKER_FLAG, output_path,
+    ]
+
+    proc = None
+    try:
+        proc = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+        with open(output_path, encoding="utf-8") as f:
+            result = json.load(f)
+        result["file"] = blend_path
+        result["status"] = "FAIL" if result["issues"] else "PASS"
+    except subprocess.TimeoutExpired:
+        result = {"file": blend_path, "status": "ERROR", "issues": [f"Timed out after {timeout}s"]}
+    except (OSError, ValueError):
+        # The worker never wrote its result, the file most likely failed to open
+        error = proc.stderr.strip().splitlines()[-1:] if proc and proc.stderr else []
+        result = {"file": blend_path, "status": "ERROR", "issues": error or ["Blender did not produce a result"]}
+    finally:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+    return result
+
+
+def write_report(results, report_path):
+    """Writes the results as CSV if report_path ends with .csv, as JSON otherwise."""
+    if report_path.lower().endswith(".csv"):
+        with open(report_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["file", "status", "issue"])
+            for result in results:
+                if result["issues"]:
+                    for issue in result["issues"]:
+                        writer.writerow([result["file"], result["status"], issue])
+                else:
+                    writer.writerow([result["file"], result["status"], ""])
+    else:
+        summary = {
+            "files": len(results),
+            "passed": sum(1 for r in results if r["status"] == "PASS"),
+            "failed": sum(1 for r in results if r["status"] == "FAIL"),
+            "errors": sum(1 for r in results if r["status"] == "ERROR"),
+        }
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "results": results}, f, indent=2)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Run the Ghost Master sanity check over a folder of .blend files.")
+    parser.add_argument("folder", help="Folder containing the .blend files")
+    parser.add_argument("--blender", default=os.environ.get("BLENDER", "blender"), help="Blender executable")
+    parser.add_argument("--report", default="sanity_report.json", help="Report path, .json or .csv")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Number of Blender processes")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds allowed per file")
+    parser.add_argument("--recursive", action="store_true", help="Also check sub folders")
+    args = parser.parse_args(argv)
+
+    blend_files = find_blend_files(args.folder, args.recursive)
+    if not blend_files:
+        print(f"No .blend files found in {args.folder}")
+        return 0
+
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        results = list(pool.map(lambda path: check_file(args.blender, path, args.timeout), blend_files))
+
+    write_report(results, args.report)
+
+    bad = [r for r in results if r["status"] != "PASS"]
+    for result in bad:
+        print(f"{result['status']}: {result['file']} ({len(result['issues'])} issues)")
+    print(f"Checked {len(results)} files, {len(bad)} with problems. Report written to {args.report}")
+
+    return 1 if bad else 0
+
+
+if __name__ == "__main__":
+    if WORKER_FLAG in sys.argv:
+        run_worker(sys.argv[sys.argv.index(WORKER_FLAG) + 1])
+    else:
+        sys.exit(main(sys.argv[1:]))
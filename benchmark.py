@@ -0,0 +1,265 @@
+# Headless benchmarks for the GM Tools operators and update callbacks
+
+# Builds synthetic maps, entities and armatures at several sizes and times the add-on against them.
+#
+# Usage:
+#   blender -b --factory-startup --python benchmark.py -- --sizes 100,1000,5000 --output bench.json
+#   blender -b --factory-startup --python benchmark.py -- --output new.json --compare old.json
+#
+# Every benchmark runs --repeat times and keeps the best time, results are written as JSON
+# so two runs (e.g. two releases) can be compared with --compare.
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import bpy
+
+ADDON_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_addon():
+    """Imports and registers the add-on package this file belongs to."""
+    sys.path.insert(0, os.path.dirname(ADDON_DIR))
+    addon = importlib.import_module(os.path.basename(ADDON_DIR))
+    try:
+        addon.register()
+    except ValueError:
+        pass  # already registered, e.g. enabled in the user preferences
+    addon.ensure_rig_tools()
+    return addon
+
+def addon_module(name):
+    return importlib.import_module(os.path.basename(ADDON_DIR) + "." + name)
+
+
+#####################################################
+# SYNTHETIC SCENES
+#####################################################
+
+def clear_scene():
+    for obj in list(bpy.data.objects):
+        bpy.data.objects.remove(obj, do_unlink=True)
+    for collection in (bpy.data.meshes, bpy.data.armatures, bpy.data.materials, bpy.data.actions):
+        for datablock in list(collection):
+            collection.remove(datablock)
+    for coll in list(bpy.data.collections):
+        bpy.data.collections.remove(coll)
+
+def make_quad_mesh(name):
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata([(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0)], [], [(0, 1, 2, 3)])
+    return mesh
+
+def build_map(mesh_count, seed=0):
+    """Creates mesh_count map meshes spread over 6 floors, tagged like an imported Ghost Master map."""
+    rng = random.Random(seed)
+    scene = bpy.context.scene
+    snow = bpy.data.materials.new("mat_2pssnow2")
+    plain = bpy.data.materials.new("mat_wall")
+
+    for i in range(mesh_count):
+        obj = bpy.data.objects.new(f"map_{i}", make_quad_mesh(f"map_{i}"))
+        scene.collection.objects.link(obj)
+        floor = rng.randint(1, 6)
+        obj.location = (rng.uniform(-50, 50), rng.uniform(-50, 50), floor * 3.0)
+        obj.data.materials.append(snow if rng.random() < 0.1 else plain)
+
+        obj["FLOORS"] = str(floor) if rng.random() < 0.8 else f"{floor},{min(floor + 1, 6)}"
+        if rng.random() < 0.1:
+            obj["FLAGS0"] = "INVISIBLE"
+        if rng.random() < 0.1:
+            obj["IS_COLLIDER"] = "TRUE"
+
+def build_entities(entity_count, nullbox_count, seed=0):
+    """Creates entity empties with clump_floor_flags, each with nullbox_count nullbox children."""
+    rng = random.Random(seed)
+    scene = bpy.context.scene
+    entities = []
+
+    for i in range(entity_count):
+        entity = bpy.data.objects.new(f"MDL-entity_{i}", None)
+        scene.collection.objects.link(entity)
+        entity["clump_floor_flags"] = str(rng.randint(1, 6))
+        for j in range(nullbox_count):
+            nullbox = bpy.data.objects.new(f"MDL-AP{j}_entity_{i}", None)
+            scene.collection.objects.link(nullbox)
+            nullbox.parent = entity
+            nullbox.location = (rng.uniform(-1, 1), rng.uniform(-1, 1), rng.uniform(0, 2))
+            nullbox["nullboxes"] = rng.choice(["SPELLPOINT", "CHAINPOINT", "ATTACH"])
+            nullbox["nullbox_ids"] = str(j)
+        entities.append(entity)
+
+    return entities
+
+def build_armature(variant, extra_bones=0):
+    """Creates a GM armature using the variant-th alternative name of every bone role."""
+    animation = addon_module("animation")
+    roles = [alternatives[min(variant, len(alternatives) - 1)] for alternatives in animation.bone_role_alternatives]
+    (r_upper, r_fore, l_upper, l_fore, r_thigh, r_shin, l_thigh, l_shin,
+     l_hand, l_wrist, r_hand, r_wrist, l_foot, r_foot) = roles
+
+    data = bpy.data.armatures.new(f"GM_Armature_{variant}")
+    obj = bpy.data.objects.new(f"GM_Armature_{variant}", data)
+    bpy.context.scene.collection.objects.link(obj)
+    bpy.context.view_layer.objects.active = obj
+    bpy.ops.object.mode_set(mode='EDIT')
+
+    def add_bone(name, head, tail, parent=None):
+        bone = data.edit_bones.new(name)
+        bone.head = head
+        bone.tail = tail
+        if parent:
+            bone.parent = data.edit_bones[parent]
+        return name
+
+    god = add_bone("MDL-GOD", (0, 0, 0), (0, 0.2, 0))
+    pelvis = add_bone("MDL-pelvis", (0, 0, 1.0), (0, 0, 1.2), god)
+    chest = add_bone("MDL-chest", (0, 0, 1.2), (0, 0, 1.6), pelvis)
+
+    # Legs: thigh > shin > ankle (effector) > ball > foot, the effector is 2 bones above the foot
+    for side, x, thigh, shin, foot in (("L", 0.2, l_thigh, l_shin, l_foot), ("R", -0.2, r_thigh, r_shin, r_foot)):
+        add_bone(thigh, (x, 0, 1.0), (x, 0, 0.5), pelvis)
+        add_bone(shin, (x, 0, 0.5), (x, 0, 0.1), thigh)
+        add_bone(f"MDL-{side}-ankle", (x, 0, 0.1), (x, -0.1, 0.05), shin)
+        add_bone(f"MDL-{side}-ball", (x, -0.1, 0.05), (x, -0.15, 0.0), f"MDL-{side}-ankle")
+        add_bone(foot, (x, -0.15, 0.0), (x, -0.2, 0.0), f"MDL-{side}-ball")
+
+    # Arms: upper > forearm > wrist (effector) > palm > hand
+    for x, upper, fore, wrist, hand in ((0.2, l_upper, l_fore, l_wrist, l_hand), (-0.2, r_upper, r_fore, r_wrist, r_hand)):
+        sign = 1 if x > 0 else -1
+        add_bone(upper, (x, 0, 1.5), (x + sign * 0.3, 0, 1.5), chest)
+        add_bone(fore, (x + sign * 0.3, 0, 1.5), (x + sign * 0.6, 0, 1.5), upper)
+        add_bone(wrist, (x + sign * 0.6, 0, 1.5), (x + sign * 0.65, 0, 1.5), fore)
+        add_bone(f"{wrist}-palm", (x + sign * 0.65, 0, 1.5), (x + sign * 0.7, 0, 1.5), wrist)
+        add_bone(hand, (x + sign * 0.7, 0, 1.5), (x + sign * 0.75, 0, 1.5), f"{wrist}-palm")
+
+    # Padding bones to simulate denser skeletons
+    for i in range(extra_bones):
+        add_bone(f"MDL-extra_{i}", (0, 0.1, 1.6 + i * 0.01), (0, 0.1, 1.61 + i * 0.01), chest)
+
+    bpy.ops.object.mode_set(mode='OBJECT')
+    return obj
+
+
+#####################################################
+# TIMING
+#####################################################
+
+def best_time(func, repeat):
+    """Runs func repeat times and returns the fastest wall time in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def toggle(prop):
+    """Flips a scene toggle twice so its update callback runs on both states."""
+    scene = bpy.context.scene
+    def run():
+        setattr(scene, prop, not getattr(scene, prop))
+        setattr(scene, prop, not getattr(scene, prop))
+    return run
+
+def run_map_benchmarks(size, repeat, results):
+    clear_scene()
+    build_map(size)
+    build_entities(max(1, size // 20), 10)
+
+    for prop in ("show_floor_3", "show_ice_layer", "show_invisible_flag", "show_collider_objects"):
+        results.append({"benchmark": f"toggle_{prop}", "size": size, "seconds": best_time(toggle(prop), repeat)})
+
+    def set_floor():
+        for obj in bpy.context.scene.objects:
+            obj.select_set(obj.type == 'MESH')
+        bpy.ops.object.set_floor_property()
+    results.append({"benchmark": "set_floor_property", "size": size, "seconds": best_time(set_floor, repeat)})
+
+def run_entity_benchmarks(size, repeat, results):
+    clear_scene()
+    source, target = build_entities(2, size)
+
+    def transfer():
+        bpy.ops.object.select_all(action='DESELECT')
+        source.select_set(True)
+        target.select_set(True)
+        bpy.context.view_layer.objects.active = target
+        bpy.ops.object.transfer_nullboxes()
+    # A single run, each transfer adds size nullboxes to the target
+    results.append({"benchmark": "transfer_nullboxes", "size": size, "seconds": best_time(transfer, 1)})
+
+def run_rig_benchmarks(size, repeat, results):
+    for variant in range(3):
+        clear_scene()
+        armature = build_armature(variant, extra_bones=size)
+        bpy.context.view_layer.objects.active = armature
+
+        setup = lambda: bpy.ops.object.ghost_master_ik(use_template=False)
+        results.append({"benchmark": f"rig_setup_variant_{variant}", "size": size, "seconds": best_time(setup, 1)})
+        results.append({"benchmark": f"rig_setup_rerun_variant_{variant}", "size": size, "seconds": best_time(setup, repeat)})
+
+        animation = addon_module("animation")
+        results.append({"benchmark": f"sanity_check_variant_{variant}", "size": size, "seconds": best_time(animation.sanity_check, repeat)})
+
+        results.append({"benchmark": f"delete_rig_variant_{variant}", "size": size, "seconds": best_time(bpy.ops.object.delete_rig_setup, 1)})
+
+
+def compare(results, previous_path):
+    """Prints the speed ratio of every benchmark against a previous results file."""
+    with open(previous_path, encoding="utf-8") as f:
+        previous = {(r["benchmark"], r["size"]): r["seconds"] for r in json.load(f)["results"]}
+
+    print(f"{'benchmark':40} {'size':>6} {'before':>10} {'after':>10} {'ratio':>7}")
+    for result in results:
+        before = previous.get((result["benchmark"], result["size"]))
+        if before is None:
+            continue
+        ratio = result["seconds"] / before if before else float("inf")
+        flag = "  SLOWER" if ratio > 1.1 else ""
+        print(f"{result['benchmark']:40} {result['size']:>6} {before:>10.4f} {result['seconds']:>10.4f} {ratio:>7.2f}{flag}")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the Ghost Master Tools add-on.")
+    parser.add_argument("--sizes", default="100,1000", help="Comma separated scene sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark, the best one is kept")
+    parser.add_argument("--suites", default="map,entity,rig", help="Comma separated suites to run")
+    parser.add_argument("--output", default="bench_output.json", help="Where to write the results")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    args = parser.parse_args(argv)
+
+    load_addon()
+    suites = {
+        "map": run_map_benchmarks,
+        "entity": run_entity_benchmarks,
+        "rig": run_rig_benchmarks,
+    }
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        for name in args.suites.split(","):
+            print(f"Running {name} benchmarks at size {size}")
+            suites[name](size, args.repeat, results)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "blender": bpy.app.version_string,
+            "python": platform.python_version(),
+            "timestamp": time.time(),
+            "results": results,
+        }, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main(sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else [])
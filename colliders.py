@@ -0,0 +1,178 @@
+import bpy
+import bmesh
+from .core import mesh_floors
+from .profiling import mark_phase, count
+from .schema import sync_object
+
+# Collider generation for map geometry.
+# Colliders are built straight from bmesh / evaluated meshes, without bpy.ops, so whole floors
+# can be processed in one go. Generated colliders are named "<source>_COL", re-running the
+# operator replaces them.
+
+COLLIDER_SUFFIX = "_COL"
+COLLIDER_COLLECTION = "Colliders"
+
+
+def box_collider_mesh(obj, name):
+    """Mesh of the local bounding box of obj."""
+    bm = bmesh.new()
+    verts = [bm.verts.new(corner) for corner in obj.bound_box]
+    # bound_box corner order: x-y-z bits (0,0,0), (0,0,1), (0,1,1), (0,1,0), (1,0,0), (1,0,1), (1,1,1), (1,1,0)
+    for face in ((0, 1, 2, 3), (7, 6, 5, 4), (0, 4, 5, 1), (1, 5, 6, 2), (2, 6, 7, 3), (3, 7, 4, 0)):
+        bm.faces.new([verts[i] for i in face])
+    bmesh.ops.remove_doubles(bm, verts=bm.verts, dist=0.0001)
+
+    mesh = bpy.data.meshes.new(name)
+    bm.to_mesh(mesh)
+    bm.free()
+    return mesh
+
+def hull_collider_mesh(obj, name, depsgraph):
+    """Mesh of the convex hull of obj's evaluated vertices."""
+    evaluated = obj.evaluated_get(depsgraph)
+    source = evaluated.to_mesh()
+    # Only the positions go in, the source faces and edges would stay next to the hull ones
+    bm = bmesh.new()
+    for vertex in source.vertices:
+        bm.verts.new(vertex.co)
+    evaluated.to_mesh_clear()
+    result = bmesh.ops.convex_hull(bm, input=bm.verts)
+
+    # Drop the vertices that are not on the hull surface
+    leftovers = set(result["geom_interior"]) | set(result["geom_unused"])
+    bmesh.ops.delete(bm, geom=list(leftovers), context='VERTS')
+
+    mesh = bpy.data.meshes.new(name)
+    bm.to_mesh(mesh)
+    bm.free()
+    return mesh
+
+def collider_sources(context, scope, floor):
+    """Render meshes to build colliders for, existing colliders are never used as sources."""
+    if scope == 'SELECTED':
+        objects = context.selected_objects
+    else:
+        objects = [obj for obj in context.scene.objects if "FLOORS" in obj and floor in mesh_floors(obj["FLOORS"])]
+    return [obj for obj in objects if obj.type == 'MESH' and obj.get("IS_COLLIDER") != "TRUE"]
+
+
+class OBJECT_OT_GenerateColliders(bpy.types.Operator):
+    """Generate simplified colliders from render meshes, tagged IS_COLLIDER with their source floors"""
+    bl_idname = "object.generate_colliders"
+    bl_label = "Generate Colliders"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    shape: bpy.props.EnumProperty(
+        name="Shape",
+        items=[
+            ('BOX', "Box", "Bounding box of the source mesh"),
+            ('HULL', "Convex Hull", "Convex hull of the source mesh, decimated if over the polygon budget"),
+            ('DECIMATE', "Decimate", "Copy of the source mesh decimated down to the polygon budget"),
+        ],
+        default='HULL',
+    )
+    scope: bpy.props.EnumProperty(
+        name="Scope",
+        items=[
+            ('SELECTED', "Selected", "Selected meshes"),
+            ('FLOOR', "Floor", "Every mesh tagged with the chosen floor"),
+        ],
+        default='SELECTED',
+    )
+    floor: bpy.props.EnumProperty(
+        name="Floor",
+        items=[(str(n), f"Floor {n}", "") for n in range(1, 7)],
+        default='1',
+    )
+    polygon_budget: bpy.props.IntProperty(
+        name="Polygon Budget",
+        description="Maximum number of faces of each collider",
+        default=64,
+        min=6,
+    )
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        sources = collider_sources(context, self.scope, self.floor)
+        if not sources:
+            self.report({'WARNING'}, "No render meshes to build colliders from")
+            return {'CANCELLED'}
+
+        collection = bpy.data.collections.get(COLLIDER_COLLECTION)
+        if collection is None:
+            collection = bpy.data.collections.new(COLLIDER_COLLECTION)
+            context.scene.collection.children.link(collection)
+
+        mark_phase("Build collider meshes")
+        depsgraph = context.evaluated_depsgraph_get()
+        colliders = []
+        to_decimate = []
+        for source in sources:
+            name = source.name + COLLIDER_SUFFIX
+
+            if self.shape == 'BOX':
+                mesh = box_collider_mesh(source, name)
+            elif self.shape == 'HULL':
+                mesh = hull_collider_mesh(source, name, depsgraph)
+            else:
+                mesh = source.data.copy()
+                mesh.name = name
+            mesh.materials.clear()
+
+            # Replace the collider of a previous run
+            collider = bpy.data.objects.get(name)
+            if collider and collider.get("IS_COLLIDER") == "TRUE":
+                old_mesh = collider.data
+                collider.data = mesh
+                if old_mesh.users == 0:
+                    bpy.data.meshes.remove(old_mesh)
+            else:
+                collider = bpy.data.objects.new(name, mesh)
+                collection.objects.link(collider)
+
+            collider.matrix_world = source.matrix_world
+            collider["IS_COLLIDER"] = "TRUE"
+            if "FLOORS" in source:
+                collider["FLOORS"] = source["FLOORS"]
+            sync_object(collider)
+            collider.display_type = 'WIRE'
+            colliders.append(collider)
+
+            if len(mesh.polygons) > self.polygon_budget:
+                modifier = collider.modifiers.new("GM_Decimate", 'DECIMATE')
+                modifier.ratio = self.polygon_budget / len(mesh.polygons)
+                to_decimate.append(collider)
+
+        # Evaluate every decimate modifier in a single depsgraph update, then bake them
+        mark_phase("Decimate")
+        if to_decimate:
+            depsgraph = context.evaluated_depsgraph_get()
+            for collider in to_decimate:
+                old_mesh = collider.data
+                collider.data = bpy.data.meshes.new_from_object(collider.evaluated_get(depsgraph))
+                collider.data.name = old_mesh.name
+                collider.modifiers.remove(collider.modifiers["GM_Decimate"])
+                if old_mesh.users == 0:
+                    bpy.data.meshes.remove(old_mesh)
+
+        # Follow the Show Colliders toggle
+        for collider in colliders:
+            collider.hide_set(not context.scene.show_collider_objects)
+        count(objects=len(colliders))
+
+        faces = sum(len(collider.data.polygons) for collider in colliders)
+        source_faces = sum(len(source.data.polygons) for source in sources)
+        self.report({'INFO'}, f"Generated {len(colliders)} colliders, {faces} faces from {source_faces}")
+        return {'FINISHED'}
+
+
+def register():
+    bpy.utils.register_class(OBJECT_OT_GenerateColliders)
+
+def unregister():
+    bpy.utils.unregister_class(OBJECT_OT_GenerateColliders)
+
+if __name__ == "__main__":
+    register()
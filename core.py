@@ -0,0 +1,524 @@
+# Blender independent algorithms of the GM Tools.
+#
+# Nothing in here imports bpy: the functions work on plain Python data, and the small
+# namedtuples below stand in for the few Blender types they need. The operators collect
+# that data from bpy and call into this module, so the algorithms can be profiled and
+# tested at scale from a plain Python process:
+#
+#   import sys; sys.path.insert(0, "<add-on folder>"); import core
+
+import re
+from collections import namedtuple, defaultdict
+from fnmatch import fnmatchcase
+
+FLOOR_NUMBERS = ('1', '2', '3', '4', '5', '6')
+
+
+#####################################################
+# FLOORS
+#####################################################
+
+def visible_floors(toggles):
+    """Returns the set of visible floor numbers from the 6 show_floor_N toggles, floor 1 first."""
+    return {floor for floor, shown in zip(FLOOR_NUMBERS, toggles) if shown}
+
+def mesh_floors(value):
+    """Floors of a map mesh, its FLOORS property is a comma separated list like '1,2'."""
+    return set(str(value).split(','))
+
+def entity_floors(value):
+    """Floors of an entity, every floor digit found in its clump_floor_flags counts."""
+    return set(str(value))
+
+def is_on_visible_floor(floors, shown_floors):
+    return not floors.isdisjoint(shown_floors)
+
+def floors_value(shown_floors):
+    """FLOORS property value for a set of floors, e.g. {'3', '1'} -> '1,3'."""
+    return ','.join(floor for floor in FLOOR_NUMBERS if floor in shown_floors)
+
+def floor_bands(base_z, floor_height):
+    """Z range of every floor, floor 1 starting at base_z, each floor_height high."""
+    return [
+        (floor, base_z + i * floor_height, base_z + (i + 1) * floor_height)
+        for i, floor in enumerate(FLOOR_NUMBERS)
+    ]
+
+def floor_at_height(z, bands):
+    """Floor whose band contains z, clamped to the lowest and highest floors."""
+    if z < bands[0][1]:
+        return bands[0][0]
+    for floor, _low, high in bands:
+        if z < high:
+            return floor
+    return bands[-1][0]
+
+
+#####################################################
+# DATABLOCK NAMES
+#####################################################
+
+ICE_MATERIAL = "mat_2pssnow2"
+
+DUPLICATE_SUFFIX = re.compile(r"\.\d{3,}$")
+
+def base_name(name):
+    """Name without the .001 style suffix Blender adds to duplicated datablocks."""
+    return DUPLICATE_SUFFIX.sub("", name)
+
+def is_ice_material(name):
+    """True for the ice layer material and its imported duplicates, e.g. mat_2pssnow2.001."""
+    return base_name(name) == ICE_MATERIAL
+
+
+#####################################################
+# ATLAS PACKING
+#####################################################
+
+def next_power_of_two(value):
+    size = 1
+    while size < value:
+        size *= 2
+    return size
+
+def pack_shelves(sizes, max_size, padding=0):
+    """Packs (width, height) rectangles into max_size square atlases, tallest first on shelves.
+
+    Returns the (atlas index, x, y) of every rectangle, None for the ones larger than an atlas,
+    and the power of two (width, height) of every atlas."""
+    placements = [None] * len(sizes)
+    used = []  # used (width, height) per atlas
+    x = y = shelf_height = 0
+
+    for i in sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0])):
+        width = sizes[i][0] + 2 * padding
+        height = sizes[i][1] + 2 * padding
+        if width > max_size or height > max_size:
+            continue
+
+        # Next shelf, then next atlas
+        if used and x + width > max_size:
+            x = 0
+            y += shelf_height
+            shelf_height = 0
+        if not used or y + height > max_size:
+            used.append([0, 0])
+            x = y = shelf_height = 0
+
+        placements[i] = (len(used) - 1, x + padding, y + padding)
+        x += width
+        shelf_height = max(shelf_height, height)
+        used[-1][0] = max(used[-1][0], x)
+        used[-1][1] = max(used[-1][1], y + height)
+
+    return placements, [(next_power_of_two(w), next_power_of_two(h)) for w, h in used]
+
+
+#####################################################
+# NULLBOXES
+#####################################################
+
+def parse_nullbox_id(value):
+    """Returns the integer id of a nullbox_ids value, or None if it is not a number."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def collect_nullbox_ids(nullboxes):
+    """Groups the ids of (category, nullbox_ids) pairs by category, skipping non integer ids."""
+    ids_by_category = defaultdict(set)
+    for category, value in nullboxes:
+        nullbox_id = parse_nullbox_id(value)
+        if nullbox_id is not None:
+            ids_by_category[category].add(nullbox_id)
+    return ids_by_category
+
+def next_nullbox_id(existing_ids):
+    """Next id of a category, one above the highest existing id."""
+    return max(existing_ids, default=-1) + 1
+
+def allocate_nullbox_ids(ids_by_category, categories):
+    """Allocates one new id per entry of categories, updating ids_by_category as it goes."""
+    allocated = []
+    for category in categories:
+        nullbox_id = next_nullbox_id(ids_by_category[category])
+        ids_by_category[category].add(nullbox_id)
+        allocated.append(nullbox_id)
+    return allocated
+
+def nullbox_name(nullbox_id, entity_name):
+    """Attach point name of a nullbox, MDL-AP<id>_<entity without its MDL- prefix>."""
+    if entity_name.startswith("MDL-"):
+        entity_name = entity_name[4:]
+    return f"MDL-AP{nullbox_id}_{entity_name}"
+
+
+#####################################################
+# MIRRORING
+#####################################################
+
+# Side markers of the GM bone and attach point names, e.g. MDL-jnt-L-thighbone, as whole tokens
+SIDE_TOKEN = re.compile(r"(?<![A-Za-z0-9])(L|R|Left|Right|left|right|LEFT|RIGHT)(?![A-Za-z])")
+SIDE_SWAP = {
+    "L": "R", "R": "L",
+    "Left": "Right", "Right": "Left",
+    "left": "right", "right": "left",
+    "LEFT": "RIGHT", "RIGHT": "LEFT",
+}
+
+def name_side(name):
+    """'LEFT' or 'RIGHT' from the first side token of name, None if it has none."""
+    match = SIDE_TOKEN.search(name)
+    if match is None:
+        return None
+    return 'LEFT' if match.group(1).upper() in ("L", "LEFT") else 'RIGHT'
+
+def mirror_name(name):
+    """name with its side tokens swapped, None if it has none."""
+    mirrored, swaps = SIDE_TOKEN.subn(lambda match: SIDE_SWAP[match.group(1)], name)
+    return mirrored if swaps else None
+
+def pair_by_name(names, role_pairs=()):
+    """Pairs up the left and right names, from the (left alternatives, right alternatives) role pairs
+    first and the side tokens then.
+
+    Returns the partner and the side of every paired name."""
+    present = set(names)
+    partners = {}
+    sides = {}
+    for left_alternatives, right_alternatives in role_pairs:
+        left = next((name for name in left_alternatives if name in present), None)
+        right = next((name for name in right_alternatives if name in present), None)
+        if left and right and left not in partners and right not in partners:
+            partners[left], partners[right] = right, left
+            sides[left], sides[right] = 'LEFT', 'RIGHT'
+
+    for name in names:
+        if name in partners:
+            continue
+        other = mirror_name(name)
+        if other in present and other not in partners:
+            partners[name], partners[other] = other, name
+            sides[name], sides[other] = name_side(name), name_side(other)
+    return partners, sides
+
+
+#####################################################
+# PROPERTY QUERIES
+#####################################################
+
+# Query fields, with the legacy custom property names as aliases
+QUERY_FIELDS = {
+    "floor": "floor", "floors": "floor",
+    "flags0": "flags0",
+    "collider": "collider", "is_collider": "collider",
+    "nullbox": "nullbox", "nullboxes": "nullbox",
+    "nullbox_id": "nullbox_id", "nullbox_ids": "nullbox_id",
+    "clump_floor": "clump_floor", "clump_floor_flags": "clump_floor",
+    "type": "type",
+    "name": "name",
+}
+
+QUERY_TOKEN = re.compile(r'\s*(?:(\()|(\))|(!=|=|~)|"([^"]*)"|([^\s()=!~"]+))')
+
+class QueryError(ValueError):
+    pass
+
+def tokenize_query(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = QUERY_TOKEN.match(text, position)
+        if not match or match.end() == position:
+            raise QueryError(f"Unexpected character at {position}: '{text[position:position + 10]}'")
+        open_paren, close_paren, operator, quoted, word = match.groups()
+        if open_paren or close_paren:
+            tokens.append(("PAREN", open_paren or close_paren))
+        elif operator:
+            tokens.append(("OP", operator))
+        elif quoted is not None:
+            tokens.append(("VALUE", quoted))
+        elif word.lower() in ("and", "or", "not"):
+            tokens.append(("KEYWORD", word.lower()))
+        else:
+            tokens.append(("VALUE", word))
+        position = match.end()
+    return tokens
+
+def parse_query(text):
+    """Parses a filter expression into nested tuples.
+
+    Grammar: comparisons `field = value`, `field != value` and `name ~ glob`, combined with
+    and, or, not and parentheses, e.g. `floor=3 and flags0=INVISIBLE`."""
+    tokens = tokenize_query(text)
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else (None, None)
+
+    def take(kind, value=None):
+        nonlocal position
+        token = peek()
+        if token[0] != kind or (value is not None and token[1] != value):
+            raise QueryError(f"Expected {value or kind.lower()} but found {token[1] or 'the end'}")
+        position += 1
+        return token[1]
+
+    def parse_or():
+        node = parse_and()
+        while peek() == ("KEYWORD", "or"):
+            take("KEYWORD")
+            node = ("or", node, parse_and())
+        return node
+
+    def parse_and():
+        node = parse_not()
+        while peek() == ("KEYWORD", "and"):
+            take("KEYWORD")
+            node = ("and", node, parse_not())
+        return node
+
+    def parse_not():
+        if peek() == ("KEYWORD", "not"):
+            take("KEYWORD")
+            return ("not", parse_not())
+        if peek() == ("PAREN", "("):
+            take("PAREN", "(")
+            node = parse_or()
+            take("PAREN", ")")
+            return node
+        field = take("VALUE")
+        if field.lower() not in QUERY_FIELDS:
+            raise QueryError(f"Unknown field '{field}', expected one of {', '.join(sorted(set(QUERY_FIELDS.values())))}")
+        field = QUERY_FIELDS[field.lower()]
+        operator = take("OP")
+        if operator == "~" and field != "name":
+            raise QueryError("Only name supports ~ glob matching")
+        value = take("VALUE")
+        return ("cmp", field, operator, value if field == "name" else value.upper())
+
+    if not tokens:
+        raise QueryError("Empty query")
+    node = parse_or()
+    if position != len(tokens):
+        raise QueryError(f"Unexpected '{tokens[position][1]}'")
+    return node
+
+
+class PropertyIndex:
+    """Inverted index of object properties: field -> value -> set of record numbers.
+
+    Records are dicts of field -> iterable of string values, plus a name."""
+
+    def __init__(self, records):
+        self.names = []
+        self.numbers = {}
+        self.postings = defaultdict(lambda: defaultdict(set))
+        for i, record in enumerate(records):
+            self.names.append(record["name"])
+            self.numbers[record["name"]] = i
+            self.add_postings(i, record)
+        self.all = set(range(len(self.names)))
+
+    def __len__(self):
+        return len(self.names)
+
+    def add_postings(self, i, record):
+        for field, values in record.items():
+            if field != "name":
+                for value in values:
+                    self.postings[field][str(value).upper()].add(i)
+
+    def update(self, i, record):
+        """Replaces the values of record i, its name stays."""
+        for values in self.postings.values():
+            for numbers in values.values():
+                numbers.discard(i)
+        self.add_postings(i, record)
+
+    def evaluate(self, node):
+        """Record numbers matching a parse_query tree."""
+        kind = node[0]
+        if kind == "and":
+            return self.evaluate(node[1]) & self.evaluate(node[2])
+        if kind == "or":
+            return self.evaluate(node[1]) | self.evaluate(node[2])
+        if kind == "not":
+            return self.all - self.evaluate(node[1])
+
+        _kind, field, operator, value = node
+        if field == "name":
+            if operator == "~":
+                return {i for i, name in enumerate(self.names) if fnmatchcase(name, value)}
+            matches = {i for i, name in enumerate(self.names) if name == value}
+        else:
+            matches = set(self.postings[field].get(value, ()))
+        return self.all - matches if operator == "!=" else matches
+
+
+#####################################################
+# BONE HIERARCHY
+#####################################################
+
+class BoneHierarchy:
+    """Bone names and parent indices (-1 for roots), with the walks used by the rig tools."""
+
+    def __init__(self, names, parents):
+        self.names = list(names)
+        self.parents = list(parents)
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+        self.children = [[] for _ in self.names]
+        for i, parent in enumerate(self.parents):
+            if parent >= 0:
+                self.children[parent].append(i)
+
+        self.roots = [i for i, parent in enumerate(self.parents) if parent < 0]
+
+    @classmethod
+    def from_parent_names(cls, bones):
+        """Builds the hierarchy from (name, parent name or None) pairs."""
+        bones = list(bones)
+        index = {name: i for i, (name, _parent) in enumerate(bones)}
+        return cls([name for name, _parent in bones], [index[parent] if parent else -1 for _name, parent in bones])
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def parent(self, name):
+        parent = self.parents[self.index[name]]
+        return self.names[parent] if parent >= 0 else None
+
+    def walk_up(self, name, steps):
+        """Returns the bone steps parents above name, or None if the hierarchy is too short."""
+        i = self.index.get(name)
+        if i is None:
+            return None
+        for _ in range(steps):
+            i = self.parents[i]
+            if i < 0:
+                return None
+        return self.names[i]
+
+    def walk_down(self, name, steps):
+        """Returns the bone steps levels below name following first children, or None."""
+        i = self.index.get(name)
+        if i is None:
+            return None
+        for _ in range(steps):
+            if not self.children[i]:
+                return None
+            i = self.children[i][0]
+        return self.names[i]
+
+    def root_names(self):
+        return [self.names[i] for i in self.roots]
+
+
+def find_effector(hierarchy, child_bone_name, fallback_distal_bone_name, log=print):
+    """Effector of a limb: 2 bones above its hand/foot, or else the first child of its distal bone."""
+    # Primary method: walk UP 2
+    if child_bone_name in hierarchy:
+        effector_name = hierarchy.walk_up(child_bone_name, 2)
+        if effector_name:
+            return effector_name
+
+        log(
+            f"WARNING: Effector finder could not walk up 2 bones "
+            f"from '{child_bone_name}'. Falling back to walking down "
+            f"1 bone from '{fallback_distal_bone_name}'."
+        )
+
+    else:
+        log(
+            f"WARNING: Effector finder could not find starting bone "
+            f"'{child_bone_name}'. Falling back to walking down 1 bone "
+            f"from '{fallback_distal_bone_name}'."
+        )
+
+    # Fallback method: walk DOWN 1 (mostly for thorne lmao)
+    if fallback_distal_bone_name not in hierarchy:
+        log(
+            f"Effector finder: fallback distal bone "
+            f"'{fallback_distal_bone_name}' not found."
+        )
+        return None
+
+    effector_name = hierarchy.walk_down(fallback_distal_bone_name, 1)
+    if not effector_name:
+        log(
+            f"Effector finder: fallback could not walk down 1 bone "
+            f"from '{fallback_distal_bone_name}'."
+        )
+        return None
+
+    return effector_name
+
+
+#####################################################
+# SANITY RULES
+#####################################################
+
+# Stand-ins for the Blender data read by the sanity check
+MeshInfo = namedtuple("MeshInfo", "name material_count")
+RootBoneInfo = namedtuple("RootBoneInfo", "name location rotation_euler")
+ArmatureInfo = namedtuple("ArmatureInfo", "name root_bones unscaled_bones")
+ActionInfo = namedtuple("ActionInfo", "name keyframe_counts")
+
+def is_unit_scale(scale, precision=3):
+    return all(round(s, precision) == 1.0 for s in scale)
+
+def is_zero(values, precision=3):
+    return all(round(v, precision) == 0 for v in values)
+
+def sanity_issues(meshes, armatures, actions):
+    """Runs the Ghost Master export rules and returns the list of issues found."""
+    issues = []
+
+    # Check for meshes with more than one material
+    for mesh in meshes:
+        if mesh.material_count > 1:
+            issues.append(f"The mesh '{mesh.name}' has more than one material.")
+
+    # Check for one root bone at default values and no animation
+    action_names = {action.name for action in actions}
+    root_bone = None
+    extra_roots = []
+    for armature in armatures:
+        for bone in armature.root_bones:
+            if root_bone:
+                issues.append(f"More than one root bone found in '{armature.name}'.")
+                extra_roots.append(bone.name)
+            else:
+                root_bone = bone.name
+                if not is_zero(bone.location):
+                    issues.append(f"The root bone '{bone.name}' does not have the default location (0, 0, 0).")
+                if not is_zero(bone.rotation_euler):
+                    issues.append(f"The root bone '{bone.name}' does not have the default rotation (0, 0, 0).")
+
+                if bone.name in action_names:
+                    issues.append(f"The root bone '{bone.name}' has animation data.")
+
+    if not root_bone:
+        issues.append("No root bone found.")
+
+    # Check that all bones are under the root bone's hierarchy
+    for bone_name in extra_roots:
+        issues.append(f"The bone '{bone_name}' is not under the root bone '{root_bone}'.")
+
+    # Check that the scale of all bones is 1,1,1
+    for armature in armatures:
+        for bone_name in armature.unscaled_bones:
+            issues.append(f"The bone '{bone_name}' does not have a scale of 1,1,1.")
+
+    # Check for actions with only one keyframe
+    for action in actions:
+        if len(action.keyframe_counts) == 1 and all(keyframes == 1 for keyframes in action.keyframe_counts):
+            issues.append(f"The action '{action.name}' has only one keyframe.")
+
+    return issues
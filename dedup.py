@@ -0,0 +1,291 @@
+import bpy
+import hashlib
+from array import array
+from collections import defaultdict
+from .profiling import mark_phase, count
+from .core import base_name
+from .jobs import register_job, run_job_blocking
+
+# Deduplication of map datablocks.
+# Imported maps give every prop its own copy of the same data, the passes below find the
+# identical copies and make the objects share a single datablock.
+
+
+#####################################################
+# MESHES
+#####################################################
+
+def read_buffer(collection, attribute, typecode, size):
+    """Reads attribute of every item of collection with foreach_get into a flat array."""
+    buffer = array(typecode, bytes(array(typecode).itemsize * size))
+    collection.foreach_get(attribute, buffer)
+    return buffer
+
+# foreach_get field, array typecode and values per item of every attribute data type
+ATTRIBUTE_FIELDS = {
+    'FLOAT': ("value", 'f', 1),
+    'INT': ("value", 'i', 1),
+    'INT8': ("value", 'b', 1),
+    'BOOLEAN': ("value", 'b', 1),
+    'FLOAT2': ("vector", 'f', 2),
+    'INT32_2D': ("value", 'i', 2),
+    'FLOAT_VECTOR': ("vector", 'f', 3),
+    'FLOAT_COLOR': ("color", 'f', 4),
+    'BYTE_COLOR': ("color", 'f', 4),
+    'QUATERNION': ("value", 'f', 4),
+    'FLOAT4X4': ("value", 'f', 16),
+}
+
+def mesh_size_key(mesh):
+    """Cheap key, only meshes with the same counts, attributes and materials can be identical."""
+    return (
+        len(mesh.vertices), len(mesh.edges), len(mesh.loops), len(mesh.polygons), len(mesh.uv_layers),
+        tuple(sorted((attribute.name, attribute.domain, attribute.data_type) for attribute in mesh.attributes)),
+        tuple(mat.name if mat else "" for mat in mesh.materials),
+    )
+
+def mesh_fingerprint(mesh):
+    """Hash of the topology, face settings, every attribute and the custom normals of mesh."""
+    digest = hashlib.sha1()
+    digest.update(read_buffer(mesh.edges, "vertices", 'i', len(mesh.edges) * 2))
+    digest.update(read_buffer(mesh.edges, "use_seam", 'b', len(mesh.edges)))
+    digest.update(read_buffer(mesh.polygons, "loop_start", 'i', len(mesh.polygons)))
+    digest.update(read_buffer(mesh.polygons, "loop_total", 'i', len(mesh.polygons)))
+    digest.update(read_buffer(mesh.polygons, "material_index", 'i', len(mesh.polygons)))
+    digest.update(read_buffer(mesh.polygons, "use_smooth", 'b', len(mesh.polygons)))
+    digest.update(read_buffer(mesh.loops, "vertex_index", 'i', len(mesh.loops)))
+
+    # Positions, UV maps, creases, sharp flags, colors and generic attributes alike
+    sizes = {'POINT': len(mesh.vertices), 'EDGE': len(mesh.edges), 'FACE': len(mesh.polygons), 'CORNER': len(mesh.loops)}
+    for attribute in sorted(mesh.attributes, key=lambda attribute: attribute.name):
+        digest.update(f"{attribute.name}|{attribute.domain}|{attribute.data_type}".encode())
+        field = ATTRIBUTE_FIELDS.get(attribute.data_type)
+        if field is None or attribute.domain not in sizes:
+            # Data that can not be read in bulk, e.g. strings, keeps the mesh unique
+            digest.update(mesh.name.encode())
+            continue
+        name, typecode, width = field
+        digest.update(read_buffer(attribute.data, name, typecode, sizes[attribute.domain] * width))
+
+    if mesh.has_custom_normals:
+        digest.update(read_buffer(mesh.corner_normals, "vector", 'f', len(mesh.loops) * 3))
+    return digest.hexdigest()
+
+def group_duplicate_meshes(meshes):
+    """Groups identical meshes, returns lists of 2 or more meshes, the first one sorted by name."""
+    by_size = defaultdict(list)
+    for mesh in meshes:
+        by_size[mesh_size_key(mesh)].append(mesh)
+
+    groups = []
+    for candidates in by_size.values():
+        # Unique sizes never need their buffers read
+        if len(candidates) < 2:
+            continue
+        by_hash = defaultdict(list)
+        for mesh in candidates:
+            by_hash[mesh_fingerprint(mesh)].append(mesh)
+        groups.extend(sorted(group, key=lambda m: m.name) for group in by_hash.values() if len(group) > 1)
+    return groups
+
+
+class OBJECT_OT_LinkDuplicateMeshes(bpy.types.Operator):
+    """Find meshes with identical geometry and make their objects share one mesh"""
+    bl_idname = "object.link_duplicate_meshes"
+    bl_label = "Link Duplicate Meshes"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    only_selected: bpy.props.BoolProperty(
+        name="Only Selected",
+        description="Only deduplicate the meshes of the selected objects",
+        default=False,
+    )
+
+    def execute(self, context):
+        objects = context.selected_objects if self.only_selected else context.scene.objects
+        objects = [obj for obj in objects if obj.type == 'MESH']
+
+        # Shape keys and mesh level custom properties would be lost by sharing, leave those meshes alone
+        meshes = {obj.data for obj in objects if not obj.data.shape_keys and not obj.data.keys()}
+
+        mark_phase("Fingerprint meshes")
+        groups = group_duplicate_meshes(meshes)
+        count(objects=len(meshes))
+
+        # Transforms and the FLOORS / FLAGS0 tags live on the objects, only the data pointer changes
+        mark_phase("Relink")
+        shared_by_mesh = {mesh: group[0] for group in groups for mesh in group[1:]}
+        relinked = 0
+        for obj in objects:
+            shared = shared_by_mesh.get(obj.data)
+            if shared:
+                obj.data = shared
+                relinked += 1
+        count(objects=relinked, rna_calls=relinked)
+
+        removed = 0
+        for mesh in shared_by_mesh:
+            if mesh.users == 0:
+                bpy.data.meshes.remove(mesh)
+                removed += 1
+
+        self.report({'INFO'}, f"Relinked {relinked} objects to {len(groups)} shared meshes, removed {removed} meshes")
+        return {'FINISHED'}
+
+
+#####################################################
+# MATERIALS
+#####################################################
+
+# Node settings that change the shader besides the socket values
+NODE_SETTINGS = ("blend_type", "operation", "interpolation", "extension", "projection", "data_type", "use_clamp")
+
+def plain_value(value):
+    """Socket or setting value as a hashable, rounded so float noise does not split materials."""
+    if isinstance(value, float):
+        return round(value, 5)
+    if hasattr(value, "__len__") and not isinstance(value, str):
+        return tuple(plain_value(v) for v in value)
+    if isinstance(value, bpy.types.ID):
+        return value.name
+    return value
+
+def image_fingerprint(image):
+    """Image reference key, the resolved file path when there is one so reloaded copies match.
+    The color space and alpha mode are part of it, they change how the same file is shaded."""
+    if image is None:
+        return None
+    settings = (image.colorspace_settings.name, image.alpha_mode)
+    if image.filepath and not image.packed_file:
+        return ("FILE", bpy.path.abspath(image.filepath, library=image.library).replace("\\", "/").lower()) + settings
+    return (image.source, image.name) + settings
+
+def node_tree_fingerprint(tree, trees):
+    """Hash of a node graph that ignores node names: every node is keyed by its type, settings and
+    the nodes feeding its inputs, node groups by the contents of their tree.
+
+    trees caches the hashes of the group trees already seen, None while one is being hashed."""
+    if tree in trees:
+        return trees[tree]
+    trees[tree] = None
+
+    incoming = defaultdict(list)
+    for link in tree.links:
+        incoming[link.to_node].append(link)
+
+    hashes = {}
+    def node_hash(node, visiting):
+        if node in hashes:
+            return hashes[node]
+        if node in visiting:
+            return "CYCLE"
+        visiting.add(node)
+        inputs = tuple(
+            (socket.identifier, plain_value(socket.default_value))
+            for socket in node.inputs if not socket.is_linked and hasattr(socket, "default_value")
+        )
+        settings = tuple((name, plain_value(getattr(node, name))) for name in NODE_SETTINGS if hasattr(node, name))
+        image = image_fingerprint(node.image) if hasattr(node, "image") else None
+        group = node_tree_fingerprint(node.node_tree, trees) if getattr(node, "node_tree", None) else None
+        links = sorted(
+            (link.to_socket.identifier, node_hash(link.from_node, visiting), link.from_socket.identifier, link.is_muted)
+            for link in incoming[node]
+        )
+        visiting.discard(node)
+        hashes[node] = hashlib.sha1(repr((node.bl_idname, node.mute, inputs, settings, image, group, links)).encode()).hexdigest()
+        return hashes[node]
+
+    fingerprint = hashlib.sha1(repr(sorted(node_hash(node, set()) for node in tree.nodes)).encode()).hexdigest()
+    trees[tree] = fingerprint
+    return fingerprint
+
+def material_fingerprint(mat, trees=None):
+    """Hash of the settings, node graph, node groups and image references of mat."""
+    parts = [
+        plain_value(mat.diffuse_color), mat.blend_method, mat.use_backface_culling,
+        round(mat.alpha_threshold, 5), mat.use_nodes,
+    ]
+    if mat.use_nodes and mat.node_tree:
+        parts.append(node_tree_fingerprint(mat.node_tree, {} if trees is None else trees))
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+def canonical_material(group):
+    """Material a duplicate group is merged into, the one without a .001 suffix if there is one."""
+    return min(group, key=lambda mat: (mat.name != base_name(mat.name), mat.name))
+
+
+class OBJECT_OT_MergeDuplicateMaterials(bpy.types.Operator):
+    """Merge materials with identical node graphs and images, e.g. mat_2pssnow2.001 into mat_2pssnow2"""
+    bl_idname = "object.merge_duplicate_materials"
+    bl_label = "Merge Duplicate Materials"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        run_job_blocking("MERGE_DUPLICATE_MATERIALS", self, context)
+        return {'FINISHED'}
+
+
+@register_job("MERGE_DUPLICATE_MATERIALS", "Merge Duplicate Materials")
+def merge_duplicate_materials(self, context):
+    """One material fingerprinted per step, nothing is changed before the last step.
+    Materials are looked up by name at every step, the user may delete or undo in between."""
+    materials_before = len(bpy.data.materials)
+
+    mark_phase("Fingerprint materials")
+    # Grease pencil materials have no node graph to compare
+    names = [mat.name for mat in bpy.data.materials if not mat.is_grease_pencil]
+    by_hash = defaultdict(list)
+    # Node groups shared by many materials are only hashed once
+    trees = {}
+    for i, name in enumerate(names):
+        mat = bpy.data.materials.get(name)
+        if mat is not None:
+            by_hash[material_fingerprint(mat, trees)].append(name)
+        yield i + 1, len(names)
+    count(objects=len(names))
+
+    remap = {}
+    for group in by_hash.values():
+        group = [mat for mat in (bpy.data.materials.get(name) for name in group) if mat is not None]
+        if len(group) > 1:
+            keep = canonical_material(group)
+            remap.update((mat, keep) for mat in group if mat != keep)
+
+    if not remap:
+        self.report({'INFO'}, "No duplicate materials found")
+        return
+
+    # Single pass over every material slot, data slots first then the object linked ones
+    mark_phase("Remap slots")
+    remapped = 0
+    for datablocks in (bpy.data.meshes, bpy.data.curves):
+        for data in datablocks:
+            for i, mat in enumerate(data.materials):
+                if mat in remap:
+                    data.materials[i] = remap[mat]
+                    remapped += 1
+    for obj in bpy.data.objects:
+        for slot in obj.material_slots:
+            if slot.link == 'OBJECT' and slot.material in remap:
+                slot.material = remap[slot.material]
+                remapped += 1
+    count(rna_calls=remapped)
+
+    for mat in remap:
+        if mat.users == 0:
+            bpy.data.materials.remove(mat)
+
+    self.report({'INFO'}, f"Merged {len(remap)} duplicate materials, {remapped} slots remapped, "
+                          f"{materials_before} -> {len(bpy.data.materials)} materials")
+
+
+def register():
+    bpy.utils.register_class(OBJECT_OT_LinkDuplicateMeshes)
+    bpy.utils.register_class(OBJECT_OT_MergeDuplicateMaterials)
+
+def unregister():
+    bpy.utils.unregister_class(OBJECT_OT_LinkDuplicateMeshes)
+    bpy.utils.unregister_class(OBJECT_OT_MergeDuplicateMaterials)
+
+if __name__ == "__main__":
+    register()
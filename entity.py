@@ -1,6 +1,8 @@
 import bpy
 import mathutils
-from collections import defaultdict
+from .profiling import mark_phase, count
+from .core import collect_nullbox_ids, next_nullbox_id, nullbox_name
+from .schema import sync_object
 
 # Transfer Nullboxes Operator
 class OBJECT_OT_TransferNullboxes(bpy.types.Operator):
@@ -14,26 +16,26 @@ class OBJECT_OT_TransferNullboxes(bpy.types.Operator):
         # Get the active object (assumed to be an empty)
         active_empty = bpy.context.active_object
         selected_objects = bpy.context.selected_objects
-        existing_ids_by_category = defaultdict(list)
 
         # Filter for non-active selected empties
         non_active_empties = [obj for obj in selected_objects if obj != active_empty and obj.type == 'EMPTY']
 
         # Collect existing IDs from active_empty's children
-        for child in active_empty.children:
-            if "nullboxes" in child.keys() and "nullbox_ids" in child.keys():
-                category = child["nullboxes"]
-                try:
-                    existing_ids_by_category[category].append(int(child["nullbox_ids"]))
-                except ValueError:
-                    pass  # skip non-integer ids
+        mark_phase("Collect IDs")
+        existing_ids_by_category = collect_nullbox_ids(
+            (child["nullboxes"], child["nullbox_ids"])
+            for child in active_empty.children
+            if "nullboxes" in child.keys() and "nullbox_ids" in child.keys()
+        )
 
         # Set active object mode to OBJECT to ensure we can manipulate parenting
         bpy.ops.object.mode_set(mode='OBJECT')
 
+        mark_phase("Duplicate nullboxes")
         for empty in non_active_empties:
             for child in empty.children:
                 if "nullboxes" in child.keys():
+                    count(objects=1)
                     # Duplicate the child
                     bpy.ops.object.select_all(action='DESELECT')
                     child.select_set(True)
@@ -47,29 +49,15 @@ class OBJECT_OT_TransferNullboxes(bpy.types.Operator):
                     # Assign the duplicated child to the active empty
                     category = child["nullboxes"]
                     # Determine the next available ID
-                    next_id = max(existing_ids_by_category[category], default=-1) + 1
+                    next_id = next_nullbox_id(existing_ids_by_category[category])
                     dup["nullboxes"] = category
                     dup["nullbox_ids"] = str(next_id)
-                    existing_ids_by_category[category].append(next_id)
+                    existing_ids_by_category[category].add(next_id)
+                    sync_object(dup)
 
-                    # Check if the duplicated empty's name starts with "MDL-AP" and has a number
+                    # Rename MDL-AP attach points after their new id and parent entity
                     if dup.name.startswith("MDL-AP"):
-                        # Extract the number part from the duplicated empty's name
-                        number_part = dup["nullbox_ids"]
-
-                        # Check if the parent of the duplicated empty starts with "MDL-"
-                        if active_empty.name.startswith("MDL-"):
-                            # Remove the "MDL-" prefix from the parent name
-                            new_parent_name = active_empty.name[4:]
-                        else:
-                            # Use the parent empty name as is
-                            new_parent_name = active_empty.name
-
-                        # Construct the new name for the duplicated empty
-                        new_name = f"MDL-AP{number_part}_{new_parent_name}"
-
-                        # Rename the duplicated empty
-                        dup.name = new_name
+                        dup.name = nullbox_name(dup["nullbox_ids"], active_empty.name)
             
                     # Parent to active empty with Keep Transform (Without Inverse)
                     bpy.context.view_layer.objects.active = active_empty
@@ -105,6 +93,7 @@ def create_UV_driver(obj):
     
     # Add custom property
     driver["UV_DRIVER"] = "UV_DRIVER"
+    sync_object(driver)
 
     return driver
 
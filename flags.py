@@ -1,28 +1,32 @@
 import bpy
+from .journal import journaled, recording
 
+@journaled
 class OBJECT_OT_SetSpecularTintToBlack(bpy.types.Operator):
     """Set specular tint to black for materials of selected objects if the specular tint is white"""
     bl_idname = "object.set_specular_tint_to_black"
     bl_label = "Set Specular Tint to Black"
-    bl_options = {'REGISTER', 'UNDO'}
+    bl_options = {'REGISTER'}
 
     def execute(self, context):
         selected_objects = context.selected_objects
-        for obj in selected_objects:
-            if obj.type == 'MESH':
-                for mat_slot in obj.material_slots:
-                    mat = mat_slot.material
-                    if mat and mat.use_nodes:
-                        for node in mat.node_tree.nodes:
-                            if node.type == 'BSDF_PRINCIPLED':
-                                specular_tint = node.inputs['Specular Tint'].default_value
-                                print(f"Specular Tint: {specular_tint}")
-                                # Check if Specular Tint is white
-                                if (specular_tint[0] == 1.0 and
-                                    specular_tint[1] == 1.0 and
-                                    specular_tint[2] == 1.0):
-                                    # Set the tint to black
-                                    node.inputs['Specular Tint'].default_value = (0.0, 0.0, 0.0, 1.0)  # RGBA
+        with recording(context, "Set Specular Tint to Black") as journal:
+            for obj in selected_objects:
+                if obj.type == 'MESH':
+                    for mat_slot in obj.material_slots:
+                        mat = mat_slot.material
+                        if mat and mat.use_nodes:
+                            for node in mat.node_tree.nodes:
+                                if node.type == 'BSDF_PRINCIPLED':
+                                    socket = node.inputs['Specular Tint']
+                                    specular_tint = socket.default_value
+                                    print(f"Specular Tint: {specular_tint}")
+                                    # Check if Specular Tint is white
+                                    if (specular_tint[0] == 1.0 and
+                                        specular_tint[1] == 1.0 and
+                                        specular_tint[2] == 1.0):
+                                        # Set the tint to black
+                                        journal.set_attr(mat, "node_tree." + socket.path_from_id(), "default_value", (0.0, 0.0, 0.0, 1.0))  # RGBA
         return {'FINISHED'}
 
 class OBJECT_OT_SetupAlphaClipMaterial(bpy.types.Operator):
@@ -0,0 +1,155 @@
+import bpy
+import time
+
+# Chunked execution of long GM Tools operations.
+# A job is a generator function taking (operator, context): it does one slice of the work per
+# step and yields its progress as (done, total). OBJECT_OT_RunJob steps it from a modal timer,
+# so Blender stays responsive, shows the progress in the status bar and the GM Tools panel,
+# and cancels it on Esc. A finished job is one undo step, a cancelled job gets GeneratorExit
+# at its current yield and has to roll back what it did so far, as does a job that raises.
+#
+# The undo and redo shortcuts are blocked while a job runs. Other tools, deleting included, still
+# run between steps, so jobs keep datablock names rather than references, look them up at every
+# step and skip the ones that are gone. A job can register a check, run before it starts, for
+# the selection or mode it needs.
+#
+# The floor, collider, ice and invisible visibility passes are property update callbacks,
+# which Blender runs synchronously and which can not start a modal operator. They only write
+# the objects whose state changes, so they stay callbacks.
+
+# Time spent stepping a job per timer event, the rest of the frame is left to the UI
+SLICE_SECONDS = 0.05
+
+# Job functions by name, filled by register_job
+job_functions = {}
+
+# Progress of the running job for the panels, None when idle
+active_job = None
+
+
+def register_job(name, label, check=None):
+    """Decorator registering a job generator function under name.
+
+    check(context) returns why the job can not start, or None."""
+    def decorator(func):
+        job_functions[name] = (label, func, check)
+        return func
+    return decorator
+
+def job_problem(name, context):
+    """Why the job can not start in context, None if it can."""
+    _label, _func, check = job_functions[name]
+    return check(context) if check else None
+
+def run_job_blocking(name, operator, context):
+    """Runs a job to the end in one go, for scripts and background sessions."""
+    _label, func, _check = job_functions[name]
+    for _progress in func(operator, context):
+        pass
+
+def job_items(self, context):
+    return [(name, label, "") for name, (label, _func, _check) in job_functions.items()]
+
+def blocks_event(event):
+    """True for the undo and redo shortcuts, undo would restore the file under a running job."""
+    return event.value == 'PRESS' and event.type in {'Z', 'Y'} and (event.ctrl or event.oskey)
+
+def redraw_panels(context):
+    for area in context.screen.areas if context.screen else []:
+        if area.type == 'VIEW_3D':
+            area.tag_redraw()
+
+
+class JobProgress:
+    def __init__(self, label):
+        self.label = label
+        self.done = 0
+        self.total = 0
+
+    @property
+    def factor(self):
+        return self.done / self.total if self.total else 0.0
+
+
+class OBJECT_OT_RunJob(bpy.types.Operator):
+    """Run a long GM Tools operation in steps, with progress in the status bar. Esc cancels it"""
+    bl_idname = "object.gm_run_job"
+    bl_label = "Run GM Tools Job"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    job: bpy.props.EnumProperty(name="Job", items=job_items)
+
+    @classmethod
+    def poll(cls, context):
+        return active_job is None
+
+    def execute(self, context):
+        problem = job_problem(self.job, context)
+        if problem:
+            self.report({'WARNING'}, problem)
+            return {'CANCELLED'}
+        run_job_blocking(self.job, self, context)
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        global active_job
+        problem = job_problem(self.job, context)
+        if problem:
+            self.report({'WARNING'}, problem)
+            return {'CANCELLED'}
+        label, func, _check = job_functions[self.job]
+        self.label = label
+        self.steps = func(self, context)
+        active_job = JobProgress(label)
+
+        wm = context.window_manager
+        self.timer = wm.event_timer_add(0.01, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self.steps.close()
+            self.finish(context)
+            self.report({'WARNING'}, f"{self.label} cancelled, changes rolled back")
+            return {'CANCELLED'}
+
+        if blocks_event(event):
+            self.report({'WARNING'}, f"{self.label} is running, Esc cancels it first")
+            return {'RUNNING_MODAL'}
+
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        slice_end = time.perf_counter() + SLICE_SECONDS
+        try:
+            while time.perf_counter() < slice_end:
+                active_job.done, active_job.total = next(self.steps)
+        except StopIteration:
+            self.finish(context)
+            return {'FINISHED'}
+        except Exception as error:
+            self.steps.close()
+            self.finish(context)
+            self.report({'ERROR'}, f"{self.label} failed: {error}")
+            return {'CANCELLED'}
+
+        context.workspace.status_text_set(
+            f"{active_job.label}: {active_job.done}/{active_job.total} ({active_job.factor:.0%}), Esc to cancel"
+        )
+        redraw_panels(context)
+        return {'RUNNING_MODAL'}
+
+    def finish(self, context):
+        global active_job
+        context.window_manager.event_timer_remove(self.timer)
+        context.workspace.status_text_set(None)
+        active_job = None
+        redraw_panels(context)
+
+
+def register():
+    bpy.utils.register_class(OBJECT_OT_RunJob)
+
+def unregister():
+    bpy.utils.unregister_class(OBJECT_OT_RunJob)
@@ -0,0 +1,186 @@
+import bpy
+from contextlib import contextmanager
+from bpy.app.handlers import persistent
+from .schema import sync_object, sync_pose_bone
+
+# Property journal for bulk tagging.
+# The tagging operators have no 'UNDO' option. With "Use Property Journal" on they record the
+# old and new value of every property they change here instead of a global undo step, the
+# journal has its own undo and redo operators. With it off they push the global undo step
+# themselves once they finished.
+#
+# Global undo steps of other operators still restore the whole file, journaled edits included.
+
+MAX_ENTRIES = 200
+
+# ID collections of bpy.data by id_type, changes keep names instead of RNA references
+ID_COLLECTIONS = {
+    'OBJECT': "objects",
+    'MESH': "meshes",
+    'MATERIAL': "materials",
+    'ARMATURE': "armatures",
+    'SCENE': "scenes",
+}
+
+# Old value of a custom property that did not exist
+MISSING = object()
+
+# Recorded (label, changes) entries, the first `position` are applied, the rest can be redone
+entries = []
+position = 0
+
+
+def journaled(cls):
+    """Class decorator for operators whose property edits go through recording()."""
+    execute = cls.execute
+
+    def journaled_execute(self, context):
+        result = execute(self, context)
+        if 'FINISHED' in result and not context.scene.gm_use_property_journal:
+            bpy.ops.ed.undo_push(message=self.bl_label)
+        return result
+
+    cls.execute = journaled_execute
+    return cls
+
+def update_use_journal(self, context):
+    if not self.gm_use_property_journal:
+        clear()
+
+
+class Recorder:
+    """Sets properties, recording each change when the journal is on."""
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.changes = []
+
+    def set_item(self, owner_id, owner_path, key, value):
+        """Sets the custom property key of owner_id, or of the struct at owner_path inside it."""
+        owner = owner_id.path_resolve(owner_path) if owner_path else owner_id
+        if self.enabled:
+            self.changes.append(('ITEM', ID_COLLECTIONS[owner_id.id_type], owner_id.name, owner_path, key, owner.get(key, MISSING), value))
+        owner[key] = value
+
+    def set_attr(self, owner_id, owner_path, attr, value):
+        """Sets the RNA property attr of owner_id, or of the struct at owner_path inside it."""
+        owner = owner_id.path_resolve(owner_path) if owner_path else owner_id
+        if self.enabled:
+            old = getattr(owner, attr)
+            old = tuple(old) if hasattr(old, "__len__") and not isinstance(old, str) else old
+            self.changes.append(('ATTR', ID_COLLECTIONS[owner_id.id_type], owner_id.name, owner_path, attr, old, value))
+        setattr(owner, attr, value)
+
+    def record_item(self, owner_id, owner_path, key, old, value):
+        """Records a custom property change made by other means, e.g. through edit bones."""
+        if self.enabled:
+            self.changes.append(('ITEM', ID_COLLECTIONS[owner_id.id_type], owner_id.name, owner_path, key, old, value))
+
+@contextmanager
+def recording(context, label):
+    """Yields a Recorder, its changes become one journal entry when the block ends."""
+    global position
+    recorder = Recorder(context.scene.gm_use_property_journal)
+    try:
+        yield recorder
+    finally:
+        # Changes made before an error are journaled too, so they can still be undone
+        if recorder.changes:
+            del entries[position:]
+            entries.append((label, recorder.changes))
+            del entries[:-MAX_ENTRIES]
+            position = len(entries)
+
+def write_change(change, value):
+    kind, collection, id_name, owner_path, key, _old, _new = change
+    owner_id = getattr(bpy.data, collection).get(id_name)
+    if owner_id is None:
+        return False
+    # Bone tags are recorded on the bones, in Edit mode the edit bones are written instead:
+    # leaving Edit mode copies them over the bones
+    if isinstance(owner_id, bpy.types.Armature) and owner_id.is_editmode and owner_path.startswith("bones["):
+        owner_path = "edit_" + owner_path
+    try:
+        owner = owner_id.path_resolve(owner_path) if owner_path else owner_id
+    except ValueError:
+        return False
+
+    if kind == 'ATTR':
+        setattr(owner, key, value)
+    elif value is MISSING:
+        if key in owner:
+            del owner[key]
+    else:
+        owner[key] = value
+
+    # Keep the typed GM properties in line with the restored keys
+    if isinstance(owner, bpy.types.Object):
+        sync_object(owner)
+    elif isinstance(owner, bpy.types.PoseBone):
+        sync_pose_bone(owner)
+    return True
+
+def clear():
+    global position
+    entries.clear()
+    position = 0
+
+def undo_label():
+    return entries[position - 1][0] if position > 0 else None
+
+def redo_label():
+    return entries[position][0] if position < len(entries) else None
+
+
+class OBJECT_OT_JournalUndo(bpy.types.Operator):
+    """Undo the last journaled property edit"""
+    bl_idname = "object.gm_journal_undo"
+    bl_label = "Journal Undo"
+
+    @classmethod
+    def poll(cls, context):
+        return position > 0
+
+    def execute(self, context):
+        global position
+        position -= 1
+        label, changes = entries[position]
+        # Reverse order so a property changed twice ends on its first old value
+        written = sum(write_change(change, change[5]) for change in reversed(changes))
+        self.report({'INFO'}, f"Undid {label}, {written} properties restored")
+        return {'FINISHED'}
+
+class OBJECT_OT_JournalRedo(bpy.types.Operator):
+    """Redo the last undone journaled property edit"""
+    bl_idname = "object.gm_journal_redo"
+    bl_label = "Journal Redo"
+
+    @classmethod
+    def poll(cls, context):
+        return position < len(entries)
+
+    def execute(self, context):
+        global position
+        label, changes = entries[position]
+        position += 1
+        written = sum(write_change(change, change[6]) for change in changes)
+        self.report({'INFO'}, f"Redid {label}, {written} properties set")
+        return {'FINISHED'}
+
+
+@persistent
+def journal_load_post(*args):
+    # Entries refer to the datablocks of the previous file
+    clear()
+
+
+def register():
+    bpy.utils.register_class(OBJECT_OT_JournalUndo)
+    bpy.utils.register_class(OBJECT_OT_JournalRedo)
+    bpy.app.handlers.load_post.append(journal_load_post)
+
+def unregister():
+    bpy.utils.unregister_class(OBJECT_OT_JournalUndo)
+    bpy.utils.unregister_class(OBJECT_OT_JournalRedo)
+    bpy.app.handlers.load_post.remove(journal_load_post)
+    clear()
@@ -0,0 +1,126 @@
+import bpy
+from mathutils import Vector
+from .spatial import get_spatial_index
+from .query import get_property_index
+from .profiling import profile_callback, mark_phase, count
+
+# Viewport LOD mode for map editing.
+# Meshes outside the focus region around the 3D cursor, off the focus floor, colliders or
+# invisible flagged ones are drawn as bounds or wireframe instead of being hidden. The display
+# type they had is kept in the scene's gm_lod_restore map, object name -> display type, so
+# leaving the mode restores it even after the file was saved and reopened. The objects carry
+# no extra property the exporter would pick up.
+#
+# Linked objects, e.g. the map meshes of streamed floors, can not change their display type.
+# They are counted and shown in the panel, a library override makes them editable.
+
+RESTORE_KEY = "gm_lod_restore"
+
+# Linked objects the last apply could not change, for the panel
+linked_targets = 0
+
+
+def lod_targets(scene):
+    """Mesh objects to draw at low detail with the current LOD settings."""
+    criteria = scene.gm_lod_criteria
+    index = get_property_index(scene)
+    meshes = set(index.postings["type"].get("MESH", set()))
+    targets = set()
+
+    if 'FOCUS' in criteria:
+        radius = Vector((scene.gm_lod_radius,) * 3)
+        cursor = scene.cursor.location
+        spatial = get_spatial_index(scene)
+        focused = {obj.name for obj in spatial.query_box_objects(cursor - radius, cursor + radius)}
+        targets |= {i for i in meshes if index.names[i] not in focused}
+    if 'FLOOR' in criteria:
+        targets |= meshes - index.postings["floor"].get(scene.gm_lod_floor, set())
+    if 'COLLIDER' in criteria:
+        targets |= meshes & index.postings["collider"].get("TRUE", set())
+    if 'INVISIBLE' in criteria:
+        targets |= meshes & index.postings["flags0"].get("INVISIBLE", set())
+
+    objects = (index.object(i) for i in targets)
+    return {obj for obj in objects if obj is not None}
+
+def apply_lod(scene):
+    """Sets the LOD display on the targets and restores every other object, in one pass."""
+    global linked_targets
+    targets = lod_targets(scene)
+    display = scene.gm_lod_display
+    restore = scene[RESTORE_KEY].to_dict() if RESTORE_KEY in scene else {}
+    changed = linked = 0
+    for obj in scene.objects:
+        if obj in targets:
+            if obj.library and not obj.override_library:
+                linked += 1
+                continue
+            restore.setdefault(obj.name, obj.display_type)
+            if obj.display_type != display:
+                obj.display_type = display
+                changed += 1
+        elif obj.name in restore:
+            obj.display_type = restore.pop(obj.name)
+            changed += 1
+    scene[RESTORE_KEY] = restore
+    linked_targets = linked
+    count(objects=changed, rna_calls=changed)
+    return len(targets), changed
+
+def restore_lod(scene):
+    global linked_targets
+    restore = scene[RESTORE_KEY].to_dict() if RESTORE_KEY in scene else {}
+    changed = 0
+    for name, display_type in restore.items():
+        obj = bpy.data.objects.get(name)
+        if obj is not None:
+            obj.display_type = display_type
+            changed += 1
+    # Files from before the scene map kept the display type on the objects
+    for obj in scene.objects:
+        if RESTORE_KEY in obj:
+            obj.display_type = obj[RESTORE_KEY]
+            del obj[RESTORE_KEY]
+            changed += 1
+    if RESTORE_KEY in scene:
+        del scene[RESTORE_KEY]
+    linked_targets = 0
+    count(objects=changed, rna_calls=changed)
+    return changed
+
+@profile_callback
+def update_lod_mode(self, context):
+    if context.scene.gm_lod_mode:
+        apply_lod(context.scene)
+    else:
+        restore_lod(context.scene)
+
+@profile_callback
+def update_lod_settings(self, context):
+    if context.scene.gm_lod_mode:
+        apply_lod(context.scene)
+
+
+class OBJECT_OT_RefreshLod(bpy.types.Operator):
+    """Reapply the viewport LOD mode, e.g. after moving the 3D cursor focus"""
+    bl_idname = "object.gm_refresh_lod"
+    bl_label = "Refresh LOD"
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene.gm_lod_mode
+
+    def execute(self, context):
+        mark_phase("Apply LOD")
+        targets, changed = apply_lod(context.scene)
+        if linked_targets:
+            self.report({'WARNING'}, f"{linked_targets} linked objects can not change their display, add library overrides to include them")
+        self.report({'INFO'}, f"{targets} objects at low detail, {changed} changed")
+        return {'FINISHED'}
+
+
+def register():
+    bpy.utils.register_class(OBJECT_OT_RefreshLod)
+
+def unregister():
+    bpy.utils.unregister_class(OBJECT_OT_RefreshLod)
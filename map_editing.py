@@ -1,150 +1,282 @@
 import bpy
 import bmesh
+from .profiling import profile_callback, mark_phase, count
+from .core import visible_floors, is_on_visible_floor, floors_value
+from .core import floor_bands, floor_at_height, is_ice_material
+from .spatial import get_spatial_index
+from .jobs import register_job, run_job_blocking, job_problem
+from .journal import journaled, recording
+from .schema import sync_object, gm_values, mask_floors
+from .streaming import stream_visible_floors
 
+@profile_callback
 def update_ice_layer_visibility(self, context):
-    """Update the visibility of objects with 'mat_2pssnow2' material."""
+    """Update the visibility of objects with 'mat_2pssnow2' material, or one of its .001 duplicates."""
+    touched = 0
     for obj in bpy.data.objects:
         if obj.type == 'MESH':
             for mat_slot in obj.material_slots:
-                if mat_slot.material and mat_slot.material.name == "mat_2pssnow2":
+                if mat_slot.material and is_ice_material(mat_slot.material.name):
                     obj.hide_set(not context.scene.show_ice_layer)
+                    touched += 1
+                    break
+    count(objects=touched, rna_calls=touched)
 
+@profile_callback
 def update_invisible_flag_visibility(self, context):
     """Update the visibility of objects with the 'FLAGS0' custom property set to 'INVISIBLE'."""
+    touched = 0
     for obj in bpy.data.objects:
-        if obj.type == 'MESH' and obj.get("FLAGS0") == "INVISIBLE":
+        if obj.type == 'MESH' and gm_values(obj).flags0 == 'INVISIBLE':
             obj.hide_set(not context.scene.show_invisible_flag)
+            touched += 1
+    count(objects=touched, rna_calls=touched)
 
+def scene_visible_floors(scene):
+    """Floors currently shown by the Current Floor View toggles."""
+    return visible_floors([getattr(scene, f"show_floor_{n}") for n in range(1, 7)])
+
+@profile_callback
 def update_floor_visibility(self, context):
     """Update visibility of objects based on their FLOORS property and current floor settings."""
-    for obj in bpy.data.objects:
-        if obj.type == 'MESH' and "FLOORS" in obj:
-            object_floors = obj["FLOORS"].split(',')
-            is_visible = (
-                (context.scene.show_floor_6 and '6' in object_floors) or
-                (context.scene.show_floor_5 and '5' in object_floors) or
-                (context.scene.show_floor_4 and '4' in object_floors) or
-                (context.scene.show_floor_3 and '3' in object_floors) or
-                (context.scene.show_floor_2 and '2' in object_floors) or
-                (context.scene.show_floor_1 and '1' in object_floors)
-            )
-            obj.hide_set(not is_visible)
-        elif obj.type == 'EMPTY' and "clump_floor_flags" in obj:
-            entity_floors = obj["clump_floor_flags"]
-            is_visible = (
-                (context.scene.show_floor_6 and '6' in entity_floors) or
-                (context.scene.show_floor_5 and '5' in entity_floors) or
-                (context.scene.show_floor_4 and '4' in entity_floors) or
-                (context.scene.show_floor_3 and '3' in entity_floors) or
-                (context.scene.show_floor_2 and '2' in entity_floors) or
-                (context.scene.show_floor_1 and '1' in entity_floors)
-            )
-            hide_recursive(obj, not is_visible)
-       
-
-def hide_recursive(obj, hidden):
-    obj.hide_set(hidden)
-    for child in obj.children:
-        hide_recursive(child, hidden)
+    shown_floors = scene_visible_floors(context.scene)
+    # Streamed floors are linked or unloaded first, the pass below then only sees loaded objects
+    stream_visible_floors(context.scene, shown_floors)
+    objects = list(bpy.data.objects)
+    children = children_map(objects)
+    hide_states = {}
+    touched = 0
+    for obj in objects:
+        if obj.type not in {'MESH', 'EMPTY'}:
+            continue
+        gm = gm_values(obj)
+        if obj.type == 'MESH' and gm.has_floors:
+            is_visible = is_on_visible_floor(mask_floors(gm.floors), shown_floors)
+            # Only objects whose state changes are written
+            if obj.hide_get() == is_visible:
+                obj.hide_set(not is_visible)
+                touched += 1
+        elif obj.type == 'EMPTY' and gm.has_clump_floors:
+            is_visible = is_on_visible_floor(mask_floors(gm.clump_floors), shown_floors)
+            touched += hide_recursive(obj, not is_visible, children, hide_states)
+    count(objects=touched, rna_calls=len(objects) + touched)
+
+def children_map(objects):
+    """Children of every parent object, read in one pass instead of one Object.children scan per object."""
+    children = {}
+    for obj in objects:
+        if obj.parent:
+            children.setdefault(obj.parent, []).append(obj)
+    return children
+
+def hide_recursive(obj, hidden, children=None, hide_states=None):
+    """Hides obj and all its descendants, returns the number of objects whose state changed.
+
+    Iterative, so deep hierarchies can not hit the recursion limit. children is a children_map
+    shared by the calls of one pass, without it obj.children_recursive is used. hide_states caches
+    the hide state of the objects already seen in the pass."""
+    if hide_states is None:
+        hide_states = {}
+
+    if children is None:
+        descendants = [obj] + list(obj.children_recursive)
+    else:
+        descendants = []
+        stack = [obj]
+        while stack:
+            current = stack.pop()
+            descendants.append(current)
+            stack.extend(children.get(current, ()))
+
+    touched = 0
+    for current in descendants:
+        state = hide_states.get(current)
+        if state is None:
+            state = current.hide_get()
+        if state != hidden:
+            current.hide_set(hidden)
+            touched += 1
+        hide_states[current] = hidden
+    return touched
 
+@profile_callback
 def update_collider_visibility(self, context):
     """Update visibility of objects with the 'IS_COLLIDER' custom property set to 'TRUE'."""
+    touched = 0
     for obj in bpy.data.objects:
-        if obj.type == 'MESH' and obj.get("IS_COLLIDER") == "TRUE":
+        if obj.type == 'MESH' and gm_values(obj).is_collider:
             obj.hide_set(not context.scene.show_collider_objects)
+            touched += 1
+    count(objects=touched, rna_calls=touched)
             
+@journaled
 class OBJECT_OT_SetFloorProperty(bpy.types.Operator):
     """Set Selected objects Floor tags based on currently viewed floors"""
     bl_idname = "object.set_floor_property"
     bl_label = "Set Floor"
-    bl_options = {'REGISTER', 'UNDO'}
+    bl_options = {'REGISTER'}
 
     def execute(self, context):
         selected_objects = context.selected_objects
-        visible_floors = []
-
-        # Gather all visible floors based on the current floor view settings
-        if context.scene.show_floor_1:
-            visible_floors.append('1')
-        if context.scene.show_floor_2:
-            visible_floors.append('2')
-        if context.scene.show_floor_3:
-            visible_floors.append('3')
-        if context.scene.show_floor_4:
-            visible_floors.append('4')
-        if context.scene.show_floor_5:
-            visible_floors.append('5')
-        if context.scene.show_floor_6:
-            visible_floors.append('6')
-
-        # Set the FLOORS property for each selected object
-        floors_value = ','.join(visible_floors)
-        for obj in selected_objects:
-            obj["FLOORS"] = floors_value
+        # Set the FLOORS property for each selected object from the visible floors
+        floors = floors_value(scene_visible_floors(context.scene))
+        with recording(context, "Set Floor") as journal:
+            for obj in selected_objects:
+                journal.set_item(obj, "", "FLOORS", floors)
+                sync_object(obj)
+        count(objects=len(selected_objects), rna_calls=len(selected_objects))
 
         return {'FINISHED'}
 
 
+@journaled
+class OBJECT_OT_AutoAssignFloors(bpy.types.Operator):
+    """Set the Floor tags of map meshes from their height, using the floor base and height settings"""
+    bl_idname = "object.auto_assign_floors"
+    bl_label = "Auto Assign Floors"
+    bl_options = {'REGISTER'}
+
+    mode: bpy.props.EnumProperty(
+        name="Mode",
+        items=[
+            ('CENTER', "Center", "Tag each object with the floor containing the centre of its bounds"),
+            ('OVERLAP', "Overlap", "Tag each object with every floor its bounds overlap"),
+        ],
+        default='CENTER',
+    )
+    only_selected: bpy.props.BoolProperty(name="Only Selected", default=True)
+
+    def execute(self, context):
+        scene = context.scene
+        bands = floor_bands(scene.gm_floor_base_z, scene.gm_floor_height)
+        index = get_spatial_index(scene)
+
+        mark_phase("Find floors")
+        floors_by_object = {}
+        if self.mode == 'CENTER':
+            for i in range(len(index)):
+                center_z = (index.mins[i].z + index.maxs[i].z) / 2
+                floors_by_object[i] = {floor_at_height(center_z, bands)}
+        else:
+            # One height band query per floor instead of testing every object against every floor
+            for floor, low, high in bands:
+                for i in index.query_height_band(low, high):
+                    floors_by_object.setdefault(i, set()).add(floor)
+
+        mark_phase("Write floors")
+        selected = set(context.selected_objects) if self.only_selected else None
+        changed = 0
+        with recording(context, "Auto Assign Floors") as journal:
+            for i, floors in floors_by_object.items():
+                obj = index.object(i)
+                if obj is None or selected is not None and obj not in selected:
+                    continue
+                value = floors_value(floors)
+                # Only write the objects whose tag actually changes
+                if obj.get("FLOORS") != value:
+                    journal.set_item(obj, "", "FLOORS", value)
+                    sync_object(obj)
+                    changed += 1
+        count(objects=changed, rna_calls=changed)
+
+        self.report({'INFO'}, f"Updated the floors of {changed} objects")
+        return {'FINISHED'}
+
+
+def split_faces_problem(context):
+    if context.mode != 'OBJECT':
+        return "Please switch to Object Mode first."
+    if not any(obj.type == 'MESH' for obj in context.selected_objects):
+        return "Please select at least one mesh object."
+    return None
+
+@register_job("SPLIT_FACES", "Split Faces", split_faces_problem)
 def split_every_face_keep_normals(self, context):
-    if bpy.context.mode != 'OBJECT':
-        self.report({'ERROR'}, "Please switch to Object Mode first.")
-        return {'CANCELLED'}
-    # Store all selected mesh objects
-    selected_meshes = [obj for obj in bpy.context.selected_objects if obj.type == 'MESH']
-    
-    if not selected_meshes:
-        raise Exception("Please select at least one mesh object.")
-
-    for obj in selected_meshes:
-        # Duplicate mesh
-        bpy.ops.object.select_all(action='DESELECT')
-        obj.select_set(True)
-        bpy.context.view_layer.objects.active = obj
-        bpy.ops.object.duplicate()
-        temp = bpy.context.active_object
-
-       # Merge by distance
-        bpy.ops.object.mode_set(mode='EDIT')
-        bpy.ops.mesh.select_all(action='SELECT')
-        bpy.ops.mesh.remove_doubles(threshold=0.0001)
-        bpy.ops.object.mode_set(mode='OBJECT')
-
-        temp.name = f"{obj.name}__temp"
-
-        # Reselect original
-        bpy.ops.object.select_all(action='DESELECT')
-        obj.select_set(True)
-        bpy.context.view_layer.objects.active = obj
-
-        # Enter edit mode with bmesh
-        bpy.ops.object.mode_set(mode='EDIT')
-        bm = bmesh.from_edit_mesh(obj.data)
+    # Store all selected mesh objects, by name as the job may be interrupted between steps
+    selected_meshes = [obj.name for obj in bpy.context.selected_objects if obj.type == 'MESH']
+
+    # Name of the untouched copy of every mesh split so far, put back if the job is cancelled
+    originals = {}
+    try:
+        for i, name in enumerate(selected_meshes):
+            obj = bpy.data.objects.get(name)
+            if obj is not None and obj.type == 'MESH':
+                originals[name] = obj.data.copy().name
+                split_faces_of_object(obj)
+            yield i + 1, len(selected_meshes)
+    except BaseException:
+        if bpy.context.mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+        for name, original_name in originals.items():
+            obj = bpy.data.objects.get(name)
+            original = bpy.data.meshes.get(original_name)
+            if obj is None or original is None:
+                continue
+            split = obj.data
+            obj.data = original
+            if split.users == 0:
+                mesh_name = split.name
+                bpy.data.meshes.remove(split)
+                original.name = mesh_name
+        raise
+
+    for original_name in originals.values():
+        original = bpy.data.meshes.get(original_name)
+        if original is not None:
+            bpy.data.meshes.remove(original)
+
+def split_faces_of_object(obj):
+    mark_phase(f"Split {obj.name}")
+
+    # Duplicate mesh
+    bpy.ops.object.select_all(action='DESELECT')
+    obj.select_set(True)
+    bpy.context.view_layer.objects.active = obj
+    bpy.ops.object.duplicate()
+    temp = bpy.context.active_object
+
+    # Merge by distance
+    bpy.ops.object.mode_set(mode='EDIT')
+    bpy.ops.mesh.select_all(action='SELECT')
+    bpy.ops.mesh.remove_doubles(threshold=0.0001)
+    bpy.ops.object.mode_set(mode='OBJECT')
+
+    temp.name = f"{obj.name}__temp"
+
+    # Reselect original
+    bpy.ops.object.select_all(action='DESELECT')
+    obj.select_set(True)
+    bpy.context.view_layer.objects.active = obj
+
+    # Enter edit mode with bmesh
+    bpy.ops.object.mode_set(mode='EDIT')
+    bm = bmesh.from_edit_mesh(obj.data)
+    bpy.ops.mesh.select_all(action='DESELECT')
+
+    # Split each face into a separate mesh (optional, depends on your goal)
+    for face in bm.faces:
         bpy.ops.mesh.select_all(action='DESELECT')
+        face.select = True
+        bmesh.update_edit_mesh(obj.data)
+        bpy.ops.mesh.split()
+    count(objects=1)
 
-        # Split each face into a separate mesh (optional, depends on your goal)
-        for face in bm.faces:
-            bpy.ops.mesh.select_all(action='DESELECT')
-            face.select = True
-            bmesh.update_edit_mesh(obj.data)
-            bpy.ops.mesh.split()
+    # Exit edit mode
+    bpy.ops.object.mode_set(mode='OBJECT')
 
-        # Exit edit mode
-        bpy.ops.object.mode_set(mode='OBJECT')
+    # Add Data Transfer modifier
+    mod = obj.modifiers.new(name="DataTransfer", type='DATA_TRANSFER')
+    mod.object = temp
+    mod.use_loop_data = True
+    mod.data_types_loops = {'CUSTOM_NORMAL'}
+    mod.loop_mapping = 'NEAREST_NORMAL'
 
-        # Add Data Transfer modifier
-        mod = obj.modifiers.new(name="DataTransfer", type='DATA_TRANSFER')
-        mod.object = temp
-        mod.use_loop_data = True
-        mod.data_types_loops = {'CUSTOM_NORMAL'}
-        mod.loop_mapping = 'NEAREST_NORMAL'
-    
-        # Apply modifier
-        bpy.ops.object.modifier_apply(modifier=mod.name)
+    # Apply modifier
+    bpy.ops.object.modifier_apply(modifier=mod.name)
 
-        # Delete temp mesh
-        bpy.data.objects.remove(temp, do_unlink=True)
+    # Delete temp mesh
+    bpy.data.objects.remove(temp, do_unlink=True)
 
-        print("Split faces for objects:", [obj.name for obj in selected_meshes])
 
 class OBJECT_OT_SplitFacesKeepNormals(bpy.types.Operator):
     """Splits every faces of selected object into seperate faces, while keeping Normals the same."""
@@ -153,16 +285,22 @@ class OBJECT_OT_SplitFacesKeepNormals(bpy.types.Operator):
     bl_options = {'REGISTER', 'UNDO'}
 
     def execute(self, context):
-        split_every_face_keep_normals(self, context)
+        problem = job_problem("SPLIT_FACES", context)
+        if problem:
+            self.report({'WARNING'}, problem)
+            return {'CANCELLED'}
+        run_job_blocking("SPLIT_FACES", self, context)
         return {'FINISHED'}
         
 def register():
   bpy.utils.register_class(OBJECT_OT_SplitFacesKeepNormals)  # Register Split Faces Operator
   bpy.utils.register_class(OBJECT_OT_SetFloorProperty)  # Register Set Floor Operator
+  bpy.utils.register_class(OBJECT_OT_AutoAssignFloors)  # Register Auto Assign Floors Operator
   
 def unregister():
   bpy.utils.unregister_class(OBJECT_OT_SplitFacesKeepNormals)  # Unregister Split Faces Operator
   bpy.utils.unregister_class(OBJECT_OT_SetFloorProperty)  # Unregister Set Floor Operator/
+  bpy.utils.unregister_class(OBJECT_OT_AutoAssignFloors)  # Unregister Auto Assign Floors Operator
    
 if __name__ == "__main__":
     register()
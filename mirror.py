@@ -0,0 +1,214 @@
+import bpy
+from collections import defaultdict
+from mathutils import Matrix
+from mathutils.kdtree import KDTree
+from .core import pair_by_name, collect_nullbox_ids, allocate_nullbox_ids, nullbox_name
+from .schema import sync_object, sync_pose_bone
+from .nullboxes import create_nullboxes
+from .profiling import mark_phase, count
+
+# Left/right mirroring of bone tags and nullboxes.
+# Bones and nullboxes are paired by name first, through the sided bone roles of the rig setup
+# and the L/R tokens of the names, and otherwise by position: the partner is the closest item
+# to the X mirrored position, found in a KD-tree. Left is +X in the armature or entity space.
+# Mirrored nullboxes remember their partner in gm_mirror_partner, which wins over both, so a
+# moved or renamed nullbox keeps its partner.
+
+PARTNER_KEY = "gm_mirror_partner"
+
+# Mirrors a local matrix across the YZ plane, keeping it right handed
+FLIP_X = Matrix.Diagonal((-1, 1, 1, 1))
+
+
+def position_side(x, tolerance):
+    if x > tolerance:
+        return 'LEFT'
+    if x < -tolerance:
+        return 'RIGHT'
+    return None
+
+class MirrorPairs:
+    """Partners of a set of named items, by name then by the KD-tree of their mirrored positions."""
+
+    def __init__(self, names, positions, tolerance, role_pairs=(), stored=None):
+        self.names = names
+        self.positions = positions
+        self.tolerance = tolerance
+        self.partners, self.sides = pair_by_name(names, role_pairs)
+        self.indices = {name: i for i, name in enumerate(names)}
+        # Stored partners replace the name pairs of both items
+        for name, partner in (stored or {}).items():
+            if partner == name or partner not in self.indices:
+                continue
+            for item in (name, partner):
+                old = self.partners.pop(item, None)
+                if old is not None and self.partners.get(old) == item:
+                    del self.partners[old]
+            self.partners[name] = partner
+            self.partners[partner] = name
+        self.tree = KDTree(len(names))
+        for i, position in enumerate(positions):
+            self.tree.insert(position, i)
+        self.tree.balance()
+
+    def side(self, i):
+        return self.sides.get(self.names[i]) or position_side(self.positions[i].x, self.tolerance)
+
+    def partner(self, i):
+        """Index of the partner of item i, None if it has none."""
+        name = self.names[i]
+        if name in self.partners:
+            return self.indices[self.partners[name]]
+        position = self.positions[i]
+        mirrored = position.copy()
+        mirrored.x = -mirrored.x
+        _co, j, distance = self.tree.find(mirrored)
+        # A name paired item already has its partner
+        if j is None or j == i or distance > self.tolerance or self.names[j] in self.partners:
+            return None
+        return j
+
+
+def mirror_bone_tags(armature, side, tolerance, role_pairs):
+    """Copies the NullBoxes tags of the side bones to their partners, returns (changed, unpaired)."""
+    bones = armature.data.bones
+    names = [bone.name for bone in bones]
+    pairs = MirrorPairs(names, [bone.head_local for bone in bones], tolerance, role_pairs)
+
+    changed = unpaired = 0
+    for i, name in enumerate(names):
+        # Tags set in Edit mode are only on the bone
+        tag = armature.pose.bones[name].get("NullBoxes")
+        if tag is None:
+            tag = bones[name].get("NullBoxes")
+        if tag is None or pairs.side(i) != side:
+            continue
+        j = pairs.partner(i)
+        if j is None:
+            unpaired += 1
+            continue
+        target = armature.pose.bones[names[j]]
+        if target.get("NullBoxes") != tag or bones[names[j]].get("NullBoxes") != tag:
+            # Both copies, like the Set Chainpoint and Set SpellPoint operators
+            target["NullBoxes"] = tag
+            bones[names[j]]["NullBoxes"] = tag
+            sync_pose_bone(target)
+            changed += 1
+    return changed, unpaired
+
+def mirror_nullboxes(entity, side, tolerance):
+    """Mirrors the side nullboxes of entity onto their partners, creating the missing ones.
+
+    Returns the number of moved and of created nullboxes."""
+    nullboxes = [child for child in entity.children if "nullboxes" in child]
+    entity_inverse = entity.matrix_world.inverted()
+    local = [entity_inverse @ nullbox.matrix_world for nullbox in nullboxes]
+    stored = {nullbox.name: nullbox[PARTNER_KEY] for nullbox in nullboxes if PARTNER_KEY in nullbox}
+    pairs = MirrorPairs([nullbox.name for nullbox in nullboxes], [matrix.translation for matrix in local], tolerance, stored=stored)
+
+    ids_by_category = collect_nullbox_ids(
+        (child["nullboxes"], child["nullbox_ids"])
+        for child in entity.children
+        if "nullboxes" in child and "nullbox_ids" in child
+    )
+
+    moved = 0
+    missing = defaultdict(list)
+    for i, nullbox in enumerate(nullboxes):
+        if pairs.side(i) != side:
+            continue
+        matrix = entity.matrix_world @ FLIP_X @ local[i] @ FLIP_X
+        category = nullbox["nullboxes"]
+        j = pairs.partner(i)
+        if j is None:
+            missing[category].append((nullbox, matrix))
+            continue
+
+        partner = nullboxes[j]
+        partner.matrix_world = matrix
+        partner.empty_display_type = nullbox.empty_display_type
+        partner.empty_display_size = nullbox.empty_display_size
+        if partner["nullboxes"] != category:
+            # A new category needs a free id of that category
+            partner["nullboxes"] = category
+            partner["nullbox_ids"] = str(allocate_nullbox_ids(ids_by_category, [category])[0])
+            if partner.name.startswith("MDL-AP"):
+                partner.name = nullbox_name(partner["nullbox_ids"], entity.name)
+        nullbox[PARTNER_KEY] = partner.name
+        partner[PARTNER_KEY] = nullbox.name
+        sync_object(partner)
+        moved += 1
+
+    # Missing partners are created per category, so their ids are allocated in one go
+    created = 0
+    for category, sources in missing.items():
+        new_nullboxes = create_nullboxes(entity, category, [matrix for _source, matrix in sources], 0.1)
+        for (source, _matrix), nullbox in zip(sources, new_nullboxes):
+            nullbox.empty_display_type = source.empty_display_type
+            nullbox.empty_display_size = source.empty_display_size
+            source[PARTNER_KEY] = nullbox.name
+            nullbox[PARTNER_KEY] = source.name
+        created += len(new_nullboxes)
+    return moved, created
+
+
+class OBJECT_OT_MirrorSides(bpy.types.Operator):
+    """Mirror the NullBoxes bone tags and the nullboxes of the active entity or armature to the other side"""
+    bl_idname = "object.gm_mirror_sides"
+    bl_label = "Mirror Sides"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    side: bpy.props.EnumProperty(
+        name="Direction",
+        items=[
+            ('LEFT', "Left to Right", "Copy the left side (+X) onto the right side"),
+            ('RIGHT', "Right to Left", "Copy the right side (-X) onto the left side"),
+        ],
+        default='LEFT',
+    )
+    tolerance: bpy.props.FloatProperty(
+        name="Tolerance",
+        description="Largest distance to the mirrored position for a partner found by position, items closer to the center are not mirrored",
+        default=0.01,
+        min=0.0,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        obj = context.active_object
+        return obj and obj.type in {'EMPTY', 'ARMATURE'} and context.mode in {'OBJECT', 'POSE'}
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        obj = context.active_object
+        armatures = [obj] if obj.type == 'ARMATURE' else [child for child in obj.children_recursive if child.type == 'ARMATURE']
+        armatures = [armature for armature in armatures if not armature.library]
+
+        tagged = unpaired = 0
+        if armatures:
+            mark_phase("Mirror bone tags")
+            # The sided bone roles come with the rig tools
+            from . import ensure_module
+            role_pairs = ensure_module("animation").mirrored_roles
+            for armature in armatures:
+                changed, missed = mirror_bone_tags(armature, self.side, self.tolerance, role_pairs)
+                tagged += changed
+                unpaired += missed
+
+        moved = created = 0
+        if obj.type == 'EMPTY':
+            mark_phase("Mirror nullboxes")
+            moved, created = mirror_nullboxes(obj, self.side, self.tolerance)
+        count(objects=moved + created)
+
+        self.report({'INFO'}, f"{tagged} bone tags, {moved} nullboxes moved, {created} created, {unpaired} tagged bones without a partner")
+        return {'FINISHED'}
+
+
+def register():
+    bpy.utils.register_class(OBJECT_OT_MirrorSides)
+
+def unregister():
+    bpy.utils.unregister_class(OBJECT_OT_MirrorSides)
@@ -0,0 +1,257 @@
+import bpy
+import numpy as np
+from bpy.app.handlers import persistent
+from mathutils import Matrix, Vector
+from mathutils.bvhtree import BVHTree
+from .core import parse_nullbox_id, collect_nullbox_ids, allocate_nullbox_ids, nullbox_name
+from .schema import sync_object
+from .profiling import mark_phase, count
+
+# Bulk nullbox placement.
+# Surfaces are read once into world space NumPy arrays with foreach_get and kept in a cache
+# along with their BVH tree, scattering samples the triangles by area and snapping uses the
+# BVH nearest point. IDs come from core.allocate_nullbox_ids in one go. Snapped empties are
+# moved in place, keeping their properties and children, only those without an id get one.
+
+NULLBOX_CATEGORIES = [
+    ('SPELLPOINT', "Spell Point", ""),
+    ('CHAINPOINT', "Chain Point", ""),
+    ('ATTACH', "Attach", ""),
+]
+
+
+class Surface:
+    """World space triangles of a set of mesh objects, with their BVH tree."""
+
+    def __init__(self, objects):
+        vertices = []
+        triangles = []
+        offset = 0
+        for obj in objects:
+            mesh = obj.data
+            mesh.calc_loop_triangles()
+            co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+            mesh.vertices.foreach_get("co", co)
+            tris = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+            mesh.loop_triangles.foreach_get("vertices", tris)
+
+            # To world space in one matrix product
+            matrix = np.array(obj.matrix_world, dtype=np.float32)
+            co = co.reshape(-1, 3) @ matrix[:3, :3].T + matrix[:3, 3]
+            vertices.append(co)
+            triangles.append(tris.reshape(-1, 3) + offset)
+            offset += len(co)
+
+        self.vertices = np.concatenate(vertices) if vertices else np.empty((0, 3), dtype=np.float32)
+        self.triangles = np.concatenate(triangles) if triangles else np.empty((0, 3), dtype=np.int32)
+
+        corners = self.vertices[self.triangles]
+        cross = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+        lengths = np.linalg.norm(cross, axis=1)
+        self.areas = lengths / 2
+        self.normals = cross / np.maximum(lengths, 1e-12)[:, None]
+        self.tree = BVHTree.FromPolygons(self.vertices.tolist(), self.triangles.tolist()) if len(self.triangles) else None
+
+    def scatter(self, amount, seed):
+        """amount random (location, normal) pairs spread evenly over the surface area."""
+        rng = np.random.default_rng(seed)
+        picked = rng.choice(len(self.triangles), size=amount, p=self.areas / self.areas.sum())
+        # Uniform barycentric samples
+        r1 = np.sqrt(rng.random(amount))[:, None]
+        r2 = rng.random(amount)[:, None]
+        corners = self.vertices[self.triangles[picked]]
+        points = (1 - r1) * corners[:, 0] + r1 * (1 - r2) * corners[:, 1] + r1 * r2 * corners[:, 2]
+        return [(Vector(p), Vector(n)) for p, n in zip(points, self.normals[picked])]
+
+    def snap(self, location):
+        """Nearest surface (location, normal) to location, None if the surface is empty."""
+        if self.tree is None:
+            return None
+        hit, normal, _index, _distance = self.tree.find_nearest(location)
+        return (hit, normal) if hit is not None else None
+
+
+# Surfaces by their objects, meshes and transforms
+surface_cache = {}
+
+def surface_key(objects):
+    return tuple(sorted(
+        (obj.name, obj.data.name, len(obj.data.vertices), tuple(v for row in obj.matrix_world for v in row))
+        for obj in objects
+    ))
+
+def get_surface(objects):
+    key = surface_key(objects)
+    surface = surface_cache.get(key)
+    if surface is None:
+        surface = Surface(objects)
+        surface_cache[key] = surface
+    return surface
+
+def surface_objects(context, entity, source):
+    if source == 'ENTITY':
+        return [obj for obj in entity.children_recursive if obj.type == 'MESH']
+    return [obj for obj in context.selected_objects if obj.type == 'MESH' and obj != entity]
+
+def aligned_matrix(location, normal, align):
+    """World matrix at location, its Z axis along the surface normal when align is set."""
+    rotation = normal.to_track_quat('Z', 'Y').to_matrix().to_4x4() if align else Matrix.Identity(4)
+    return Matrix.Translation(location) @ rotation
+
+def create_nullboxes(entity, category, matrices, size):
+    """Creates one nullbox per world matrix under entity, with bulk allocated ids and MDL-AP names."""
+    ids_by_category = collect_nullbox_ids(
+        (child["nullboxes"], child["nullbox_ids"])
+        for child in entity.children
+        if "nullboxes" in child and "nullbox_ids" in child
+    )
+    ids = allocate_nullbox_ids(ids_by_category, [category] * len(matrices))
+    collection = entity.users_collection[0] if entity.users_collection else bpy.context.collection
+
+    nullboxes = []
+    for nullbox_id, matrix in zip(ids, matrices):
+        nullbox = bpy.data.objects.new(nullbox_name(nullbox_id, entity.name), None)
+        nullbox.empty_display_type = 'ARROWS'
+        nullbox.empty_display_size = size
+        collection.objects.link(nullbox)
+        # Parent without inverse like Transfer Nullboxes, the local matrix is relative to the entity
+        nullbox.parent = entity
+        nullbox.matrix_parent_inverse.identity()
+        nullbox.matrix_world = matrix
+        nullbox["nullboxes"] = category
+        nullbox["nullbox_ids"] = str(nullbox_id)
+        sync_object(nullbox)
+        nullboxes.append(nullbox)
+    return nullboxes
+
+def snap_nullboxes(entity, category, empties, matrices):
+    """Moves the empties to the world matrices as nullboxes of entity, giving ids to those without one.
+
+    Empties that are already nullboxes keep their category and id, unless the id is taken."""
+    snapped = set(empties)
+    ids_by_category = collect_nullbox_ids(
+        (child["nullboxes"], child["nullbox_ids"])
+        for child in entity.children
+        if child not in snapped and "nullboxes" in child and "nullbox_ids" in child
+    )
+    missing = []
+    for empty, matrix in zip(empties, matrices):
+        if empty.parent != entity:
+            empty.parent = entity
+            empty.matrix_parent_inverse.identity()
+        empty.matrix_world = matrix
+        if "nullboxes" not in empty:
+            empty["nullboxes"] = category
+        nullbox_id = parse_nullbox_id(empty.get("nullbox_ids"))
+        used = ids_by_category[empty["nullboxes"]]
+        if nullbox_id is None or nullbox_id in used:
+            missing.append(empty)
+        else:
+            used.add(nullbox_id)
+
+    ids = allocate_nullbox_ids(ids_by_category, [empty["nullboxes"] for empty in missing])
+    for empty, nullbox_id in zip(missing, ids):
+        empty["nullbox_ids"] = str(nullbox_id)
+        empty.name = nullbox_name(nullbox_id, entity.name)
+    for empty in empties:
+        sync_object(empty)
+    return len(missing)
+
+
+class OBJECT_OT_PlaceNullboxes(bpy.types.Operator):
+    """Scatter nullboxes on a surface, or snap the selected empties to it, as nullboxes of the active entity"""
+    bl_idname = "object.place_nullboxes"
+    bl_label = "Place Nullboxes"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    mode: bpy.props.EnumProperty(
+        name="Mode",
+        items=[
+            ('SCATTER', "Scatter", "Scatter new nullboxes evenly over the surface"),
+            ('SNAP', "Snap Selected", "Snap the selected empties to the surface and make them nullboxes"),
+        ],
+        default='SCATTER',
+    )
+    source: bpy.props.EnumProperty(
+        name="Surface",
+        items=[
+            ('ENTITY', "Entity Meshes", "Meshes parented under the active entity"),
+            ('SELECTED', "Selected Meshes", "Selected meshes, e.g. map surfaces"),
+        ],
+        default='ENTITY',
+    )
+    category: bpy.props.EnumProperty(name="Category", items=NULLBOX_CATEGORIES, default='ATTACH')
+    amount: bpy.props.IntProperty(name="Amount", default=10, min=1, max=10000)
+    seed: bpy.props.IntProperty(name="Seed", default=0, min=0)
+    align: bpy.props.BoolProperty(name="Align to Normal", default=True)
+    size: bpy.props.FloatProperty(name="Display Size", default=0.1, min=0.001)
+
+    @classmethod
+    def poll(cls, context):
+        return context.active_object and context.active_object.type == 'EMPTY' and context.mode == 'OBJECT'
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        entity = context.active_object
+
+        mark_phase("Build surface")
+        objects = surface_objects(context, entity, self.source)
+        if not objects:
+            self.report({'WARNING'}, "No surface meshes found")
+            return {'CANCELLED'}
+        surface = get_surface(objects)
+        if not len(surface.triangles):
+            self.report({'WARNING'}, "The surface meshes have no faces")
+            return {'CANCELLED'}
+
+        if self.mode == 'SCATTER':
+            mark_phase("Scatter")
+            samples = surface.scatter(self.amount, self.seed)
+            matrices = [aligned_matrix(location, normal, self.align) for location, normal in samples]
+            nullboxes = create_nullboxes(entity, self.category, matrices, self.size)
+        else:
+            mark_phase("Snap")
+            empties = [obj for obj in context.selected_objects if obj.type == 'EMPTY' and obj != entity and obj not in objects]
+            matrices = []
+            nullboxes = []
+            for empty in empties:
+                hit = surface.snap(empty.matrix_world.translation)
+                if hit:
+                    matrices.append(aligned_matrix(hit[0], hit[1], self.align))
+                    nullboxes.append(empty)
+            numbered = snap_nullboxes(entity, self.category, nullboxes, matrices)
+            count(objects=len(nullboxes))
+            self.report({'INFO'}, f"Snapped {len(nullboxes)} nullboxes on {entity.name}, {numbered} given new ids")
+            return {'FINISHED'}
+        count(objects=len(nullboxes))
+
+        self.report({'INFO'}, f"Placed {len(nullboxes)} {self.category} nullboxes on {entity.name}")
+        return {'FINISHED'}
+
+
+@persistent
+def nullboxes_depsgraph_update(scene, depsgraph):
+    # Edited meshes keep their name and vertex count, drop every surface to be safe
+    if surface_cache:
+        for update in depsgraph.updates:
+            if isinstance(update.id, bpy.types.Object) and update.is_updated_geometry:
+                surface_cache.clear()
+                return
+
+@persistent
+def nullboxes_load_post(*args):
+    surface_cache.clear()
+
+
+def register():
+    bpy.utils.register_class(OBJECT_OT_PlaceNullboxes)
+    bpy.app.handlers.depsgraph_update_post.append(nullboxes_depsgraph_update)
+    bpy.app.handlers.load_post.append(nullboxes_load_post)
+
+def unregister():
+    bpy.utils.unregister_class(OBJECT_OT_PlaceNullboxes)
+    bpy.app.handlers.depsgraph_update_post.remove(nullboxes_depsgraph_update)
+    bpy.app.handlers.load_post.remove(nullboxes_load_post)
+    surface_cache.clear()
@@ -3,6 +3,14 @@ from .map_editing import update_ice_layer_visibility
 from .map_editing import update_invisible_flag_visibility
 from .map_editing import update_floor_visibility
 from .map_editing import update_collider_visibility
+from .streaming import update_stream_floors
+from . import lod
+from .lod import update_lod_mode, update_lod_settings
+from .core import FLOOR_NUMBERS
+from .profiling import recent_runs
+from . import jobs
+from . import journal
+from . import stats
 
 class GHOST_MASTER_HELPER_PT_GeneralPanel(bpy.types.Panel):
     # Creates the main panel
@@ -12,20 +20,30 @@ class GHOST_MASTER_HELPER_PT_GeneralPanel(bpy.types.Panel):
     bl_region_type = 'UI'
     bl_category = "GM Tools"
 
-    # Define properties
-    bpy.types.Scene.use_render_flags = bpy.props.BoolProperty(name="Render Flags", default=False)
-    bpy.types.Scene.use_armature_flags = bpy.props.BoolProperty(name="Armature", default=False)
-
     def draw(self, context):
         layout = self.layout
         scene = context.scene
 
+        # Progress of the running job
+        if jobs.active_job:
+            job = jobs.active_job
+            layout.progress(factor=job.factor, type='BAR', text=f"{job.label} {job.done}/{job.total}, Esc to cancel")
+
         # Button to Set Specular Tint to Black
         layout.operator("object.set_specular_tint_to_black", text="Set Specular Tint to Black")
 
         # Button to Setup Alpha Clip Material
         layout.operator("object.setup_alpha_clip_material", text="Setup Alpha Clip Material")
 
+        # Property journal, undo for the tagging operators without global undo steps
+        layout.prop(scene, "gm_use_property_journal", text="Use Property Journal")
+        if scene.gm_use_property_journal:
+            row = layout.row(align=True)
+            row.operator("object.gm_journal_undo", text="Undo", icon='LOOP_BACK')
+            row.operator("object.gm_journal_redo", text="Redo", icon='LOOP_FORWARDS')
+            if journal.undo_label():
+                layout.label(text=f"Last: {journal.undo_label()}")
+
 
         # Armature Panel
         row = layout.row()
@@ -35,6 +53,7 @@ class GHOST_MASTER_HELPER_PT_GeneralPanel(bpy.types.Panel):
             col.operator("armature.set_headbone", text="Set Headbone")
             col.operator("armature.set_chainpoint", text="Set Chainpoint")
             col.operator("armature.set_spellpoint", text="Set SpellPoint")
+            col.operator("object.gm_mirror_sides", text="Mirror Bone Tags")
 
 class GHOST_MASTER_HELPER_PT_MapEditingPanel(bpy.types.Panel):
     # Creates the map editing panel
@@ -44,22 +63,6 @@ class GHOST_MASTER_HELPER_PT_MapEditingPanel(bpy.types.Panel):
     bl_region_type = 'UI'
     bl_category = "GM Tools"
 
-    # Define properties
-    bpy.types.Scene.use_map_editing = bpy.props.BoolProperty(name="Map Editing", default=False)
-    bpy.types.Scene.use_floor_view = bpy.props.BoolProperty(name="Current Floor View", default=False)
-
-    bpy.types.Scene.show_ice_layer = bpy.props.BoolProperty(name="Show Ice Layer", default=True, update=update_ice_layer_visibility)
-    bpy.types.Scene.show_invisible_flag = bpy.props.BoolProperty(name="Show Invisible Flag", default=False, update=update_invisible_flag_visibility)
-    bpy.types.Scene.show_collider_objects = bpy.props.BoolProperty(name="Show Colliders", default=False, update=update_collider_visibility)
-
-
-    bpy.types.Scene.show_floor_1 = bpy.props.BoolProperty(name="Floor 1", default=True, update=update_floor_visibility)
-    bpy.types.Scene.show_floor_2 = bpy.props.BoolProperty(name="Floor 2", default=True, update=update_floor_visibility)
-    bpy.types.Scene.show_floor_3 = bpy.props.BoolProperty(name="Floor 3", default=True, update=update_floor_visibility)
-    bpy.types.Scene.show_floor_4 = bpy.props.BoolProperty(name="Floor 4", default=True, update=update_floor_visibility)
-    bpy.types.Scene.show_floor_5 = bpy.props.BoolProperty(name="Floor 5", default=True, update=update_floor_visibility)
-    bpy.types.Scene.show_floor_6 = bpy.props.BoolProperty(name="Floor 6", default=True, update=update_floor_visibility)
-
     def draw(self, context):
         layout = self.layout
         scene = context.scene
@@ -90,7 +93,77 @@ class GHOST_MASTER_HELPER_PT_MapEditingPanel(bpy.types.Panel):
         
         # Set Floor Button
         layout.operator("object.set_floor_property", text="Set Floor")
-        layout.operator("object.split_faces_keep_normals", text="Split Faces Normal Transfer")
+
+        # Auto Floors from height bands
+        col = layout.column(align=True)
+        col.prop(scene, "gm_floor_base_z", text="Floor Base Z")
+        col.prop(scene, "gm_floor_height", text="Floor Height")
+        col.operator("object.auto_assign_floors", text="Auto Assign Floors")
+        layout.operator("object.gm_run_job", text="Split Faces Normal Transfer").job = 'SPLIT_FACES'
+        layout.operator("object.generate_colliders", text="Generate Colliders")
+
+        # Viewport LOD
+        row = layout.row()
+        row.prop(scene, "gm_lod_mode", text="Viewport LOD", icon="TRIA_DOWN" if scene.gm_lod_mode else "TRIA_RIGHT", emboss=False)
+        if scene.gm_lod_mode:
+            col = layout.column(align=True)
+            col.row(align=True).prop(scene, "gm_lod_criteria", expand=True)
+            col.prop(scene, "gm_lod_display", text="Display As")
+            if 'FOCUS' in scene.gm_lod_criteria:
+                col.prop(scene, "gm_lod_radius", text="Focus Radius")
+            if 'FLOOR' in scene.gm_lod_criteria:
+                col.prop(scene, "gm_lod_floor", text="Focus Floor")
+            col.operator("object.gm_refresh_lod", text="Refresh")
+            if lod.linked_targets:
+                col.label(text=f"{lod.linked_targets} linked objects unchanged", icon='LIBRARY_DATA_DIRECT')
+
+        # Floor streaming from per floor library files
+        row = layout.row(align=True)
+        row.operator("object.gm_split_floors", text="Split Map Floors")
+        row.prop(scene, "gm_stream_floors", text="Stream", toggle=True)
+
+        # Property query
+        col = layout.column(align=True)
+        col.prop(scene, "gm_query", text="", icon='VIEWZOOM')
+        row = col.row(align=True)
+        row.operator("object.gm_query", text="Select").action = 'SELECT'
+        row.operator("object.gm_query", text="Hide").action = 'HIDE'
+        row.operator("object.gm_query", text="Isolate").action = 'ISOLATE'
+
+        # Cleanup of imported maps
+        col = layout.column(align=True)
+        col.operator("object.link_duplicate_meshes", text="Link Duplicate Meshes")
+        col.operator("object.gm_run_job", text="Merge Duplicate Materials").job = 'MERGE_DUPLICATE_MATERIALS'
+        col.operator("object.gm_run_job", text="Audit Textures").job = 'AUDIT_TEXTURES'
+        col.operator("object.gm_run_job", text="Merge Duplicate Images").job = 'MERGE_DUPLICATE_IMAGES'
+        col.operator("object.build_texture_atlas", text="Build Texture Atlas")
+
+class OBJECT_OT_LoadRigTools(bpy.types.Operator):
+    """Load the Ghost Master rig and animation tools, then run the rig tool that was clicked"""
+    bl_idname = "object.gm_load_rig_tools"
+    bl_label = "Load Rig Tools"
+
+    then: bpy.props.StringProperty(name="Then", description="Rig tool operator to run once loaded, e.g. object.ghost_master_ik", options={'HIDDEN'})
+
+    def execute(self, context):
+        from . import ensure_rig_tools
+        ensure_rig_tools()
+        if self.then:
+            category, name = self.then.split(".")
+            try:
+                return getattr(getattr(bpy.ops, category), name)('INVOKE_DEFAULT')
+            except RuntimeError as error:
+                # e.g. the tool's poll failed, the rig tools stay loaded
+                self.report({'WARNING'}, str(error))
+                return {'CANCELLED'}
+        return {'FINISHED'}
+
+def rig_operator(layout, idname, text):
+    """Button of a rig tool, going through Load Rig Tools until the rig tools are loaded."""
+    if hasattr(bpy.types, "OBJECT_OT_ghost_master_ik"):
+        layout.operator(idname, text=text)
+    else:
+        layout.operator("object.gm_load_rig_tools", text=text).then = idname
 
 class GHOST_MASTER_HELPER_PT_GhostMasterAnimationPanel(bpy.types.Panel):
     """Creates IK setup for Ghost Master rig"""
@@ -100,12 +173,12 @@ class GHOST_MASTER_HELPER_PT_GhostMasterAnimationPanel(bpy.types.Panel):
     bl_region_type = 'UI'
     bl_category = 'GM Tools'
 
-    # Define properties
-    bpy.types.Scene.use_FK_IK_Switch = bpy.props.BoolProperty(name="FK/IK Switch", default=True)
-
     def draw(self, context):
         layout = self.layout
-        layout.operator("object.ghost_master_ik", text="Rig Setup")
+
+        # The rig tools are loaded on first use, by the first of these buttons clicked
+        rig_operator(layout, "object.ghost_master_ik", "Rig Setup")
+        rig_operator(layout, "object.capture_rig_template", "Capture Rig Template")
         scene = context.scene
         row = layout.row()
         
@@ -113,16 +186,19 @@ class GHOST_MASTER_HELPER_PT_GhostMasterAnimationPanel(bpy.types.Panel):
         row.prop(scene, "use_FK_IK_Switch", text="FK/IK Switch", icon="TRIA_DOWN" if scene.use_FK_IK_Switch else "TRIA_RIGHT", emboss=False)
         if scene.use_FK_IK_Switch:
             grid = layout.grid_flow(columns=2, even_columns=True, even_rows=True, align=True)
-            grid.operator("object.switch_fkik_arm_r", text="Arm R")
-            grid.operator("object.switch_fkik_leg_r", text="Leg R")
-            grid.operator("object.switch_fkik_arm_l", text="Arm L")
-            grid.operator("object.switch_fkik_leg_l", text="Leg L")
+            rig_operator(grid, "object.switch_fkik_arm_r", "Arm R")
+            rig_operator(grid, "object.switch_fkik_leg_r", "Leg R")
+            rig_operator(grid, "object.switch_fkik_arm_l", "Arm L")
+            rig_operator(grid, "object.switch_fkik_leg_l", "Leg L")
 
         # Add button for Delete rig Setup
-        layout.operator("object.delete_rig_setup", text="Delete Rig Setup")
+        rig_operator(layout, "object.delete_rig_setup", "Delete Rig Setup")
+
+        # Add button for Action Retargeting
+        rig_operator(layout, "object.retarget_actions", "Retarget Actions")
 
         #Add button for Sanity Check
-        layout.operator("object.sanity_check", text="Sanity Check")
+        rig_operator(layout, "object.sanity_check", "Sanity Check")
 
 
 class GHOST_MASTER_HELPER_PT_EntityEditingPanel(bpy.types.Panel):
@@ -139,6 +215,8 @@ class GHOST_MASTER_HELPER_PT_EntityEditingPanel(bpy.types.Panel):
 
         #Add a button to transfer nullboxes
         layout.operator("object.transfer_nullboxes", text="Transfer Nullboxes")
+        layout.operator("object.place_nullboxes", text="Place Nullboxes")
+        layout.operator("object.gm_mirror_sides", text="Mirror Nullboxes")
 
         layout.separator()
 
@@ -148,17 +226,165 @@ class GHOST_MASTER_HELPER_PT_EntityEditingPanel(bpy.types.Panel):
         #Add a button to relink UV Driver
         layout.operator("object.relink_uv_driver", text="Relink UV Driver")
         
+class GHOST_MASTER_HELPER_PT_ProfilingPanel(bpy.types.Panel):
+    # Creates the profiling panel listing the latest operator timings
+    bl_label = "Profiling"
+    bl_idname = "GHOST_MASTER_HELPER_PT_profiling_panel"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = "GM Tools"
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw(self, context):
+        layout = self.layout
+        scene = context.scene
+
+        row = layout.row(align=True)
+        row.operator("object.gm_export_profile", text="Export JSON")
+        row.operator("object.gm_clear_profile", text="Clear")
+        layout.prop(scene, "show_profile_phases", text="Show Phases")
+
+        if not recent_runs:
+            layout.label(text="No runs recorded yet")
+            return
+
+        # Newest runs first
+        col = layout.column(align=True)
+        for run in list(reversed(recent_runs))[:10]:
+            col.label(text=f"{run.name}: {run.duration * 1000:.1f} ms, {run.objects} objects")
+            if scene.show_profile_phases:
+                for phase in run.phases:
+                    col.label(text=f"    {phase.name}: {phase.duration * 1000:.1f} ms, {phase.rna_calls} calls")
+
+class GHOST_MASTER_HELPER_PT_FloorStatisticsPanel(bpy.types.Panel):
+    # Creates the floor statistics panel with the per floor budgets
+    bl_label = "Floor Statistics"
+    bl_idname = "GHOST_MASTER_HELPER_PT_floor_statistics_panel"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = "GM Tools"
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw(self, context):
+        layout = self.layout
+        scene = context.scene
+
+        col = layout.column(align=True)
+        col.prop(scene, "gm_budget_triangles", text="Triangles")
+        col.prop(scene, "gm_budget_objects", text="Objects")
+        col.prop(scene, "gm_budget_materials", text="Materials")
+        layout.operator("object.gm_floor_statistics", text="Compute Statistics")
+
+        if stats.last_statistics is None:
+            return
+
+        # Render totals per floor, colliders and flagged objects are in the text report
+        col = layout.column(align=True)
+        for floor, categories in stats.last_statistics.items():
+            totals = categories["render"]
+            row = col.row()
+            row.alert = bool(stats.over_budget(scene, totals))
+            row.label(text=f"Floor {floor}: {totals.triangles} tris, {totals.objects} objects, {len(totals.materials)} materials")
+
+# Scene properties used by the panels, only added to Scene when the add-on registers
+def scene_properties():
+    return {
+        # General
+        "use_render_flags": bpy.props.BoolProperty(name="Render Flags", default=False),
+        "use_armature_flags": bpy.props.BoolProperty(name="Armature", default=False),
+        "gm_use_property_journal": bpy.props.BoolProperty(
+            name="Use Property Journal",
+            description="Tagging operators record their changes in a light journal instead of pushing global undo steps",
+            default=False,
+            update=journal.update_use_journal,
+        ),
+
+        # Map Editing
+        "use_map_editing": bpy.props.BoolProperty(name="Map Editing", default=False),
+        "use_floor_view": bpy.props.BoolProperty(name="Current Floor View", default=False),
+        "show_ice_layer": bpy.props.BoolProperty(name="Show Ice Layer", default=True, update=update_ice_layer_visibility),
+        "show_invisible_flag": bpy.props.BoolProperty(name="Show Invisible Flag", default=False, update=update_invisible_flag_visibility),
+        "show_collider_objects": bpy.props.BoolProperty(name="Show Colliders", default=False, update=update_collider_visibility),
+        "show_floor_1": bpy.props.BoolProperty(name="Floor 1", default=True, update=update_floor_visibility),
+        "show_floor_2": bpy.props.BoolProperty(name="Floor 2", default=True, update=update_floor_visibility),
+        "show_floor_3": bpy.props.BoolProperty(name="Floor 3", default=True, update=update_floor_visibility),
+        "show_floor_4": bpy.props.BoolProperty(name="Floor 4", default=True, update=update_floor_visibility),
+        "show_floor_5": bpy.props.BoolProperty(name="Floor 5", default=True, update=update_floor_visibility),
+        "show_floor_6": bpy.props.BoolProperty(name="Floor 6", default=True, update=update_floor_visibility),
+        "gm_floor_base_z": bpy.props.FloatProperty(name="Floor Base Z", default=0.0, unit='LENGTH'),
+        "gm_floor_height": bpy.props.FloatProperty(name="Floor Height", default=3.0, min=0.01, unit='LENGTH'),
+        "gm_stream_floors": bpy.props.BoolProperty(
+            name="Stream Floors",
+            description="Only link the floor libraries of the floors shown by the Current Floor View toggles",
+            default=False,
+            update=update_stream_floors,
+        ),
+        "gm_lod_mode": bpy.props.BoolProperty(name="LOD Mode", default=False, update=update_lod_mode),
+        "gm_lod_display": bpy.props.EnumProperty(
+            name="Display As",
+            items=[('BOUNDS', "Bounds", ""), ('WIRE', "Wire", "")],
+            default='BOUNDS',
+            update=update_lod_settings,
+        ),
+        "gm_lod_criteria": bpy.props.EnumProperty(
+            name="Low Detail",
+            items=[
+                ('FOCUS', "Outside Focus", "Meshes outside the focus radius around the 3D cursor"),
+                ('FLOOR', "Other Floors", "Meshes not on the focus floor"),
+                ('COLLIDER', "Colliders", "IS_COLLIDER meshes"),
+                ('INVISIBLE', "Invisible", "FLAGS0 INVISIBLE meshes"),
+            ],
+            options={'ENUM_FLAG'},
+            default={'FOCUS'},
+            update=update_lod_settings,
+        ),
+        "gm_lod_radius": bpy.props.FloatProperty(name="Focus Radius", default=20.0, min=0.0, unit='LENGTH', update=update_lod_settings),
+        "gm_lod_floor": bpy.props.EnumProperty(
+            name="Focus Floor",
+            items=[(floor, f"Floor {floor}", "") for floor in FLOOR_NUMBERS],
+            default='1',
+            update=update_lod_settings,
+        ),
+        "gm_query": bpy.props.StringProperty(
+            name="Query",
+            description="GM property filter, e.g. floor=3 and flags0=INVISIBLE, nullbox=SPELLPOINT and name~MDL-AP*",
+        ),
+
+        # Floor statistics budgets, 0 for no budget
+        "gm_budget_triangles": bpy.props.IntProperty(name="Triangle Budget", default=20000, min=0),
+        "gm_budget_objects": bpy.props.IntProperty(name="Object Budget", default=500, min=0),
+        "gm_budget_materials": bpy.props.IntProperty(name="Material Budget", default=64, min=0),
+
+        # Animation
+        "use_FK_IK_Switch": bpy.props.BoolProperty(name="FK/IK Switch", default=True),
+
+        # Profiling
+        "show_profile_phases": bpy.props.BoolProperty(name="Show Phases", default=False),
+    }
+
 def register():
+    for name, prop in scene_properties().items():
+        setattr(bpy.types.Scene, name, prop)
+
+    bpy.utils.register_class(OBJECT_OT_LoadRigTools)
     bpy.utils.register_class(GHOST_MASTER_HELPER_PT_GeneralPanel)
     bpy.utils.register_class(GHOST_MASTER_HELPER_PT_MapEditingPanel)
     bpy.utils.register_class(GHOST_MASTER_HELPER_PT_GhostMasterAnimationPanel)
     bpy.utils.register_class(GHOST_MASTER_HELPER_PT_EntityEditingPanel)
+    bpy.utils.register_class(GHOST_MASTER_HELPER_PT_FloorStatisticsPanel)
+    bpy.utils.register_class(GHOST_MASTER_HELPER_PT_ProfilingPanel)
 
 def unregister():
+    for name in scene_properties():
+        delattr(bpy.types.Scene, name)
+
+    bpy.utils.unregister_class(OBJECT_OT_LoadRigTools)
     bpy.utils.unregister_class(GHOST_MASTER_HELPER_PT_GeneralPanel)
     bpy.utils.unregister_class(GHOST_MASTER_HELPER_PT_MapEditingPanel)
     bpy.utils.unregister_class(GHOST_MASTER_HELPER_PT_GhostMasterAnimationPanel)
     bpy.utils.unregister_class(GHOST_MASTER_HELPER_PT_EntityEditingPanel)
+    bpy.utils.unregister_class(GHOST_MASTER_HELPER_PT_FloorStatisticsPanel)
+    bpy.utils.unregister_class(GHOST_MASTER_HELPER_PT_ProfilingPanel)
 
 if __name__ == "__main__":
     register()
@@ -0,0 +1,175 @@
+import bpy
+import functools
+import json
+import time
+from collections import deque
+from bpy_extras.io_utils import ExportHelper
+
+# Lightweight timing of the GM Tools operators and update callbacks.
+# Every run records its wall time, split into phases marked by the code being timed,
+# and the objects / RNA calls the code reports through count().
+
+# Most recent runs, newest last
+MAX_RUNS = 100
+recent_runs = deque(maxlen=MAX_RUNS)
+
+# Runs being recorded, a callback fired from inside an operator nests in it
+run_stack = []
+
+
+class Phase:
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.objects = 0
+        self.rna_calls = 0
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "duration_ms": self.duration * 1000.0,
+            "objects": self.objects,
+            "rna_calls": self.rna_calls,
+        }
+
+
+class Run:
+    def __init__(self, name, kind):
+        self.name = name
+        self.kind = kind
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.objects = 0
+        self.rna_calls = 0
+        self.result = ""
+        self.phases = []
+
+    @property
+    def phase(self):
+        return self.phases[-1] if self.phases else None
+
+    def close_phase(self):
+        if self.phase and not self.phase.duration:
+            self.phase.duration = time.perf_counter() - self.phase.start
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "timestamp": self.timestamp,
+            "duration_ms": self.duration * 1000.0,
+            "objects": self.objects,
+            "rna_calls": self.rna_calls,
+            "result": self.result,
+            "phases": [phase.to_dict() for phase in self.phases],
+        }
+
+
+def begin_run(name, kind):
+    run = Run(name, kind)
+    run_stack.append(run)
+    return run
+
+def end_run(run):
+    run.close_phase()
+    run.duration = time.perf_counter() - run.start
+    run_stack.remove(run)
+    recent_runs.append(run)
+
+def mark_phase(name):
+    """Ends the current phase of the running operator and starts a new one called name."""
+    if run_stack:
+        run = run_stack[-1]
+        run.close_phase()
+        run.phases.append(Phase(name))
+
+def add_phase(run, name, seconds):
+    """Adds a phase timed outside of the run, e.g. module imports before registration."""
+    phase = Phase(name)
+    phase.duration = seconds
+    run.phases.append(phase)
+
+def count(objects=0, rna_calls=0):
+    """Adds touched objects and RNA calls to the running operator and its current phase.
+    Only report RNA calls the code actually counted, leave it at 0 rather than estimate."""
+    if run_stack:
+        run = run_stack[-1]
+        run.objects += objects
+        run.rna_calls += rna_calls
+        if run.phase:
+            run.phase.objects += objects
+            run.phase.rna_calls += rna_calls
+
+
+def profile_operator(cls):
+    """Wraps the execute method of an operator class so each call is recorded."""
+    execute = cls.__dict__.get("execute")
+    if execute is None or getattr(execute, "gm_profiled", False):
+        return cls
+
+    @functools.wraps(execute)
+    def execute_profiled(self, context):
+        run = begin_run(self.bl_idname, 'OPERATOR')
+        try:
+            result = execute(self, context)
+            run.result = ",".join(sorted(result)) if result else ""
+            return result
+        finally:
+            end_run(run)
+
+    execute_profiled.gm_profiled = True
+    cls.execute = execute_profiled
+    return cls
+
+def profile_callback(func):
+    """Decorator recording each call of a property update callback."""
+    @functools.wraps(func)
+    def callback_profiled(self, context):
+        run = begin_run(func.__name__, 'CALLBACK')
+        try:
+            return func(self, context)
+        finally:
+            end_run(run)
+
+    return callback_profiled
+
+def instrument_module(module):
+    """Profiles every operator class defined in module, must run before the classes are registered."""
+    for value in list(vars(module).values()):
+        if isinstance(value, type) and issubclass(value, bpy.types.Operator) and value.__module__ == module.__name__:
+            profile_operator(value)
+
+
+class OBJECT_OT_ExportProfile(bpy.types.Operator, ExportHelper):
+    """Export the recorded GM Tools operator timings as JSON"""
+    bl_idname = "object.gm_export_profile"
+    bl_label = "Export Profile"
+
+    filename_ext = ".json"
+    filter_glob: bpy.props.StringProperty(default="*.json", options={'HIDDEN'})
+
+    def execute(self, context):
+        with open(self.filepath, "w", encoding="utf-8") as f:
+            json.dump({"runs": [run.to_dict() for run in recent_runs]}, f, indent=2)
+        self.report({'INFO'}, f"Exported {len(recent_runs)} runs to {self.filepath}")
+        return {'FINISHED'}
+
+class OBJECT_OT_ClearProfile(bpy.types.Operator):
+    """Clear the recorded GM Tools operator timings"""
+    bl_idname = "object.gm_clear_profile"
+    bl_label = "Clear Profile"
+
+    def execute(self, context):
+        recent_runs.clear()
+        return {'FINISHED'}
+
+
+def register():
+    bpy.utils.register_class(OBJECT_OT_ExportProfile)
+    bpy.utils.register_class(OBJECT_OT_ClearProfile)
+
+def unregister():
+    bpy.utils.unregister_class(OBJECT_OT_ExportProfile)
+    bpy.utils.unregister_class(OBJECT_OT_ClearProfile)
@@ -0,0 +1,160 @@
+import bpy
+from bpy.app.handlers import persistent
+from .core import parse_query, PropertyIndex, QueryError
+from .schema import gm_values, mask_floors
+from .profiling import mark_phase, count
+
+# Filter expressions over the GM properties of the scene objects, e.g.
+#   floor=3 and flags0=INVISIBLE
+#   nullbox=SPELLPOINT and name~MDL-AP*
+#   not (collider=TRUE or type=EMPTY)
+# The typed GM tags are read once into a cached inverted index, queries are then set operations.
+# The index keeps object names and looks the objects up when it returns them. Objects whose
+# tags or data changed are read again, the index is dropped on undo and when objects are
+# added, removed or renamed, so it never hands out freed objects or reads old tags.
+
+
+def object_record(obj):
+    """Index record of obj, from its schema values, or its legacy keys when linked or not synced."""
+    gm = gm_values(obj)
+    return {
+        "name": obj.name,
+        "type": (obj.type,),
+        "floor": mask_floors(gm.floors) if gm.has_floors else (),
+        "flags0": (gm.flags0_other if gm.flags0 == 'OTHER' else gm.flags0,),
+        "collider": ("TRUE" if gm.is_collider else "FALSE",),
+        "nullbox": (gm.nullbox_other if gm.nullbox == 'OTHER' else gm.nullbox,),
+        "nullbox_id": (str(gm.nullbox_id),) if gm.nullbox_id >= 0 else (),
+        "clump_floor": mask_floors(gm.clump_floors) if gm.has_clump_floors else (),
+    }
+
+
+class ScenePropertyIndex(PropertyIndex):
+    def __init__(self, scene):
+        self.scene_object_count = len(scene.objects)
+        super().__init__(object_record(obj) for obj in scene.objects)
+
+    def refresh(self, objects):
+        """Reads the records of objects again, False if one of them is not in the index."""
+        for obj in objects:
+            i = self.numbers.get(obj.name)
+            if i is None:
+                return False
+            self.update(i, object_record(obj))
+        return True
+
+    def object(self, i):
+        """Object of record i, None if it was deleted since the index was built."""
+        return bpy.data.objects.get(self.names[i])
+
+    def query(self, text):
+        """Objects matching the filter expression text, raises QueryError if it does not parse."""
+        objects = (self.object(i) for i in sorted(self.evaluate(parse_query(text))))
+        return [obj for obj in objects if obj is not None]
+
+
+# Indices by scene pointer
+index_cache = {}
+
+def get_property_index(scene):
+    """Returns the cached property index of the scene, rebuilt when objects were added or removed."""
+    key = scene.as_pointer()
+    index = index_cache.get(key)
+    if index is None or index.scene_object_count != len(scene.objects):
+        index = ScenePropertyIndex(scene)
+        index_cache[key] = index
+    return index
+
+@persistent
+def query_load_post(*args):
+    index_cache.clear()
+
+@persistent
+def query_depsgraph_update(scene, depsgraph):
+    # Tag edits, renames and added objects come as object updates without a transform, moves
+    # alone keep the index
+    if not index_cache:
+        return
+    changed = [
+        update.id.original for update in depsgraph.updates
+        if isinstance(update.id, bpy.types.Object) and (not update.is_updated_transform or update.is_updated_geometry)
+    ]
+    if changed:
+        for key, index in list(index_cache.items()):
+            if not index.refresh(changed):
+                del index_cache[key]
+
+
+class OBJECT_OT_GMQuery(bpy.types.Operator):
+    """Select, hide or isolate the objects matching a GM property filter, e.g. floor=3 and flags0=INVISIBLE"""
+    bl_idname = "object.gm_query"
+    bl_label = "GM Query"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    expression: bpy.props.StringProperty(name="Expression", description="Filter, empty uses the panel query")
+    action: bpy.props.EnumProperty(
+        name="Action",
+        items=[
+            ('SELECT', "Select", "Select the matches and deselect everything else"),
+            ('HIDE', "Hide", "Hide the matches"),
+            ('ISOLATE', "Isolate", "Show the matches and hide everything else"),
+        ],
+        default='SELECT',
+    )
+
+    def execute(self, context):
+        scene = context.scene
+        expression = self.expression or scene.gm_query
+
+        mark_phase("Query")
+        index = get_property_index(scene)
+        try:
+            matches = set(index.query(expression))
+        except QueryError as error:
+            self.report({'ERROR'}, f"Query: {error}")
+            return {'CANCELLED'}
+
+        # One pass over the objects, only the ones whose state changes are written
+        mark_phase("Apply")
+        view_layer = context.view_layer
+        changed = visited = 0
+        for i in range(len(index)):
+            obj = index.object(i)
+            if obj is None or obj.name not in view_layer.objects:
+                continue
+            visited += 1
+            matched = obj in matches
+            if self.action == 'SELECT':
+                if obj.select_get() != matched:
+                    obj.select_set(matched)
+                    changed += 1
+            elif self.action == 'HIDE':
+                if matched and not obj.hide_get():
+                    obj.hide_set(True)
+                    changed += 1
+            elif obj.hide_get() == matched:
+                obj.hide_set(not matched)
+                changed += 1
+        count(objects=changed, rna_calls=visited + changed)
+
+        if self.action == 'SELECT' and matches and view_layer.objects.active not in matches:
+            view_layer.objects.active = next(iter(matches))
+
+        self.report({'INFO'}, f"{len(matches)} of {len(index)} objects match")
+        return {'FINISHED'}
+
+
+def register():
+    bpy.utils.register_class(OBJECT_OT_GMQuery)
+    bpy.app.handlers.load_post.append(query_load_post)
+    bpy.app.handlers.undo_post.append(query_load_post)
+    bpy.app.handlers.redo_post.append(query_load_post)
+    bpy.app.handlers.depsgraph_update_post.append(query_depsgraph_update)
+
+def unregister():
+    bpy.utils.unregister_class(OBJECT_OT_GMQuery)
+    bpy.app.handlers.load_post.remove(query_load_post)
+    bpy.app.handlers.undo_post.remove(query_load_post)
+    bpy.app.handlers.redo_post.remove(query_load_post)
+    bpy.app.handlers.depsgraph_update_post.remove(query_depsgraph_update)
+    index_cache.clear()
@@ -0,0 +1,261 @@
+import bpy
+from types import SimpleNamespace
+from .core import FLOOR_NUMBERS, mesh_floors, entity_floors, floors_value
+
+# Typed schema of the Ghost Master custom properties.
+# The game exporter reads the legacy string keys (FLOORS, FLAGS0, IS_COLLIDER, nullboxes,
+# nullbox_ids, clump_floor_flags, UV_DRIVER, NullBoxes on bones), so they stay the saved
+# format. Object.gm and PoseBone.gm mirror them as enums, booleans and ints:
+#   - sync_object / sync_pose_bone read the legacy keys into the schema (the migration shim),
+#     the tools writing legacy keys call them. Keys edited by hand or by other scripts are
+#     picked up by Sync GM Properties, the panel offers it when the active object is out of date
+#   - editing a schema property writes the legacy key back (the export shim)
+# The query index, and through it the statistics and the LOD mode, and the visibility toggles
+# read the tags with gm_values: obj.gm for synced local objects, the legacy keys for linked
+# objects, which can not store the schema, and for objects never synced.
+
+FLAGS0_ITEMS = [
+    ('NONE', "None", "No FLAGS0 tag"),
+    ('INVISIBLE', "Invisible", "FLAGS0 is INVISIBLE"),
+    ('OTHER', "Other", "Any other FLAGS0 value, kept in flags0_other"),
+]
+
+NULLBOX_ITEMS = [
+    ('NONE', "None", "Not a nullbox"),
+    ('SPELLPOINT', "Spell Point", ""),
+    ('CHAINPOINT', "Chain Point", ""),
+    ('ATTACH', "Attach", ""),
+    ('OTHER', "Other", "Any other category, kept in nullbox_other"),
+]
+
+BONE_NULLBOX_ITEMS = [
+    ('NONE', "None", "No NullBoxes tag"),
+    ('CHAINPOINT', "Chain Point", ""),
+    ('SPELLPOINT', "Spell Point", ""),
+    ('OTHER', "Other", "Any other NullBoxes value, kept in null_boxes_other"),
+]
+
+# Set while the legacy keys are read in, the export shim must not write them back
+syncing = False
+
+
+def enum_value(value, items):
+    """Enum identifier of a legacy string value, 'NONE' if missing and 'OTHER' if unknown."""
+    if value is None:
+        return 'NONE'
+    value = str(value)
+    return value if value in {item[0] for item in items} and value not in ('NONE', 'OTHER') else 'OTHER'
+
+def floors_mask(floors):
+    """BoolVector value of a set of floor numbers."""
+    return tuple(floor in floors for floor in FLOOR_NUMBERS)
+
+def mask_floors(mask):
+    return {floor for floor, on in zip(FLOOR_NUMBERS, mask) if on}
+
+
+#####################################################
+# MIGRATION SHIM, legacy keys -> schema
+#####################################################
+
+def legacy_values(obj):
+    """Schema values of obj read from its legacy GM keys, by schema property name."""
+    flags0 = obj.get("FLAGS0")
+    category = obj.get("nullboxes")
+    try:
+        nullbox_id = int(obj.get("nullbox_ids", -1))
+    except (TypeError, ValueError):
+        nullbox_id = -1
+    values = {
+        "has_floors": "FLOORS" in obj,
+        "floors": floors_mask(mesh_floors(obj["FLOORS"]) if "FLOORS" in obj else ()),
+        "flags0": enum_value(flags0, FLAGS0_ITEMS),
+        "is_collider": obj.get("IS_COLLIDER") == "TRUE",
+        "nullbox": enum_value(category, NULLBOX_ITEMS),
+        "nullbox_id": nullbox_id,
+        "has_clump_floors": "clump_floor_flags" in obj,
+        "clump_floors": floors_mask(entity_floors(obj["clump_floor_flags"]) if "clump_floor_flags" in obj else ()),
+        "uv_driver": obj.get("UV_DRIVER") == "UV_DRIVER",
+    }
+    values["flags0_other"] = str(flags0) if values["flags0"] == 'OTHER' else ""
+    values["nullbox_other"] = str(category) if values["nullbox"] == 'OTHER' else ""
+    return values
+
+def gm_values(obj):
+    """GM tags of obj with the attributes of obj.gm, read from the legacy keys when obj.gm can not be used."""
+    if obj.library or not obj.gm.synced:
+        return SimpleNamespace(**legacy_values(obj))
+    return obj.gm
+
+def is_synced(obj):
+    """True when obj.gm matches the legacy keys of obj."""
+    gm = obj.gm
+    return all(
+        (tuple(getattr(gm, name)) if isinstance(value, tuple) else getattr(gm, name)) == value
+        for name, value in legacy_values(obj).items()
+    )
+
+def sync_object(obj):
+    """Reads the legacy GM keys of obj into obj.gm."""
+    global syncing
+    syncing = True
+    try:
+        gm = obj.gm
+        for name, value in legacy_values(obj).items():
+            setattr(gm, name, value)
+        gm.synced = True
+    finally:
+        syncing = False
+
+def sync_pose_bone(pose_bone):
+    global syncing
+    syncing = True
+    try:
+        value = pose_bone.get("NullBoxes")
+        pose_bone.gm.null_boxes = enum_value(value, BONE_NULLBOX_ITEMS)
+        pose_bone.gm.null_boxes_other = str(value) if pose_bone.gm.null_boxes == 'OTHER' else ""
+    finally:
+        syncing = False
+
+def sync_all(objects):
+    # Linked objects can not store the schema, their legacy keys are the only source
+    for obj in objects:
+        if obj.library:
+            continue
+        sync_object(obj)
+        if obj.type == 'ARMATURE' and obj.pose:
+            for pose_bone in obj.pose.bones:
+                sync_pose_bone(pose_bone)
+
+
+#####################################################
+# EXPORT SHIM, schema -> legacy keys
+#####################################################
+
+def set_or_remove(owner, key, value):
+    if value is None:
+        if key in owner:
+            del owner[key]
+    elif owner.get(key) != value:
+        owner[key] = value
+
+def export_object(obj):
+    """Writes obj.gm back to the legacy GM keys, values that did not change keep their formatting."""
+    gm = obj.gm
+    if not gm.has_floors:
+        set_or_remove(obj, "FLOORS", None)
+    elif "FLOORS" not in obj or mesh_floors(obj["FLOORS"]) != mask_floors(gm.floors):
+        obj["FLOORS"] = floors_value(mask_floors(gm.floors))
+
+    set_or_remove(obj, "FLAGS0", {'NONE': None, 'OTHER': gm.flags0_other or None}.get(gm.flags0, gm.flags0))
+    set_or_remove(obj, "IS_COLLIDER", "TRUE" if gm.is_collider else None)
+
+    set_or_remove(obj, "nullboxes", {'NONE': None, 'OTHER': gm.nullbox_other or None}.get(gm.nullbox, gm.nullbox))
+    if gm.nullbox == 'NONE' or gm.nullbox_id < 0:
+        set_or_remove(obj, "nullbox_ids", None)
+    elif obj.get("nullbox_ids") is None or str(obj["nullbox_ids"]) != str(gm.nullbox_id):
+        obj["nullbox_ids"] = str(gm.nullbox_id)
+
+    if not gm.has_clump_floors:
+        set_or_remove(obj, "clump_floor_flags", None)
+    elif "clump_floor_flags" not in obj or entity_floors(obj["clump_floor_flags"]) != mask_floors(gm.clump_floors):
+        obj["clump_floor_flags"] = "".join(sorted(mask_floors(gm.clump_floors)))
+
+    set_or_remove(obj, "UV_DRIVER", "UV_DRIVER" if gm.uv_driver else None)
+
+def update_object_schema(self, context):
+    if not syncing:
+        export_object(self.id_data)
+
+def update_bone_schema(self, context):
+    if not syncing:
+        pose_bone = self.id_data.path_resolve(self.path_from_id().rsplit(".", 1)[0])
+        set_or_remove(pose_bone, "NullBoxes", {'NONE': None, 'OTHER': self.null_boxes_other or None}.get(self.null_boxes, self.null_boxes))
+
+
+class GMObjectProperties(bpy.types.PropertyGroup):
+    has_floors: bpy.props.BoolProperty(name="Has Floors", update=update_object_schema)
+    floors: bpy.props.BoolVectorProperty(name="Floors", size=6, update=update_object_schema)
+    flags0: bpy.props.EnumProperty(name="FLAGS0", items=FLAGS0_ITEMS, update=update_object_schema)
+    flags0_other: bpy.props.StringProperty(name="FLAGS0 Value", update=update_object_schema)
+    is_collider: bpy.props.BoolProperty(name="Is Collider", update=update_object_schema)
+    nullbox: bpy.props.EnumProperty(name="Nullbox", items=NULLBOX_ITEMS, update=update_object_schema)
+    nullbox_other: bpy.props.StringProperty(name="Nullbox Category", update=update_object_schema)
+    nullbox_id: bpy.props.IntProperty(name="Nullbox ID", default=-1, min=-1, update=update_object_schema)
+    has_clump_floors: bpy.props.BoolProperty(name="Has Clump Floors", update=update_object_schema)
+    clump_floors: bpy.props.BoolVectorProperty(name="Clump Floors", size=6, update=update_object_schema)
+    uv_driver: bpy.props.BoolProperty(name="UV Driver", update=update_object_schema)
+    # Set by the first sync, files from before the schema read the legacy keys until then
+    synced: bpy.props.BoolProperty(name="Synced", options={'HIDDEN'})
+
+class GMBoneProperties(bpy.types.PropertyGroup):
+    null_boxes: bpy.props.EnumProperty(name="NullBoxes", items=BONE_NULLBOX_ITEMS, update=update_bone_schema)
+    null_boxes_other: bpy.props.StringProperty(name="NullBoxes Value", update=update_bone_schema)
+
+
+class OBJECT_OT_SyncGMProperties(bpy.types.Operator):
+    """Read the legacy GM custom properties into the typed GM properties"""
+    bl_idname = "object.gm_sync_properties"
+    bl_label = "Sync GM Properties"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    only_active: bpy.props.BoolProperty(name="Only Active", description="Only sync the active object", default=False)
+
+    def execute(self, context):
+        objects = [context.object] if self.only_active and context.object else bpy.data.objects
+        sync_all(objects)
+        self.report({'INFO'}, f"Synced {len(objects)} objects")
+        return {'FINISHED'}
+
+class OBJECT_PT_GMProperties(bpy.types.Panel):
+    bl_label = "Ghost Master"
+    bl_idname = "OBJECT_PT_gm_properties"
+    bl_space_type = 'PROPERTIES'
+    bl_region_type = 'WINDOW'
+    bl_context = "object"
+
+    def draw(self, context):
+        layout = self.layout
+        obj = context.object
+        gm = obj.gm
+
+        # Keys edited by hand or by other scripts are not read in until synced
+        if not obj.library and not is_synced(obj):
+            row = layout.row()
+            row.alert = True
+            row.operator("object.gm_sync_properties", text="Custom Properties Changed, Sync", icon='FILE_REFRESH').only_active = True
+
+        layout.prop(gm, "has_floors")
+        if gm.has_floors:
+            layout.row(align=True).prop(gm, "floors", text="")
+        layout.prop(gm, "flags0")
+        if gm.flags0 == 'OTHER':
+            layout.prop(gm, "flags0_other")
+        layout.prop(gm, "is_collider")
+        layout.prop(gm, "nullbox")
+        if gm.nullbox == 'OTHER':
+            layout.prop(gm, "nullbox_other")
+        if gm.nullbox != 'NONE':
+            layout.prop(gm, "nullbox_id")
+        layout.prop(gm, "has_clump_floors")
+        if gm.has_clump_floors:
+            layout.row(align=True).prop(gm, "clump_floors", text="")
+        layout.prop(gm, "uv_driver")
+        layout.operator("object.gm_sync_properties", text="Sync From Custom Properties")
+
+
+def register():
+    bpy.utils.register_class(GMObjectProperties)
+    bpy.utils.register_class(GMBoneProperties)
+    bpy.types.Object.gm = bpy.props.PointerProperty(type=GMObjectProperties)
+    bpy.types.PoseBone.gm = bpy.props.PointerProperty(type=GMBoneProperties)
+    bpy.utils.register_class(OBJECT_OT_SyncGMProperties)
+    bpy.utils.register_class(OBJECT_PT_GMProperties)
+
+def unregister():
+    bpy.utils.unregister_class(OBJECT_PT_GMProperties)
+    bpy.utils.unregister_class(OBJECT_OT_SyncGMProperties)
+    del bpy.types.PoseBone.gm
+    del bpy.types.Object.gm
+    bpy.utils.unregister_class(GMBoneProperties)
+    bpy.utils.unregister_class(GMObjectProperties)
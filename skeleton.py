@@ -0,0 +1,73 @@
+import bpy
+from bpy.app.handlers import persistent
+from .core import BoneHierarchy, is_unit_scale
+
+# Flat, array backed snapshot of an armature's bone hierarchy.
+# Reading bone.parent / bone.children through RNA is slow, so the hierarchy is read once
+# per armature and reused by the effector finder, the sanity check and the rig tools
+# until the armature data changes.
+
+
+class SkeletonSnapshot(BoneHierarchy):
+    """Bone names, parent indices and children of an armature, indexed by bone order."""
+
+    def __init__(self, armature):
+        bones = armature.data.bones
+        names = [bone.name for bone in bones]
+        index = {name: i for i, name in enumerate(names)}
+        super().__init__(names, [index[bone.parent.name] if bone.parent else -1 for bone in bones])
+
+
+# Snapshots by armature datablock pointer
+skeleton_cache = {}
+
+def get_skeleton(armature):
+    """Returns the cached snapshot of the armature object's bones, building it if needed."""
+    key = armature.data.as_pointer()
+    skeleton = skeleton_cache.get(key)
+    if skeleton is None or len(skeleton) != len(armature.data.bones):
+        skeleton = SkeletonSnapshot(armature)
+        skeleton_cache[key] = skeleton
+    return skeleton
+
+def invalidate_skeleton(armature=None):
+    """Drops the snapshot of one armature object, or of every armature when None."""
+    if armature is None:
+        skeleton_cache.clear()
+    else:
+        skeleton_cache.pop(armature.data.as_pointer(), None)
+
+def find_unscaled_pose_bones(armature, precision=3):
+    """Returns the names of pose bones whose scale is not 1,1,1, reading every scale in one call."""
+    pose_bones = armature.pose.bones
+    scales = [0.0] * (len(pose_bones) * 3)
+    pose_bones.foreach_get("scale", scales)
+
+    # Only the failing bones are looked up through RNA
+    bad = []
+    for i in range(len(pose_bones)):
+        if not is_unit_scale(scales[i * 3:i * 3 + 3], precision):
+            bad.append(pose_bones[i].name)
+    return bad
+
+
+@persistent
+def skeleton_depsgraph_update(scene, depsgraph):
+    # Any change to an armature datablock (new bones, renames, reparenting) drops its snapshot
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Armature):
+            skeleton_cache.pop(update.id.original.as_pointer(), None)
+
+@persistent
+def skeleton_load_post(*args):
+    skeleton_cache.clear()
+
+
+def register():
+    bpy.app.handlers.depsgraph_update_post.append(skeleton_depsgraph_update)
+    bpy.app.handlers.load_post.append(skeleton_load_post)
+
+def unregister():
+    bpy.app.handlers.depsgraph_update_post.remove(skeleton_depsgraph_update)
+    bpy.app.handlers.load_post.remove(skeleton_load_post)
+    skeleton_cache.clear()
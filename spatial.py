@@ -0,0 +1,134 @@
+import bpy
+from bpy.app.handlers import persistent
+from mathutils import Vector
+from mathutils.kdtree import KDTree
+
+# Cached spatial index over the map meshes.
+# World space bounds are read once per object, their centres go in a KD-tree, and box or
+# height band queries only test the bounds of the objects the KD-tree returns.
+# Objects are kept by name and looked up again when returned, so an index built before an
+# undo or a delete never hands out freed objects.
+
+
+class MapSpatialIndex:
+    """World space bounding boxes of the mesh objects of a scene, with box and height band queries."""
+
+    def __init__(self, scene):
+        self.scene_object_count = len(scene.objects)
+        objects = [obj for obj in scene.objects if obj.type == 'MESH']
+        self.names = [obj.name for obj in objects]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.mins = []
+        self.maxs = []
+        self.max_radius = 0.0
+
+        self.tree = KDTree(len(objects))
+        for i, obj in enumerate(objects):
+            corners = [obj.matrix_world @ Vector(corner) for corner in obj.bound_box]
+            low = Vector((min(c.x for c in corners), min(c.y for c in corners), min(c.z for c in corners)))
+            high = Vector((max(c.x for c in corners), max(c.y for c in corners), max(c.z for c in corners)))
+            self.mins.append(low)
+            self.maxs.append(high)
+            self.max_radius = max(self.max_radius, (high - low).length / 2)
+            self.tree.insert((low + high) / 2, i)
+        self.tree.balance()
+
+        # Whole map extent, used by the height band queries
+        if objects:
+            self.low = Vector((min(v.x for v in self.mins), min(v.y for v in self.mins), min(v.z for v in self.mins)))
+            self.high = Vector((max(v.x for v in self.maxs), max(v.y for v in self.maxs), max(v.z for v in self.maxs)))
+        else:
+            self.low = Vector()
+            self.high = Vector()
+
+    def __len__(self):
+        return len(self.names)
+
+    def object(self, i):
+        """Object number i, None if it was deleted since the index was built."""
+        return bpy.data.objects.get(self.names[i])
+
+    def bounds(self, obj):
+        i = self.index[obj.name]
+        return self.mins[i], self.maxs[i]
+
+    def query_box(self, low, high):
+        """Returns the indices of the objects whose bounds overlap the box low-high."""
+        low = Vector(low)
+        high = Vector(high)
+        center = (low + high) / 2
+        # Any overlapping object has its centre within the box radius plus its own radius
+        radius = (high - low).length / 2 + self.max_radius
+
+        hits = []
+        for _co, i, _dist in self.tree.find_range(center, radius):
+            obj_low = self.mins[i]
+            obj_high = self.maxs[i]
+            if (obj_low.x <= high.x and obj_high.x >= low.x and
+                    obj_low.y <= high.y and obj_high.y >= low.y and
+                    obj_low.z <= high.z and obj_high.z >= low.z):
+                hits.append(i)
+        return hits
+
+    def query_height_band(self, z_low, z_high):
+        """Returns the indices of the objects overlapping the height band z_low-z_high over the whole map.
+
+        Bands are half-open, so an object resting on a floor boundary only belongs to the floor above:
+        it covers [min z, max z), or just its height when it is flat."""
+        return [
+            i for i in self.query_box((self.low.x, self.low.y, z_low), (self.high.x, self.high.y, z_high))
+            if self.mins[i].z < z_high and (self.maxs[i].z > z_low or self.mins[i].z >= z_low)
+        ]
+
+    def query_box_objects(self, low, high):
+        objects = (self.object(i) for i in self.query_box(low, high))
+        return [obj for obj in objects if obj is not None]
+
+
+# Indices by scene pointer
+spatial_cache = {}
+
+def get_spatial_index(scene):
+    """Returns the cached spatial index of the scene, building it if needed."""
+    key = scene.as_pointer()
+    index = spatial_cache.get(key)
+    # Objects added or removed since the index was built make it stale as well
+    if index is None or index.scene_object_count != len(scene.objects):
+        index = MapSpatialIndex(scene)
+        spatial_cache[key] = index
+    return index
+
+def invalidate_spatial_index():
+    spatial_cache.clear()
+
+
+@persistent
+def spatial_depsgraph_update(scene, depsgraph):
+    # Moving, adding or editing any mesh object drops the index
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Object) and (update.is_updated_transform or update.is_updated_geometry):
+            spatial_cache.clear()
+            return
+
+@persistent
+def spatial_load_post(*args):
+    spatial_cache.clear()
+
+@persistent
+def spatial_undo_post(*args):
+    # Undo and redo can swap objects for others with the same count
+    spatial_cache.clear()
+
+
+def register():
+    bpy.app.handlers.depsgraph_update_post.append(spatial_depsgraph_update)
+    bpy.app.handlers.load_post.append(spatial_load_post)
+    bpy.app.handlers.undo_post.append(spatial_undo_post)
+    bpy.app.handlers.redo_post.append(spatial_undo_post)
+
+def unregister():
+    bpy.app.handlers.depsgraph_update_post.remove(spatial_depsgraph_update)
+    bpy.app.handlers.load_post.remove(spatial_load_post)
+    bpy.app.handlers.undo_post.remove(spatial_undo_post)
+    bpy.app.handlers.redo_post.remove(spatial_undo_post)
+    spatial_cache.clear()
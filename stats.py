@@ -0,0 +1,173 @@
+import bpy
+import numpy as np
+from bpy.app.handlers import persistent
+from .core import FLOOR_NUMBERS, is_ice_material
+from .query import get_property_index
+from .profiling import mark_phase, count
+
+# Per floor geometry statistics and budgets.
+# Mesh counts are cached per mesh and only re-read for meshes whose geometry changed since,
+# the floor and flag grouping comes from the cached property index of the query engine.
+
+STATS_TEXT = "GM Floor Statistics"
+
+# Object categories counted on every floor
+CATEGORIES = ("render", "collider", "invisible", "ice")
+
+
+class MeshStats:
+    def __init__(self, mesh):
+        self.vertices = len(mesh.vertices)
+        self.polygons = len(mesh.polygons)
+        self.loops = len(mesh.loops)
+        # Every n-gon fans into n - 2 triangles
+        self.triangles = self.loops - 2 * self.polygons
+
+        material_indices = np.empty(self.polygons, dtype=np.int32)
+        mesh.polygons.foreach_get("material_index", material_indices)
+        self.used_slots = np.unique(material_indices).tolist()
+
+    def matches(self, mesh):
+        return (self.vertices, self.polygons, self.loops) == (len(mesh.vertices), len(mesh.polygons), len(mesh.loops))
+
+
+class Totals:
+    def __init__(self):
+        self.objects = 0
+        self.vertices = 0
+        self.triangles = 0
+        self.materials = set()
+
+    def add(self, obj, stats):
+        self.objects += 1
+        self.vertices += stats.vertices
+        self.triangles += stats.triangles
+        for slot in stats.used_slots:
+            if slot < len(obj.material_slots) and obj.material_slots[slot].material:
+                self.materials.add(obj.material_slots[slot].material.name)
+
+
+# Mesh name -> MeshStats, and the meshes edited since they were read
+mesh_stats_cache = {}
+dirty_meshes = set()
+
+def get_mesh_stats(mesh):
+    stats = mesh_stats_cache.get(mesh.name)
+    if stats is None or mesh.name in dirty_meshes or not stats.matches(mesh):
+        stats = MeshStats(mesh)
+        mesh_stats_cache[mesh.name] = stats
+        dirty_meshes.discard(mesh.name)
+    return stats
+
+def object_categories(obj, i, index):
+    """Categories of obj, found at record number i of the property index."""
+    categories = []
+    if i in index.postings["collider"].get("TRUE", ()):
+        categories.append("collider")
+    elif i in index.postings["flags0"].get("INVISIBLE", ()):
+        categories.append("invisible")
+    else:
+        categories.append("render")
+    if any(slot.material and is_ice_material(slot.material.name) for slot in obj.material_slots):
+        categories.append("ice")
+    return categories
+
+def floor_statistics(scene):
+    """Totals per floor and category, {floor: {category: Totals}}. Objects on 2 floors count on both."""
+    index = get_property_index(scene)
+    result = {floor: {category: Totals() for category in CATEGORIES} for floor in FLOOR_NUMBERS}
+
+    read = 0
+    for floor in FLOOR_NUMBERS:
+        for i in index.postings["floor"].get(floor, ()):
+            obj = index.object(i)
+            if obj is None or obj.type != 'MESH':
+                continue
+            cached = obj.data.name in mesh_stats_cache and obj.data.name not in dirty_meshes
+            stats = get_mesh_stats(obj.data)
+            read += not cached
+            for category in object_categories(obj, i, index):
+                result[floor][category].add(obj, stats)
+    count(objects=read)
+    return result
+
+
+# Latest statistics for the panel
+last_statistics = None
+
+def over_budget(scene, totals):
+    """Budget names a floor's render totals exceed."""
+    over = []
+    if scene.gm_budget_triangles and totals.triangles > scene.gm_budget_triangles:
+        over.append("triangles")
+    if scene.gm_budget_objects and totals.objects > scene.gm_budget_objects:
+        over.append("objects")
+    if scene.gm_budget_materials and len(totals.materials) > scene.gm_budget_materials:
+        over.append("materials")
+    return over
+
+def write_report(scene, statistics):
+    text = bpy.data.texts.get(STATS_TEXT) or bpy.data.texts.new(STATS_TEXT)
+    lines = [f"{'floor':6} {'category':10} {'objects':>8} {'vertices':>10} {'triangles':>10} {'materials':>9}"]
+    for floor, categories in statistics.items():
+        for category, totals in categories.items():
+            if totals.objects:
+                lines.append(
+                    f"{floor:6} {category:10} {totals.objects:>8} {totals.vertices:>10} "
+                    f"{totals.triangles:>10} {len(totals.materials):>9}"
+                )
+        over = over_budget(scene, categories["render"])
+        if over:
+            lines.append(f"{floor:6} OVER BUDGET: {', '.join(over)}")
+    text.from_string("\n".join(lines))
+
+
+class OBJECT_OT_FloorStatistics(bpy.types.Operator):
+    """Count objects, vertices, triangles and materials per floor and flag, and check them against the budgets"""
+    bl_idname = "object.gm_floor_statistics"
+    bl_label = "Floor Statistics"
+
+    def execute(self, context):
+        global last_statistics
+        mark_phase("Read meshes")
+        last_statistics = floor_statistics(context.scene)
+
+        mark_phase("Report")
+        write_report(context.scene, last_statistics)
+        over = [floor for floor in FLOOR_NUMBERS if over_budget(context.scene, last_statistics[floor]["render"])]
+        if over:
+            self.report({'WARNING'}, f"Floors over budget: {', '.join(over)}, see the '{STATS_TEXT}' text")
+        else:
+            self.report({'INFO'}, f"All floors within budget, see the '{STATS_TEXT}' text")
+        return {'FINISHED'}
+
+
+@persistent
+def stats_depsgraph_update(scene, depsgraph):
+    for update in depsgraph.updates:
+        if not update.is_updated_geometry:
+            continue
+        if isinstance(update.id, bpy.types.Mesh):
+            dirty_meshes.add(update.id.name)
+        elif isinstance(update.id, bpy.types.Object) and update.id.type == 'MESH':
+            dirty_meshes.add(update.id.data.name)
+
+@persistent
+def stats_load_post(*args):
+    global last_statistics
+    mesh_stats_cache.clear()
+    dirty_meshes.clear()
+    last_statistics = None
+
+
+def register():
+    bpy.utils.register_class(OBJECT_OT_FloorStatistics)
+    bpy.app.handlers.depsgraph_update_post.append(stats_depsgraph_update)
+    bpy.app.handlers.load_post.append(stats_load_post)
+
+def unregister():
+    bpy.utils.unregister_class(OBJECT_OT_FloorStatistics)
+    bpy.app.handlers.depsgraph_update_post.remove(stats_depsgraph_update)
+    bpy.app.handlers.load_post.remove(stats_load_post)
+    mesh_stats_cache.clear()
+    dirty_meshes.clear()
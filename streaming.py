@@ -0,0 +1,163 @@
+import bpy
+import os
+from collections import defaultdict
+from .core import visible_floors, mesh_floors, floors_value, is_on_visible_floor
+from .profiling import mark_phase, count
+
+# Floor streaming.
+# Split Map Floors moves the map meshes into one library .blend per FLOORS value, next to the
+# map file, and links them back in. With Stream Floors on, the libraries whose floors are all
+# hidden by the show_floor_N toggles are unloaded, and linked again when one of them is shown.
+#
+# Libraries are listed in the scene's gm_floor_libraries property, FLOORS value -> file path.
+
+LIBRARIES_KEY = "gm_floor_libraries"
+
+
+def library_collection_name(floors_key):
+    return f"GM_Floor_{floors_key.replace(',', '-')}"
+
+def floor_libraries(scene):
+    return dict(scene.get(LIBRARIES_KEY, {}))
+
+def find_library(filepath):
+    target = os.path.normcase(os.path.normpath(bpy.path.abspath(filepath)))
+    for library in bpy.data.libraries:
+        if os.path.normcase(os.path.normpath(bpy.path.abspath(library.filepath))) == target:
+            return library
+    return None
+
+def link_floor_library(scene, floors_key, filepath):
+    collection_name = library_collection_name(floors_key)
+    with bpy.data.libraries.load(bpy.path.abspath(filepath), link=True, relative=True) as (data_from, data_to):
+        data_to.collections = [name for name in data_from.collections if name == collection_name]
+    for collection in data_to.collections:
+        if collection and collection.name not in scene.collection.children:
+            scene.collection.children.link(collection)
+    return len(data_to.collections)
+
+def load_floor_collection(filepath, floors_key):
+    """Appends the floor collection of an existing library file as local data, None if there is none."""
+    collection_name = library_collection_name(floors_key)
+    with bpy.data.libraries.load(bpy.path.abspath(filepath), link=False) as (data_from, data_to):
+        data_to.collections = [name for name in data_from.collections if name == collection_name]
+    return next((collection for collection in data_to.collections if collection), None)
+
+def self_contained(objects):
+    """The objects whose parent and children all move with them, the others would lose their hierarchy."""
+    kept = set(objects)
+    changed = True
+    while changed:
+        changed = False
+        for obj in list(kept):
+            if (obj.parent and obj.parent not in kept) or any(child not in kept for child in obj.children):
+                kept.discard(obj)
+                changed = True
+    return [obj for obj in objects if obj in kept]
+
+def stream_visible_floors(scene, shown_floors):
+    """Links the floor libraries with a shown floor and unloads the others, everything if streaming is off."""
+    libraries = floor_libraries(scene)
+    if not libraries:
+        return
+
+    loaded = unloaded = 0
+    for floors_key, filepath in libraries.items():
+        wanted = not scene.gm_stream_floors or is_on_visible_floor(mesh_floors(floors_key), shown_floors)
+        library = find_library(filepath)
+        if wanted and library is None:
+            if os.path.exists(bpy.path.abspath(filepath)):
+                loaded += link_floor_library(scene, floors_key, filepath)
+            else:
+                print(f"Floor library '{filepath}' not found")
+        elif not wanted and library is not None:
+            # Removing the library removes everything linked from it
+            bpy.data.libraries.remove(library)
+            unloaded += 1
+    count(objects=loaded + unloaded, rna_calls=loaded + unloaded)
+
+def update_stream_floors(self, context):
+    scene = context.scene
+    stream_visible_floors(scene, visible_floors([getattr(scene, f"show_floor_{n}") for n in range(1, 7)]))
+
+
+class OBJECT_OT_SplitMapFloors(bpy.types.Operator):
+    """Move the map meshes into one linked library file per floor, so hidden floors can be unloaded"""
+    bl_idname = "object.gm_split_floors"
+    bl_label = "Split Map Floors"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        if not bpy.data.filepath:
+            self.report({'ERROR'}, "Save the map first, the floor files are written next to it")
+            return {'CANCELLED'}
+
+        scene = context.scene
+        folder = os.path.splitext(bpy.data.filepath)[0] + "_floors"
+        os.makedirs(folder, exist_ok=True)
+
+        mark_phase("Group objects")
+        groups = defaultdict(list)
+        for obj in scene.objects:
+            if obj.type == 'MESH' and "FLOORS" in obj and not obj.library:
+                groups[floors_value(mesh_floors(obj["FLOORS"]))].append(obj)
+        groups.pop("", None)
+
+        # Meshes parented across floors or to other objects stay local, moving them would break the hierarchy
+        skipped = 0
+        for floors_key in list(groups):
+            kept = self_contained(groups[floors_key])
+            skipped += len(groups[floors_key]) - len(kept)
+            groups[floors_key] = kept
+            if not kept:
+                del groups[floors_key]
+        if not groups:
+            self.report({'WARNING'}, "No local map meshes with a FLOORS tag that can be moved")
+            return {'CANCELLED'}
+
+        mark_phase("Write libraries")
+        libraries = floor_libraries(scene)
+        moved = 0
+        for floors_key, objects in groups.items():
+            filepath = os.path.join(folder, f"floor_{floors_key.replace(',', '-')}.blend")
+
+            # A floor split before keeps what it has, its collection is appended and written back with the new meshes
+            collection = load_floor_collection(filepath, floors_key) if os.path.exists(filepath) else None
+            previous = list(collection.all_objects) if collection else []
+            # A library already linked from that file has to go before the file is rewritten
+            library = find_library(filepath)
+            if library:
+                bpy.data.libraries.remove(library)
+            if collection is None:
+                collection = bpy.data.collections.new(library_collection_name(floors_key))
+            collection.name = library_collection_name(floors_key)
+            for obj in objects:
+                collection.objects.link(obj)
+
+            bpy.data.libraries.write(filepath, {collection}, path_remap='RELATIVE_ALL', fake_user=True)
+            libraries[floors_key] = bpy.path.relpath(filepath)
+
+            # The local copies are replaced by the linked ones
+            removed = objects + previous
+            meshes = {obj.data for obj in removed if obj.type == 'MESH'}
+            bpy.data.batch_remove(removed + [collection])
+            bpy.data.batch_remove([mesh for mesh in meshes if mesh.users == 0])
+            moved += len(objects)
+        count(objects=moved)
+
+        scene[LIBRARIES_KEY] = libraries
+
+        mark_phase("Link floors")
+        update_stream_floors(scene, context)
+        message = f"Moved {moved} meshes into {len(groups)} floor libraries in {folder}"
+        if skipped:
+            message += f", {skipped} parented meshes kept local"
+        self.report({'INFO'}, message)
+        return {'FINISHED'}
+
+
+def register():
+    bpy.utils.register_class(OBJECT_OT_SplitMapFloors)
+
+def unregister():
+    bpy.utils.unregister_class(OBJECT_OT_SplitMapFloors)
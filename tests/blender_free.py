@@ -0,0 +1,9 @@
+import pytest
+
+
+# The add-on folder is a package whose __init__ imports bpy. Collect it as a plain directory,
+# the tests only load the Blender independent core.py
+@pytest.hookimpl(tryfirst=True)
+def pytest_collect_directory(path, parent):
+    if path == parent.config.rootpath:
+        return pytest.Dir.from_parent(parent, path=path)
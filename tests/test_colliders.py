@@ -0,0 +1,32 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# The collider builders need Blender, run with Blender's Python to include them
+bpy = pytest.importorskip("bpy")
+bmesh = pytest.importorskip("bmesh")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+colliders = importlib.import_module(os.path.basename(ROOT) + ".colliders")
+
+
+def test_hull_of_cube_is_twelve_triangles():
+    mesh = bpy.data.meshes.new("GM_TestCube")
+    bm = bmesh.new()
+    bmesh.ops.create_cube(bm, size=2.0)
+    bm.to_mesh(mesh)
+    bm.free()
+    obj = bpy.data.objects.new("GM_TestCube", mesh)
+    bpy.context.scene.collection.objects.link(obj)
+    try:
+        hull = colliders.hull_collider_mesh(obj, "GM_TestCube_COL", bpy.context.evaluated_depsgraph_get())
+        assert len(hull.vertices) == 8
+        assert len(hull.polygons) == 12
+        assert all(polygon.loop_total == 3 for polygon in hull.polygons)
+        bpy.data.meshes.remove(hull)
+    finally:
+        bpy.data.objects.remove(obj)
+        bpy.data.meshes.remove(mesh)
@@ -0,0 +1,142 @@
+import os
+import sys
+
+import pytest
+
+# core.py does not import bpy, it is loaded on its own like in its header
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import core  # noqa: E402
+
+
+#####################################################
+# PROPERTY QUERIES
+#####################################################
+
+def test_parse_query_comparison():
+    assert core.parse_query("floor=3") == ("cmp", "floor", "=", "3")
+
+def test_parse_query_aliases_and_case():
+    assert core.parse_query("FLOORS = 3") == ("cmp", "floor", "=", "3")
+    assert core.parse_query("nullboxes=spellpoint") == ("cmp", "nullbox", "=", "SPELLPOINT")
+
+def test_parse_query_name_keeps_case():
+    assert core.parse_query('name~"MDL-AP*"') == ("cmp", "name", "~", "MDL-AP*")
+
+def test_parse_query_precedence():
+    # and binds tighter than or, not tighter than and
+    assert core.parse_query("floor=1 or floor=2 and not collider=TRUE") == (
+        "or",
+        ("cmp", "floor", "=", "1"),
+        ("and", ("cmp", "floor", "=", "2"), ("not", ("cmp", "collider", "=", "TRUE"))),
+    )
+
+def test_parse_query_parentheses():
+    assert core.parse_query("(floor=1 or floor=2) and type=MESH") == (
+        "and",
+        ("or", ("cmp", "floor", "=", "1"), ("cmp", "floor", "=", "2")),
+        ("cmp", "type", "=", "MESH"),
+    )
+
+@pytest.mark.parametrize("text", [
+    "",
+    "floor",
+    "floor=",
+    "colour=red",
+    "flags0~INV*",
+    "(floor=1",
+    "floor=1)",
+    "floor=1 floor=2",
+    "floor=1 and",
+])
+def test_parse_query_errors(text):
+    with pytest.raises(core.QueryError):
+        core.parse_query(text)
+
+def make_index():
+    return core.PropertyIndex([
+        {"name": "wall", "type": ("MESH",), "floor": ("1", "2"), "collider": ("FALSE",)},
+        {"name": "wall_COL", "type": ("MESH",), "floor": ("1",), "collider": ("TRUE",)},
+        {"name": "MDL-AP0_ghost", "type": ("EMPTY",), "floor": (), "collider": ("FALSE",)},
+    ])
+
+@pytest.mark.parametrize("text, expected", [
+    ("floor=1", {0, 1}),
+    ("floor=2", {0}),
+    ("floor!=2", {1, 2}),
+    ("floor=1 and collider=TRUE", {1}),
+    ("not type=MESH", {2}),
+    ("name~MDL-AP*", {2}),
+    ("name=wall", {0}),
+    ("floor=6", set()),
+])
+def test_property_index(text, expected):
+    assert make_index().evaluate(core.parse_query(text)) == expected
+
+def test_property_index_update():
+    index = make_index()
+    index.update(index.numbers["wall"], {"name": "wall", "type": ("MESH",), "floor": ("3",), "collider": ("TRUE",)})
+    assert index.evaluate(core.parse_query("floor=1")) == {1}
+    assert index.evaluate(core.parse_query("floor=3 and collider=TRUE")) == {0}
+
+
+#####################################################
+# NULLBOXES
+#####################################################
+
+def test_collect_nullbox_ids_skips_non_integers():
+    ids = core.collect_nullbox_ids([("ATTACH", "0"), ("ATTACH", "2"), ("ATTACH", "x"), ("SPELLPOINT", 1)])
+    assert ids == {"ATTACH": {0, 2}, "SPELLPOINT": {1}}
+
+def test_allocate_nullbox_ids_per_category():
+    ids = core.collect_nullbox_ids([("ATTACH", "0"), ("ATTACH", "2")])
+    assert core.allocate_nullbox_ids(ids, ["ATTACH", "SPELLPOINT", "ATTACH"]) == [3, 0, 4]
+    assert ids["ATTACH"] == {0, 2, 3, 4}
+
+def test_nullbox_name():
+    assert core.nullbox_name(3, "MDL-ghost") == "MDL-AP3_ghost"
+    assert core.nullbox_name(3, "ghost") == "MDL-AP3_ghost"
+
+
+#####################################################
+# MIRRORING
+#####################################################
+
+@pytest.mark.parametrize("name, mirrored, side", [
+    ("MDL-jnt-L-thighbone", "MDL-jnt-R-thighbone", 'LEFT'),
+    ("MDL-J_R-HandBone", "MDL-J_L-HandBone", 'RIGHT'),
+    ("Hand_Left", "Hand_Right", 'LEFT'),
+    ("MDL-Larmjnt", None, None),
+    ("MDL-jnt-HEADBONE", None, None),
+])
+def test_mirror_name(name, mirrored, side):
+    assert core.mirror_name(name) == mirrored
+    assert core.name_side(name) == side
+
+def test_pair_by_name_roles_before_tokens():
+    names = ["MDL-jnt-L-HandBone", "MDL-J_R-HandBone", "MDL-lfoot", "MDL-rfoot", "MDL-jnt-L-thighbone", "MDL-jnt-R-thighbone", "MDL-pelvis"]
+    roles = [
+        (("MDL-jnt-L-HandBone", "MDL-lfthand"), ("MDL-J_R-HandBone", "MDL-rthand")),
+        (("MDL-lfoot",), ("MDL-rfoot",)),
+    ]
+    partners, sides = core.pair_by_name(names, roles)
+    assert partners["MDL-jnt-L-HandBone"] == "MDL-J_R-HandBone"
+    assert partners["MDL-rfoot"] == "MDL-lfoot"
+    assert partners["MDL-jnt-R-thighbone"] == "MDL-jnt-L-thighbone"
+    assert "MDL-pelvis" not in partners
+    assert sides["MDL-lfoot"] == 'LEFT' and sides["MDL-J_R-HandBone"] == 'RIGHT'
+
+def test_pair_by_name_needs_both_sides():
+    partners, _sides = core.pair_by_name(["MDL-jnt-L-thighbone"], [(("MDL-lfoot",), ("MDL-rfoot",))])
+    assert partners == {}
+
+
+#####################################################
+# ATLAS PACKING
+#####################################################
+
+def test_pack_shelves_fits_and_skips_oversized():
+    placements, atlases = core.pack_shelves([(64, 64), (64, 32), (512, 512)], 128)
+    assert placements[2] is None
+    assert placements[0] == (0, 0, 0)
+    assert placements[1] == (0, 64, 0)
+    assert atlases == [(128, 64)]
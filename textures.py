@@ -0,0 +1,336 @@
+import bpy
+import hashlib
+import numpy as np
+from collections import defaultdict
+from .profiling import mark_phase, count
+from .core import pack_shelves
+from .jobs import register_job
+
+# Texture memory audit.
+# Pixels are read once per image with foreach_get into a NumPy buffer, that single read gives
+# both the pixel hash used to find byte identical textures and the unused alpha check.
+
+AUDIT_TEXT = "GM Texture Audit"
+
+
+class ImageAudit:
+    """Memory cost of an image and the savings possible on it."""
+
+    def __init__(self, image):
+        self.name = image.name
+        self.width, self.height = image.size
+        self.channels = image.channels
+        self.bytes = self.width * self.height * image.depth // 8
+        self.pixel_hash = None
+        self.alpha_unused = False
+        self.duplicate_of = None
+
+    @property
+    def alpha_waste(self):
+        """Bytes spent on an alpha channel that is fully opaque."""
+        return self.bytes // self.channels if self.alpha_unused else 0
+
+    @property
+    def savings(self):
+        return self.bytes if self.duplicate_of else self.alpha_waste
+
+
+def read_pixels(image):
+    """All pixels of image as a flat float32 array."""
+    pixels = np.empty(len(image.pixels), dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+    return pixels
+
+def audit_image(image):
+    audit = ImageAudit(image)
+    pixels = read_pixels(image)
+
+    digest = hashlib.sha1()
+    digest.update(f"{audit.width}x{audit.height}x{audit.channels}".encode())
+    # Equal pixels read as a Non-Color normal map and as sRGB color are different textures
+    digest.update(f"{image.colorspace_settings.name}|{image.alpha_mode}".encode())
+    digest.update(pixels.tobytes())
+    audit.pixel_hash = digest.hexdigest()
+
+    if audit.channels == 4:
+        audit.alpha_unused = bool(np.all(pixels[3::4] == 1.0))
+    return audit
+
+def mark_duplicate_images(audits):
+    """Marks byte identical copies, the copy with the shortest name is kept, and sorts by savings."""
+    by_hash = defaultdict(list)
+    for audit in audits:
+        by_hash[audit.pixel_hash].append(audit)
+    for group in by_hash.values():
+        keep = min(group, key=lambda a: (len(a.name), a.name))
+        for audit in group:
+            if audit is not keep:
+                audit.duplicate_of = keep.name
+
+    audits.sort(key=lambda a: a.savings, reverse=True)
+
+def auditable_images():
+    """File and packed images with pixel data, render results and missing files are skipped."""
+    return [
+        image for image in bpy.data.images
+        if image.type == 'IMAGE' and image.size[0] and image.size[1]
+    ]
+
+def format_bytes(size):
+    return f"{size / (1024 * 1024):.2f} MB"
+
+def write_report(audits):
+    """Writes the audit to the GM Texture Audit text, sorted by potential savings."""
+    text = bpy.data.texts.get(AUDIT_TEXT) or bpy.data.texts.new(AUDIT_TEXT)
+    lines = [f"{'image':40} {'size':>11} {'memory':>10} {'savings':>10}  notes"]
+    for audit in audits:
+        notes = []
+        if audit.duplicate_of:
+            notes.append(f"duplicate of {audit.duplicate_of}")
+        if audit.alpha_unused:
+            notes.append("alpha unused")
+        lines.append(
+            f"{audit.name:40} {audit.width:>5}x{audit.height:<5} {format_bytes(audit.bytes):>10} "
+            f"{format_bytes(audit.savings):>10}  {', '.join(notes)}"
+        )
+    total = sum(a.bytes for a in audits)
+    savings = sum(a.savings for a in audits)
+    lines.append(f"Total {format_bytes(total)}, potential savings {format_bytes(savings)}")
+    text.from_string("\n".join(lines))
+    return total, savings
+
+
+class OBJECT_OT_AuditTextures(bpy.types.Operator):
+    """Report the memory used by every image and find byte identical copies, written to the GM Texture Audit text"""
+    bl_idname = "object.audit_textures"
+    bl_label = "Audit Textures"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    merge_duplicates: bpy.props.BoolProperty(
+        name="Merge Duplicates",
+        description="Replace byte identical images by a single image datablock",
+        default=False,
+    )
+
+    def execute(self, context):
+        for _progress in audit_textures_steps(self, context, self.merge_duplicates):
+            pass
+        return {'FINISHED'}
+
+
+def audit_textures_steps(self, context, merge_duplicates):
+    """Audit as a job, one image read per step. Nothing is changed before the last step.
+    Images are looked up by name at every step, the user may delete or undo in between."""
+    mark_phase("Read pixels")
+    names = [image.name for image in auditable_images()]
+    audits = []
+    for i, name in enumerate(names):
+        image = bpy.data.images.get(name)
+        if image is not None:
+            audits.append(audit_image(image))
+        yield i + 1, len(names)
+    count(objects=len(audits), rna_calls=len(audits))
+
+    mark_phase("Report")
+    mark_duplicate_images(audits)
+    total, savings = write_report(audits)
+
+    merged = 0
+    if merge_duplicates:
+        mark_phase("Merge duplicates")
+        for audit in audits:
+            if audit.duplicate_of:
+                image = bpy.data.images.get(audit.name)
+                keep = bpy.data.images.get(audit.duplicate_of)
+                if image is None or keep is None:
+                    continue
+                image.user_remap(keep)
+                if image.users == 0:
+                    bpy.data.images.remove(image)
+                merged += 1
+
+    message = f"Audited {len(audits)} images, {format_bytes(total)}, potential savings {format_bytes(savings)}"
+    if merge_duplicates:
+        message += f", merged {merged} duplicates"
+    self.report({'INFO'}, message + f", see the '{AUDIT_TEXT}' text")
+
+@register_job("AUDIT_TEXTURES", "Audit Textures")
+def audit_textures_job(self, context):
+    yield from audit_textures_steps(self, context, False)
+
+@register_job("MERGE_DUPLICATE_IMAGES", "Merge Duplicate Images")
+def merge_duplicate_images_job(self, context):
+    yield from audit_textures_steps(self, context, True)
+
+
+#####################################################
+# ATLAS
+#####################################################
+
+def material_image_node(mat):
+    """First image texture node of mat with an image, the base color texture of imported maps."""
+    if mat and mat.use_nodes and mat.node_tree:
+        for node in mat.node_tree.nodes:
+            if node.type == 'TEX_IMAGE' and node.image:
+                return node
+    return None
+
+def rgba_pixels(image):
+    """Pixels of image as a (height, width, 4) array, rows bottom to top like Blender stores them."""
+    width, height = image.size
+    pixels = read_pixels(image).reshape(height, width, image.channels)
+    if image.channels == 4:
+        return pixels
+    rgba = np.ones((height, width, 4), dtype=np.float32)
+    rgba[..., :3] = pixels[..., :3] if image.channels >= 3 else pixels[..., :1]
+    return rgba
+
+def read_uvs(mesh):
+    uvs = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+    mesh.uv_layers.active.data.foreach_get("uv", uvs)
+    return uvs.reshape(-1, 2)
+
+def uvs_in_unit_square(uvs):
+    # Tiling textures repeat outside 0-1, they would sample their neighbours in the atlas
+    return not len(uvs) or (uvs.min() >= -0.001 and uvs.max() <= 1.001)
+
+
+class OBJECT_OT_BuildTextureAtlas(bpy.types.Operator):
+    """Pack the textures of the selected meshes' materials into atlases and point the meshes at shared atlas materials"""
+    bl_idname = "object.build_texture_atlas"
+    bl_label = "Build Texture Atlas"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    max_size: bpy.props.EnumProperty(
+        name="Atlas Size",
+        items=[(str(2 ** n), f"{2 ** n}", "") for n in range(9, 14)],
+        default='2048',
+    )
+    padding: bpy.props.IntProperty(
+        name="Padding",
+        description="Pixels of edge colour around every texture, avoids bleeding at lower mips",
+        default=4,
+        min=0,
+        max=64,
+    )
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        mark_phase("Collect materials")
+        meshes_by_material = defaultdict(set)
+        skipped = set()
+        for obj in context.selected_objects:
+            if obj.type != 'MESH':
+                continue
+            mesh = obj.data
+            # One material per mesh as the game requires, with a UV map to remap
+            if len(obj.material_slots) != 1 or not mesh.uv_layers.active or not material_image_node(obj.material_slots[0].material):
+                skipped.add(obj.name)
+                continue
+            mat = obj.material_slots[0].material
+            # Missing image files have no pixels to copy, reading the size loads the others
+            image = material_image_node(mat).image
+            if image.size[0] == 0 or image.size[1] == 0 or not image.has_data:
+                skipped.add(mat.name)
+                continue
+            meshes_by_material[mat].add(mesh)
+
+        # A mesh shown with two materials through object slots can only have one UV layout
+        material_count = defaultdict(int)
+        for meshes in meshes_by_material.values():
+            for mesh in meshes:
+                material_count[mesh] += 1
+
+        # Materials whose UVs tile can not go in an atlas
+        uvs_by_mesh = {}
+        for mat, meshes in list(meshes_by_material.items()):
+            for mesh in meshes:
+                uvs_by_mesh[mesh] = read_uvs(mesh)
+            if any(material_count[mesh] > 1 for mesh in meshes) or not all(uvs_in_unit_square(uvs_by_mesh[mesh]) for mesh in meshes):
+                skipped.add(mat.name)
+                del meshes_by_material[mat]
+        count(objects=len(uvs_by_mesh), rna_calls=len(uvs_by_mesh))
+
+        materials = list(meshes_by_material)
+        if len(materials) < 2:
+            self.report({'WARNING'}, "Need at least 2 atlasable materials on the selected meshes")
+            return {'CANCELLED'}
+
+        mark_phase("Pack")
+        images = [material_image_node(mat).image for mat in materials]
+        # Materials sharing a texture share its place in the atlas
+        unique_images = list(dict.fromkeys(images))
+        image_placements, atlas_sizes = pack_shelves([tuple(image.size) for image in unique_images], int(self.max_size), self.padding)
+        placements = [image_placements[unique_images.index(image)] for image in images]
+
+        mark_phase("Write atlases")
+        buffers = [np.zeros((height, width, 4), dtype=np.float32) for width, height in atlas_sizes]
+        for image, placement in zip(unique_images, image_placements):
+            if placement is None:
+                continue
+            atlas_index, x, y = placement
+            pixels = rgba_pixels(image)
+            p = self.padding
+            # Padding repeats the edge pixels
+            block = np.pad(pixels, ((p, p), (p, p), (0, 0)), mode='edge')
+            buffers[atlas_index][y - p:y - p + block.shape[0], x - p:x - p + block.shape[1]] = block
+
+        atlas_materials = []
+        for i, ((width, height), buffer) in enumerate(zip(atlas_sizes, buffers)):
+            atlas = bpy.data.images.new(f"GM_Atlas_{i}", width, height, alpha=True)
+            atlas.pixels.foreach_set(buffer.ravel())
+            atlas.pack()
+
+            # Copy of the first packed material so the shading setup of the map is kept
+            first = next(mat for mat, placement in zip(materials, placements) if placement and placement[0] == i)
+            atlas_mat = first.copy()
+            atlas_mat.name = f"GM_Atlas_{i}"
+            material_image_node(atlas_mat).image = atlas
+            atlas_materials.append(atlas_mat)
+
+        mark_phase("Remap UVs")
+        remapped = 0
+        material_remap = {}
+        for mat, image, placement in zip(materials, images, placements):
+            if placement is None:
+                skipped.add(mat.name)
+                continue
+            atlas_index, x, y = placement
+            atlas_width, atlas_height = atlas_sizes[atlas_index]
+            width, height = image.size
+            scale = np.array((width / atlas_width, height / atlas_height), dtype=np.float32)
+            offset = np.array((x / atlas_width, y / atlas_height), dtype=np.float32)
+
+            for mesh in meshes_by_material[mat]:
+                uvs = uvs_by_mesh[mesh] * scale + offset
+                mesh.uv_layers.active.data.foreach_set("uv", uvs.ravel())
+                mesh.materials[0] = atlas_materials[atlas_index]
+                remapped += 1
+            material_remap[mat] = atlas_materials[atlas_index]
+        count(objects=remapped, rna_calls=remapped * 2)
+
+        # Object linked slots
+        for obj in context.selected_objects:
+            for slot in obj.material_slots:
+                if slot.link == 'OBJECT' and slot.material in material_remap:
+                    slot.material = material_remap[slot.material]
+
+        message = f"Packed {len(material_remap)} materials into {len(atlas_materials)} atlases, {remapped} meshes remapped"
+        if skipped:
+            message += f", skipped {len(skipped)}: {', '.join(sorted(skipped)[:5])}"
+        self.report({'INFO'}, message)
+        return {'FINISHED'}
+
+
+def register():
+    bpy.utils.register_class(OBJECT_OT_AuditTextures)
+    bpy.utils.register_class(OBJECT_OT_BuildTextureAtlas)
+
+def unregister():
+    bpy.utils.unregister_class(OBJECT_OT_AuditTextures)
+    bpy.utils.unregister_class(OBJECT_OT_BuildTextureAtlas)
+
+if __name__ == "__main__":
+    register()